@@ -8,14 +8,16 @@ from injector import Injector
 from api.chat.chat_service import ChatService
 from api.health.router import router as health_router
 from api.chat.router import router as chat_router
+from api.metrics.router import router as metrics_router
 
 from api.modules import create_modules
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    _ = app.state.injector.get(ChatService)
+    chat_service = app.state.injector.get(ChatService)
     yield
+    chat_service.close()
 
 
 def create_app(modules=None) -> FastAPI:
@@ -29,6 +31,7 @@ def create_app(modules=None) -> FastAPI:
 
     app.include_router(health_router)
     app.include_router(chat_router)
+    app.include_router(metrics_router)
 
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,159 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from api.chat.models import ChatResponse
+from api.shared.logger import get_logger
+from api.vector.lexical_index import tokenize
+
+LOGGER = get_logger(__name__)
+
+
+STOP_WORDS = frozenset(
+    "a an the and or but if of in on at to for from by with about into over under up down out as is are was were be "
+    "been being am do does did doing have has had can could will would should shall may might must i me my we our "
+    "you your it its this that these those there here what which who whom whose when where why how not no".split()
+)
+# Words spelled like "Firefox" or "v2" anywhere but at the start of the question name something
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:[._/:-][A-Za-z0-9]+)*")
+
+
+@dataclass(frozen=True)
+class QuestionTerms:
+    content: FrozenSet[str]
+    named: FrozenSet[str]
+
+    @classmethod
+    def of(cls, question: str) -> "QuestionTerms":
+        words = WORD_PATTERN.findall(question)
+        named = {
+            word.lower()
+            for position, word in enumerate(words)
+            if (position > 0 and word[0].isupper()) or any(character.isdigit() for character in word)
+        }
+        return cls(
+            content=frozenset(tokenize(question)) - STOP_WORDS,
+            named=frozenset(named) - STOP_WORDS,
+        )
+
+    def conflicts_with(self, other: "QuestionTerms") -> bool:
+        """Whether one question names something the other leaves out while asking about something else instead."""
+        return bool(
+            (self.named - other.content and other.content - self.content)
+            or (other.named - self.content and self.content - other.content)
+        )
+
+
+class SemanticAnswerCache:
+    """Reuses answers for questions whose embeddings are semantically close.
+
+    Embeddings of questions that only differ in the entity they ask about, say "How do I set up a proxy in Chrome?"
+    and "... in Firefox?", are often closer than any usable threshold, so a close question that names something the
+    cached one does not, in place of what the cached one names, is a miss.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = 3600,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        # Cached question embeddings live in one pre-allocated, row-normalized matrix so a lookup is a single
+        # matrix-vector product; _entries maps the occupied rows to their answers in LRU order.
+        self._matrix: Optional[np.ndarray] = None
+        self._occupied = np.zeros(max_size, dtype=bool)
+        self._entries: OrderedDict[int, Tuple[float, QuestionTerms, ChatResponse]] = OrderedDict()
+        self._free_slots: List[int] = list(range(max_size - 1, -1, -1))
+        self._corpus_version: Optional[object] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_corpus_version(self, corpus_version: object) -> None:
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                LOGGER.info("Corpus version changed, invalidating semantic answer cache")
+            self._clear()
+            self._corpus_version = corpus_version
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _evict(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._occupied[slot] = False
+        self._free_slots.append(slot)
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._occupied[:] = False
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+
+    def get(self, question: str, embedding: List[float], corpus_version: object) -> Optional[ChatResponse]:
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+            vector = self._normalize(embedding)
+
+            if self._entries and self._matrix is not None and self._matrix.shape[1] == vector.shape[0]:
+                similarities = self._matrix @ vector
+                similarities[~self._occupied] = -np.inf
+                candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+                terms = QuestionTerms.of(question)
+                for slot in candidates[np.argsort(-similarities[candidates])].tolist():
+                    created_at, cached_terms, response = self._entries[slot]
+                    if terms.conflicts_with(cached_terms):
+                        continue
+                    if self._is_expired(created_at):
+                        self._evict(slot)
+                        continue
+
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, embedding: List[float], response: ChatResponse, corpus_version: object) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+            vector = self._normalize(embedding)
+
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._clear()
+
+            if not self._free_slots:
+                self._evict(next(iter(self._entries)))
+
+            slot = self._free_slots.pop()
+            self._matrix[slot] = vector
+            self._occupied[slot] = True
+            self._entries[slot] = (time.time(), QuestionTerms.of(question), response)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,13 +1,30 @@
 import asyncio
-from typing import List
+import time
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
 
 from injector import singleton, inject
 
-from api.chat.models import ChatResponse, ChatRequest
-from api.chat.openai_llm import OpenAiLlmWrapper
-from api.chat.prompt_builder import PromptBuilder
+from api.chat.answer_cache import SemanticAnswerCache
+from api.chat.context_packer import ContextPacker, token_counter_for
+from api.chat.llm_governor import AdaptiveConcurrencyLimit, CircuitBreaker, LlmGovernor, LlmUnavailableError
+from api.chat.metrics import ChatMetrics
+from api.chat.models import (
+    ChatBatchItem,
+    ChatBatchRequest,
+    ChatBatchResponse,
+    ChatResponse,
+    ChatRequest,
+    ChatStreamEvent,
+)
+from api.chat.openai_llm import LlmResponseError, OpenAiLlmWrapper
+from api.chat.prompt_builder import NO_ANSWER_MESSAGE, PromptBuilder
 from api.shared.configs import Configs
 from api.shared.logger import get_logger
+from api.shared.single_flight import SingleFlight
+from api.vector.crawl_manifest import AppliedCrawl, CrawlManifest, fingerprint_file
+from api.vector.embedding_cache import EmbeddingCache, normalize_query
+from api.vector.embeddings import collection_name_for, create_embeddings, default_max_distance
 from api.vector.store import VectorStore, ContextEntry
 from api.vector.text_preprocessor import RawDataPreprocessor
 from paths import ROOT_DIR, DATA_DIR, TEST_DATA_DIR
@@ -18,40 +35,358 @@ LOOGER = get_logger(__name__)
 @inject
 @singleton
 class ChatService:
-    def __init__(self, configs: Configs):
+    def __init__(self, configs: Configs, metrics: Optional[ChatMetrics] = None):
         self.configs = configs
+        self.metrics = metrics or ChatMetrics()
 
         if configs.build == "test":
             persistent_vector_store_dir = TEST_DATA_DIR / "persistent_chroma_db"
         else:
             persistent_vector_store_dir = DATA_DIR / "persistent_chroma_db"
+        self._applied_crawl_path = persistent_vector_store_dir / "applied_crawl.json"
 
-        self.vector_store = VectorStore(configs.openai_api_key, persist_directory=persistent_vector_store_dir)
-        self.preprocessor = RawDataPreprocessor()
-        self.llm_wrapper = OpenAiLlmWrapper(api_key=configs.openai_api_key, model=configs.openai_model)
-        self.prompt_builder = PromptBuilder()
+        self.embedding_cache = EmbeddingCache(
+            max_size=configs.embedding_cache_size,
+            ttl_seconds=configs.embedding_cache_ttl_seconds,
+            persist_path=ROOT_DIR / configs.embedding_cache_path if configs.embedding_cache_path else None,
+        )
+        # Loaded once here, the local sentence-transformers model is expensive to initialize
+        embeddings = create_embeddings(
+            configs.embedding_provider,
+            model=configs.embedding_model,
+            openai_api_key=configs.openai_api_key,
+            device=configs.embedding_device,
+            batch_size=configs.embedding_batch_size,
+            openai_base_url=configs.openai_base_url,
+        )
+        self.retrieval_max_distance = (
+            configs.retrieval_max_distance
+            if configs.retrieval_max_distance is not None
+            else default_max_distance(configs.embedding_provider, configs.embedding_model)
+        )
+        self.vector_store = VectorStore(
+            configs.openai_api_key,
+            persist_directory=persistent_vector_store_dir,
+            embeddings=embeddings,
+            collection_name=collection_name_for(configs.embedding_provider, configs.embedding_model),
+            index_engine=configs.vector_index_engine,
+            retrieval_mode=configs.retrieval_mode,
+            lexical_fast_path=configs.lexical_fast_path_enabled,
+            lexical_min_confidence=configs.lexical_fast_path_min_confidence,
+            search_max_workers=configs.vector_search_max_workers,
+            embedding_cache=self.embedding_cache,
+            query_batch_window_seconds=configs.embedding_batch_window_ms / 1000,
+            query_max_batch_size=configs.embedding_max_batch_size,
+            ingestion_batch_size=configs.ingestion_batch_size,
+            ingestion_max_workers=configs.ingestion_max_workers,
+            split_max_workers=configs.preprocessing_max_workers,
+        )
+        self.preprocessor = RawDataPreprocessor(max_workers=configs.preprocessing_max_workers)
+        self.llm_governor = LlmGovernor(
+            limiter=AdaptiveConcurrencyLimit(
+                initial_limit=configs.llm_initial_concurrency,
+                max_limit=configs.llm_max_concurrency,
+                max_queue=configs.llm_max_queue_size,
+            ),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=configs.llm_circuit_failure_threshold,
+                reset_timeout_seconds=configs.llm_circuit_reset_seconds,
+            ),
+            timeout_seconds=configs.llm_timeout_seconds,
+            max_retries=configs.llm_max_retries,
+        )
+        self.llm_wrapper = OpenAiLlmWrapper(
+            api_key=configs.openai_api_key,
+            model=configs.openai_model,
+            governor=self.llm_governor,
+            base_url=configs.openai_base_url,
+            metrics=self.metrics,
+        )
+        self.prompt_builder = PromptBuilder(
+            ContextPacker(
+                token_budget=configs.context_token_budget or None,
+                token_counter=token_counter_for(configs.openai_model),
+            )
+            if configs.context_packing_enabled
+            else None
+        )
+        self.answer_cache = (
+            SemanticAnswerCache(
+                similarity_threshold=configs.answer_cache_similarity_threshold,
+                max_size=configs.answer_cache_size,
+                ttl_seconds=configs.answer_cache_ttl_seconds,
+            )
+            if configs.answer_cache_enabled
+            else None
+        )
+        self._single_flight = SingleFlight()
+
+        self.metrics.register_cache("embedding", self.embedding_cache.stats)
+        if self.answer_cache is not None:
+            self.metrics.register_cache("answer", self.answer_cache.stats)
+        self.metrics.register_llm_governor(self.llm_governor)
 
         self._start_up()
         asyncio.get_event_loop().create_task(self._warm_up_dependencies())
 
+    def _load_applicable_crawl_manifest(self, data_path: Path, data_fingerprint: str) -> Optional[CrawlManifest]:
+        """The manifest, if it leads from the data the index was last synced with to the current data."""
+        manifest_path = CrawlManifest.path_for(data_path)
+        if not manifest_path.exists():
+            return None
+
+        manifest = CrawlManifest.load(manifest_path)
+        applied = AppliedCrawl.load(self._applied_crawl_path)
+        if manifest.data_fingerprint != data_fingerprint:
+            LOOGER.info(f"Ignoring crawl manifest {manifest_path}, it does not describe the current scraped data.")
+            return None
+        if applied is None or manifest.base_fingerprint != applied.data_fingerprint:
+            # Missed re-crawls would go unnoticed, only their union would tell which pages changed meanwhile
+            LOOGER.info(f"Ignoring crawl manifest {manifest_path}, the vector store was not synced with its base data.")
+            return None
+        return manifest
+
     def _start_up(self):
-        if self.vector_store.is_vector_store_initialized():
-            LOOGER.info("Vector store already initialized, skipping data loading.")
+        data_path = ROOT_DIR / self.configs.scraped_data_path
+        entries = self.preprocessor.stream_json_file(data_path)
+        scope_urls = None
+
+        data_fingerprint = None
+        manifest = None
+        if self.configs.crawl_manifest_enabled:
+            data_fingerprint = fingerprint_file(data_path)
+            manifest = self._load_applicable_crawl_manifest(data_path, data_fingerprint)
+        # Only a completed sync may be built on, an interrupted one leaves no marker and the next start syncs fully
+        self._applied_crawl_path.unlink(missing_ok=True)
+
+        if manifest is not None:
+            LOOGER.info(f"Syncing {len(manifest.affected_urls)} re-crawled pages with the vector store.")
+            scope_urls = manifest.affected_urls
+            entries = (entry for entry in entries if entry.source_url in scope_urls)
         else:
-            LOOGER.info("Vector store not initialized, loading and processing data.")
-            processed_data = self.preprocessor.process_json_file(ROOT_DIR / self.configs.scraped_data_path)
-            self.vector_store.add_from_preprocessed_data(processed_data)
+            # Diffing the scraped data against the index is cheap, only new or changed chunks get embedded
+            LOOGER.info("Syncing vector store with the scraped data.")
+
+        try:
+            self.vector_store.sync_from_preprocessed_data(
+                entries, batch_size=self.configs.ingestion_stream_batch_size, scope_urls=scope_urls
+            )
+        finally:
+            self.preprocessor.close()
+
+        if data_fingerprint is not None:
+            AppliedCrawl(data_fingerprint=data_fingerprint).save(self._applied_crawl_path)
 
         self.llm_wrapper.set_system_message(self.prompt_builder.get_system_message())
 
     async def _warm_up_dependencies(self):
         LOOGER.info("Warming up dependencies...")
         query = "Proxy China"
-        context_entries: List[ContextEntry] = self.vector_store.similarity_search(query, k=3)
+        context_entries: List[ContextEntry] = await self.vector_store.asimilarity_search(query, k=3)
         user_message = self.prompt_builder.build_user_message(query, context_entries)
         await self.llm_wrapper.ask_structured(user_message, ChatResponse)  # type: ignore[arg-type]
 
     async def chat(self, query: ChatRequest) -> ChatResponse:
-        context_entries: List[ContextEntry] = self.vector_store.similarity_search(query.question, k=3)
-        user_message = self.prompt_builder.build_user_message(query.question, context_entries)
-        return await self.llm_wrapper.ask_structured(user_message, ChatResponse)  # type: ignore[arg-type]
+        with self.metrics.track_request("chat"):
+            # Identical questions asked concurrently share one embedding, search and LLM call
+            return await self._single_flight.do(normalize_query(query.question), lambda: self._answer(query.question))
+
+    async def _answer(self, question: str) -> ChatResponse:
+        corpus_version = self.vector_store.corpus_version
+        embedding, context_entries, ready_response = await self._retrieve(question, corpus_version)
+        if ready_response is not None:
+            return ready_response
+
+        with self.metrics.time_stage("prompt_build"):
+            user_message = self.prompt_builder.build_user_message(question, context_entries)
+        with self.metrics.time_stage("llm"):
+            response = await self.llm_wrapper.ask_structured(user_message, ChatResponse)  # type: ignore[arg-type]
+        self.metrics.record_answer("llm")
+
+        if self.answer_cache is not None and embedding is not None:
+            self.answer_cache.put(question, embedding, response, corpus_version)
+        return response
+
+    async def chat_batch(self, request: ChatBatchRequest) -> ChatBatchResponse:
+        """Answers many questions at once, each distinct question embedded, searched and answered only once."""
+        with self.metrics.track_request("batch"):
+            return await self._answer_batch(request)
+
+    async def _answer_batch(self, request: ChatBatchRequest) -> ChatBatchResponse:
+        if len(request.questions) > self.configs.chat_batch_max_questions:
+            raise ValueError(f"A batch can hold at most {self.configs.chat_batch_max_questions} questions")
+
+        # Questions differing only in case or whitespace share one answer, asked with their first spelling
+        unique_questions = {}
+        for question in request.questions:
+            unique_questions.setdefault(normalize_query(question), question)
+        questions = list(unique_questions.values())
+
+        corpus_version = self.vector_store.corpus_version
+        semaphore = asyncio.Semaphore(self.configs.chat_batch_llm_concurrency)
+
+        async def answer(question: str, retrieval) -> ChatResponse:
+            embedding, context_entries, ready_response = retrieval
+            if ready_response is not None:
+                return ready_response
+
+            with self.metrics.time_stage("prompt_build"):
+                user_message = self.prompt_builder.build_user_message(question, context_entries)
+            async with semaphore:
+                with self.metrics.time_stage("llm"):
+                    response = await self.llm_wrapper.ask_structured(user_message, ChatResponse)  # type: ignore[arg-type]
+            self.metrics.record_answer("llm")
+
+            if self.answer_cache is not None and embedding is not None:
+                self.answer_cache.put(question, embedding, response, corpus_version)
+            return response
+
+        try:
+            retrievals = await self._retrieve_many(questions, corpus_version)
+            outcomes = await asyncio.gather(
+                *(answer(question, retrieval) for question, retrieval in zip(questions, retrievals)),
+                return_exceptions=True,
+            )
+        except Exception as e:  # noqa: BLE001
+            # Retrieval is shared by the whole batch, when it fails every question fails with it
+            outcomes = [e] * len(questions)
+
+        outcome_by_question = dict(zip(unique_questions, outcomes))
+        results = []
+        for question in request.questions:
+            outcome = outcome_by_question[normalize_query(question)]
+            if isinstance(outcome, ChatResponse):
+                results.append(ChatBatchItem(question=question, response=outcome))
+            elif isinstance(outcome, (ValueError, LlmUnavailableError)):
+                self.metrics.record_error("batch", outcome)
+                results.append(ChatBatchItem(question=question, error=str(outcome)))
+            else:
+                LOOGER.info(f"Batch chat error for question {question!r}: {outcome}")
+                self.metrics.record_error("batch", outcome)
+                results.append(ChatBatchItem(question=question, error="Internal server error"))
+        return ChatBatchResponse(results=results)
+
+    async def chat_stream(self, query: ChatRequest) -> AsyncIterator[ChatStreamEvent]:
+        """Yields the retrieved sources first, then the answer text as it is generated and the full response last."""
+        with self.metrics.track_request("stream"):
+            question = query.question
+            corpus_version = self.vector_store.corpus_version
+            embedding, context_entries, ready_response = await self._retrieve(question, corpus_version)
+
+            if ready_response is not None:
+                yield ChatStreamEvent(event="sources", data={"sources": ready_response.sources})
+                yield ChatStreamEvent(event="token", data={"delta": ready_response.answer})
+                yield ChatStreamEvent(event="answer", data=ready_response.model_dump())
+                return
+
+            with self.metrics.time_stage("prompt_build"):
+                # Packed first, so chunks dropped for the token budget are not announced as sources
+                context_entries = self.prompt_builder.pack_context(context_entries)
+                user_message = self.prompt_builder.format_user_message(question, context_entries)
+            sources = list(dict.fromkeys(entry.source_url for entry in context_entries))
+            yield ChatStreamEvent(event="sources", data={"sources": sources})
+
+            response = None
+            first_token = True
+            with self.metrics.time_stage("llm"):
+                start = time.perf_counter()
+                async for item in self.llm_wrapper.stream_structured(user_message, ChatResponse, text_field="answer"):  # type: ignore[arg-type]
+                    if isinstance(item, str):
+                        if first_token:
+                            self.metrics.observe_stage("llm_first_token", time.perf_counter() - start)
+                            first_token = False
+                        yield ChatStreamEvent(event="token", data={"delta": item})
+                    else:
+                        response = item
+            if response is None:
+                raise LlmResponseError("LLM stream ended without a response")
+            self.metrics.record_answer("llm")
+
+            if self.answer_cache is not None and embedding is not None:
+                self.answer_cache.put(question, embedding, response, corpus_version)
+            yield ChatStreamEvent(event="answer", data=response.model_dump())
+
+    async def _retrieve(
+        self, question: str, corpus_version: int
+    ) -> Tuple[Optional[List[float]], List[ContextEntry], Optional[ChatResponse]]:
+        """Returns the query embedding and context for a question, or an answer needing no LLM call.
+
+        That answer is either a cached answer to a similar question or the refusal when no context is relevant enough.
+        """
+        # Exact term lookups the lexical index is confident about skip the query embedding altogether
+        with self.metrics.time_stage("lexical_fast_path"):
+            context_entries: Optional[List[ContextEntry]] = self.vector_store.lexical_fast_path(question, k=3)
+        if context_entries is not None:
+            return None, context_entries, None
+
+        with self.metrics.time_stage("embedding"):
+            embedding = await self.vector_store.aembed_query(question)
+        if self.answer_cache is not None:
+            with self.metrics.time_stage("answer_cache"):
+                cached_response = self.answer_cache.get(question, embedding, corpus_version)
+            if cached_response is not None:
+                self.metrics.record_answer("answer_cache")
+                return embedding, [], cached_response
+
+        with self.metrics.time_stage("vector_search"):
+            results = await self.vector_store.asimilarity_search_by_vector_with_distances(
+                embedding, k=3, query=question
+            )
+        return self._relevant_retrieval(embedding, results)
+
+    async def _retrieve_many(
+        self, questions: List[str], corpus_version: int
+    ) -> List[Tuple[Optional[List[float]], List[ContextEntry], Optional[ChatResponse]]]:
+        """Same as _retrieve for many questions, with one embedding call and one vectorized search for all of them."""
+        retrievals: List[Optional[Tuple[Optional[List[float]], List[ContextEntry], Optional[ChatResponse]]]] = []
+        dense_positions = []
+        for position, question in enumerate(questions):
+            with self.metrics.time_stage("lexical_fast_path"):
+                context_entries = self.vector_store.lexical_fast_path(question, k=3)
+            retrievals.append(None if context_entries is None else (None, context_entries, None))
+            if context_entries is None:
+                dense_positions.append(position)
+
+        # One observation per batch, the embedding call and the search are shared by all of its questions
+        with self.metrics.time_stage("embedding"):
+            embeddings = await self.vector_store.aembed_queries([questions[position] for position in dense_positions])
+
+        searches = []
+        for position, embedding in zip(dense_positions, embeddings):
+            cached_response = None
+            if self.answer_cache is not None:
+                with self.metrics.time_stage("answer_cache"):
+                    cached_response = self.answer_cache.get(questions[position], embedding, corpus_version)
+            if cached_response is not None:
+                self.metrics.record_answer("answer_cache")
+                retrievals[position] = (embedding, [], cached_response)
+            else:
+                searches.append((position, embedding))
+
+        if searches:
+            with self.metrics.time_stage("vector_search"):
+                results = await self.vector_store.asimilarity_search_by_vectors_with_distances(
+                    [embedding for _, embedding in searches],
+                    k=3,
+                    queries=[questions[position] for position, _ in searches],
+                )
+            for (position, embedding), scored_entries in zip(searches, results):
+                retrievals[position] = self._relevant_retrieval(embedding, scored_entries)
+        return retrievals
+
+    def _relevant_retrieval(
+        self, embedding: List[float], scored_entries: List[Tuple[ContextEntry, Optional[float]]]
+    ) -> Tuple[Optional[List[float]], List[ContextEntry], Optional[ChatResponse]]:
+        # The LLM would only refuse, so off-topic questions are refused without calling it. Chunks only BM25 found in
+        # hybrid mode have no distance and do not count, any shared word is a lexical match however off-topic
+        max_distance = self.retrieval_max_distance
+        if max_distance is not None and not any(
+            distance is not None and distance <= max_distance for _, distance in scored_entries
+        ):
+            LOOGER.info("No context within the relevance threshold, answering without the LLM.")
+            self.metrics.record_answer("no_relevant_context")
+            return embedding, [], ChatResponse(answer=NO_ANSWER_MESSAGE, sources=[])
+        return embedding, [entry for entry, _ in scored_entries], None
+
+    def close(self) -> None:
+        self.embedding_cache.close()
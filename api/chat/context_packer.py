@@ -0,0 +1,159 @@
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import tiktoken
+
+from api.shared.logger import get_logger
+from api.vector.store import ContextEntry
+
+LOGGER = get_logger(__name__)
+
+# Shorter common spans between chunks are likely coincidental rather than splitter overlap
+MIN_OVERLAP_CHARS = 32
+FALLBACK_ENCODING = "o200k_base"
+# Rough English average, only used when no tokenizer can be loaded
+FALLBACK_CHARS_PER_TOKEN = 4
+
+_token_counters: Dict[str, Callable[[str], int]] = {}
+
+
+def approximate_token_count(text: str) -> int:
+    return math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN)
+
+
+def token_counter_for(model: str) -> Callable[[str], int]:
+    """Counts tokens with the model's tiktoken encoding, approximating them if the encoding cannot be loaded."""
+    if model not in _token_counters:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+            _token_counters[model] = lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:  # noqa: BLE001
+            # tiktoken downloads encodings on first use, an offline host has to do without
+            LOGGER.warning(f"Could not load a tokenizer for {model}, approximating token counts: {e}")
+            _token_counters[model] = approximate_token_count
+    return _token_counters[model]
+
+
+def overlap_length(head: str, tail: str, min_overlap: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of head that tail starts with, 0 if shorter than min_overlap."""
+    if min(len(head), len(tail)) < min_overlap:
+        return 0
+
+    # The splitter's overlap starts at a split boundary in head, so candidates are where tail's opening shows up
+    start = head.find(tail[:min_overlap], max(0, len(head) - len(tail)))
+    while start != -1:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(tail[:min_overlap], start + 1)
+    return 0
+
+
+@dataclass
+class PackedContext:
+    entries: List[ContextEntry]
+    tokens: int
+    tokens_before: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens
+
+
+class ContextPacker:
+    """Fits retrieved chunks into a token budget.
+
+    Chunks of the same page overlapping each other, as neighbouring splitter chunks do, are merged into one entry so
+    the shared text is sent once. Entries are then added most relevant first while they fit the budget.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        token_counter: Callable[[str], int] = approximate_token_count,
+        min_overlap: int = MIN_OVERLAP_CHARS,
+    ):
+        self.token_budget = token_budget
+        self.token_counter = token_counter
+        self.min_overlap = min_overlap
+
+    def pack(self, entries: List[ContextEntry]) -> PackedContext:
+        """Packs entries given in order of relevance, the result keeping that order."""
+        entry_tokens = [self.token_counter(entry.format_entry()) for entry in entries]
+        merged = self.merge_overlapping(entries)
+
+        packed: List[ContextEntry] = []
+        tokens = 0
+        for entry in merged:
+            count = self.token_counter(entry.format_entry())
+            if self.token_budget is None or tokens + count <= self.token_budget:
+                packed.append(entry)
+                tokens += count
+            elif not packed:
+                # Answering from part of the best match beats answering from none
+                entry = self._truncate(entry, self.token_budget)
+                packed.append(entry)
+                tokens += self.token_counter(entry.format_entry())
+
+        return PackedContext(entries=packed, tokens=tokens, tokens_before=sum(entry_tokens))
+
+    def merge_overlapping(self, entries: List[ContextEntry]) -> List[ContextEntry]:
+        """Merges chunks of the same page that overlap or contain one another, keeping the rank of the better one."""
+        merged: List[ContextEntry] = []
+        for entry in entries:
+            content = entry.content
+            position = 0
+            while position < len(merged):
+                kept = merged[position]
+                combined = self._combine(kept, content) if kept.source_url == entry.source_url else None
+                if combined is None:
+                    position += 1
+                    continue
+                # The combined text may now overlap an entry it could not reach before, so it is matched again
+                del merged[position]
+                content = combined
+                position = 0
+                entry = kept
+
+            merged.append(entry.model_copy(update={"content": content}))
+        return self._restore_rank(merged, entries)
+
+    def _combine(self, kept: ContextEntry, content: str) -> Optional[str]:
+        if content in kept.content:
+            return kept.content
+        if kept.content in content:
+            return content
+
+        overlap = overlap_length(kept.content, content, self.min_overlap)
+        if overlap:
+            return kept.content + content[overlap:]
+        overlap = overlap_length(content, kept.content, self.min_overlap)
+        if overlap:
+            return content + kept.content[overlap:]
+        return None
+
+    @staticmethod
+    def _restore_rank(merged: List[ContextEntry], entries: List[ContextEntry]) -> List[ContextEntry]:
+        # A merged entry ranks where its most relevant chunk did
+        def rank(merged_entry: ContextEntry) -> int:
+            return next(
+                index
+                for index, entry in enumerate(entries)
+                if entry.source_url == merged_entry.source_url and entry.content in merged_entry.content
+            )
+
+        return sorted(merged, key=rank)
+
+    def _truncate(self, entry: ContextEntry, token_budget: int) -> ContextEntry:
+        low, high = 0, len(entry.content)
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = entry.model_copy(update={"content": entry.content[:middle]})
+            if self.token_counter(candidate.format_entry()) <= token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        return entry.model_copy(update={"content": entry.content[:low]})
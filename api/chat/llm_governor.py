@@ -0,0 +1,243 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Optional, TypeVar
+
+from api.shared.logger import get_logger
+from api.shared.retry import is_retryable_error, retry_after_seconds
+
+LOGGER = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class LlmUnavailableError(Exception):
+    """The LLM call was refused or given up on, surfaced to clients as 503 Service Unavailable."""
+
+    def __init__(self, message: str, retry_after_seconds: float = 1.0):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class LlmOverloadedError(LlmUnavailableError):
+    pass
+
+
+class CircuitOpenError(LlmUnavailableError):
+    pass
+
+
+class LlmTimeoutError(LlmUnavailableError):
+    pass
+
+
+class AdaptiveConcurrencyLimit:
+    """Concurrency limit that grows by one per limit's worth of successes and halves on overload (AIMD).
+
+    Callers over the limit wait in a FIFO queue, and once max_queue callers are waiting new ones are shed right away.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        max_queue: int = 64,
+        backoff_ratio: float = 0.5,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise LlmOverloadedError("LLM is overloaded, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter gave up, pass it on
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._has_capacity():
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake_waiters()
+
+    def on_overload(self) -> None:
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+
+class CircuitBreaker:
+    """Stops calling the LLM after failure_threshold consecutive failures, then probes it with a single call."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> bool:
+        """Raises while the circuit is open, returns whether the call is the probe of a half open circuit."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "open" or self._probe_in_flight:
+            remaining = self.reset_timeout_seconds - (time.monotonic() - self._opened_at)
+            raise CircuitOpenError("LLM is unavailable, try again later", retry_after_seconds=max(1.0, remaining))
+
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            LOGGER.info("LLM circuit closed")
+        self.consecutive_failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                LOGGER.warning(f"LLM circuit opened after {self.consecutive_failures} consecutive failures")
+            self._opened_at = time.monotonic()
+
+
+class LlmGovernor:
+    """Keeps LLM calls within an adaptive concurrency limit, a deadline, a retry budget and a circuit breaker.
+
+    Under overload callers get an LlmUnavailableError quickly instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[AdaptiveConcurrencyLimit] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        timeout_seconds: float = 30.0,
+        max_retries: int = 2,
+        initial_backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 8.0,
+    ):
+        self.limiter = limiter or AdaptiveConcurrencyLimit()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Holds a concurrency slot for one attempt and feeds its outcome to the limit and the circuit breaker."""
+        is_probe = self.circuit_breaker.before_call()
+        try:
+            await self.limiter.acquire()
+            try:
+                yield
+            except Exception as e:
+                # The LLM answered a bad request, which says nothing about its health either way
+                if is_retryable_error(e):
+                    self.limiter.on_overload()
+                    self.circuit_breaker.record_failure()
+                raise
+            else:
+                self.limiter.on_success()
+                self.circuit_breaker.record_success()
+            finally:
+                self.limiter.release()
+        finally:
+            if is_probe:
+                self.circuit_breaker.release_probe()
+
+    def _backoff_seconds(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.max_backoff_seconds, retry_after)
+        backoff = min(self.max_backoff_seconds, self.initial_backoff_seconds * 2**attempt)
+        return backoff * (0.5 + random.random() / 2)
+
+    async def _call_with_retries(self, func: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                async with self.guard():
+                    return await func()
+            except LlmUnavailableError:
+                raise
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_seconds(attempt, e)
+                attempt += 1
+                LOGGER.warning(f"LLM call failed ({e!s}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Runs func under the governor, retrying transient errors until the deadline."""
+        in_flight = False
+
+        async def attempt() -> T:
+            nonlocal in_flight
+            in_flight = True
+            try:
+                return await func()
+            except Exception:
+                # Cancelled by the deadline it is still in flight, having failed it is backing off
+                in_flight = False
+                raise
+
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                return await self._call_with_retries(attempt)
+        except TimeoutError as e:
+            # Waiting for a slot or backing off says nothing about the LLM, only an unanswered call counts
+            if in_flight:
+                self.limiter.on_overload()
+                self.circuit_breaker.record_failure()
+            raise LlmTimeoutError(f"LLM did not answer within {self.timeout_seconds}s") from e
@@ -0,0 +1,147 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+import openai
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from api.chat.llm_governor import CircuitOpenError, LlmGovernor, LlmOverloadedError, LlmTimeoutError
+
+# Lexical lookups and cache hits take about a millisecond, LLM calls tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+def error_cause(error: Exception) -> str:
+    if isinstance(error, ValueError):
+        return "invalid_request"
+    if isinstance(error, LlmOverloadedError):
+        return "llm_overloaded"
+    if isinstance(error, CircuitOpenError):
+        return "llm_circuit_open"
+    if isinstance(error, LlmTimeoutError):
+        return "llm_timeout"
+    if isinstance(error, openai.RateLimitError):
+        return "llm_rate_limited"
+    if isinstance(error, openai.APIError):
+        return "llm_error"
+    return "internal"
+
+
+class _StateCollector(Collector):
+    """Reads counters the caches and the LLM governor keep anyway, at scrape time rather than on every request."""
+
+    def __init__(self, metrics: "ChatMetrics"):
+        self.metrics = metrics
+
+    def collect(self):
+        hits = CounterMetricFamily("qna_cache_hits", "Cache lookups that found an entry", labels=["cache"])
+        misses = CounterMetricFamily("qna_cache_misses", "Cache lookups that found no entry", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("qna_cache_hit_ratio", "Share of cache lookups that hit", labels=["cache"])
+        size = GaugeMetricFamily("qna_cache_entries", "Entries held by the cache", labels=["cache"])
+        for cache, stats in self.metrics.cache_stats.items():
+            values = stats()
+            hits.add_metric([cache], values["hits"])
+            misses.add_metric([cache], values["misses"])
+            hit_ratio.add_metric([cache], values["hit_ratio"])
+            size.add_metric([cache], values["size"])
+        yield from (hits, misses, hit_ratio, size)
+
+        governor = self.metrics.llm_governor
+        if governor is None:
+            return
+        yield GaugeMetricFamily("qna_llm_calls_in_flight", "LLM calls holding a slot", value=governor.limiter.in_flight)
+        yield GaugeMetricFamily("qna_llm_calls_queued", "LLM calls waiting for a slot", value=governor.limiter.queued)
+        yield GaugeMetricFamily(
+            "qna_llm_concurrency_limit", "Current adaptive LLM concurrency limit", value=governor.limiter.limit
+        )
+        yield CounterMetricFamily("qna_llm_calls_shed", "LLM calls shed with a full queue", value=governor.limiter.shed)
+        circuit = GaugeMetricFamily("qna_llm_circuit_state", "1 for the LLM circuit's current state", labels=["state"])
+        current_state = governor.circuit_breaker.state
+        for state in CIRCUIT_STATES:
+            circuit.add_metric([state], 1.0 if state == current_state else 0.0)
+        yield circuit
+
+
+class ChatMetrics:
+    """Prometheus metrics of the chat endpoints, kept in a registry of their own and served on /metrics.
+
+    Request and stage timings are recorded as they happen; cache and LLM governor state is read only when scraped.
+    """
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        self.registry = registry or CollectorRegistry()
+        self.cache_stats: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self.llm_governor: Optional[LlmGovernor] = None
+
+        self.request_seconds = Histogram(
+            "qna_chat_request_duration_seconds",
+            "Chat request latency",
+            ["endpoint"],
+            buckets=LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.stage_seconds = Histogram(
+            "qna_chat_stage_duration_seconds",
+            "Latency of each stage answering a chat request",
+            ["stage"],
+            buckets=LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.requests_in_flight = Gauge(
+            "qna_chat_requests_in_flight", "Chat requests being answered", ["endpoint"], registry=self.registry
+        )
+        self.errors = Counter(
+            "qna_chat_errors", "Failed chat requests by cause", ["endpoint", "cause"], registry=self.registry
+        )
+        self.answers = Counter(
+            "qna_chat_answers", "Answers produced, by where they came from", ["source"], registry=self.registry
+        )
+        self.llm_tokens = Counter("qna_llm_tokens", "Tokens used by LLM completions", ["type"], registry=self.registry)
+        self.registry.register(_StateCollector(self))
+
+    @contextmanager
+    def track_request(self, endpoint: str) -> Iterator[None]:
+        in_flight = self.requests_in_flight.labels(endpoint)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_error(endpoint, e)
+            raise
+        finally:
+            in_flight.dec()
+            self.request_seconds.labels(endpoint).observe(time.perf_counter() - start)
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stage_seconds.labels(stage).observe(seconds)
+
+    def record_error(self, endpoint: str, error: Exception) -> None:
+        self.errors.labels(endpoint, error_cause(error)).inc()
+
+    def record_answer(self, source: str) -> None:
+        self.answers.labels(source).inc()
+
+    def record_llm_usage(self, usage) -> None:
+        # Streams only report usage when asked to, and compatible servers may leave it out altogether
+        if usage is None:
+            return
+        self.llm_tokens.labels("prompt").inc(usage.prompt_tokens or 0)
+        self.llm_tokens.labels("completion").inc(usage.completion_tokens or 0)
+
+    def register_cache(self, cache: str, stats: Callable[[], Dict[str, float]]) -> None:
+        self.cache_stats[cache] = stats
+
+    def register_llm_governor(self, governor: LlmGovernor) -> None:
+        self.llm_governor = governor
@@ -1,4 +1,5 @@
-from typing import List
+import json
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -15,3 +16,26 @@ class ChatResponse(BaseModel):
         ...,
         description="A list of source URLs referenced in the answer. Only include those explicitly found in the context.",
     )
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
+
+class ChatBatchItem(BaseModel):
+    question: str
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem]
+
+
+class ChatStreamEvent(BaseModel):
+    event: Literal["sources", "token", "answer", "error"]
+    data: dict
+
+    def encode(self) -> str:
+        """Formats the event as a Server-Sent Events message."""
+        return f"event: {self.event}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n"
@@ -1,33 +1,111 @@
+from jiter import from_json
 from openai import AsyncOpenAI, BaseModel
-from typing import Type
+from typing import AsyncIterator, Optional, Type, Union
 
+from api.chat.llm_governor import LlmGovernor
+from api.chat.metrics import ChatMetrics
 from api.shared.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
 
+def partial_field_text(snapshot: str, field: str) -> Optional[str]:
+    """Reads a string field out of a partially generated JSON object, including a not yet closed value."""
+    try:
+        partial = from_json(snapshot.encode("utf-8"), partial_mode="trailing-strings")
+    except ValueError:
+        # Not even valid as a JSON prefix, the final parsed response still carries the whole answer
+        return None
+    value = partial.get(field) if isinstance(partial, dict) else None
+    return value if isinstance(value, str) else None
+
+
+class LlmResponseError(Exception):
+    """The LLM finished without a response matching the schema, because it refused or the output did not parse."""
+
+
+def parsed_message(completion) -> BaseModel:
+    message = completion.choices[0].message
+    if message.parsed is None:
+        refusal = getattr(message, "refusal", None)
+        raise LlmResponseError(f"LLM response could not be parsed{f', it refused: {refusal}' if refusal else ''}")
+    return message.parsed
+
+
 class OpenAiLlmWrapper:
-    def __init__(self, api_key: str, model: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        governor: Optional[LlmGovernor] = None,
+        base_url: Optional[str] = None,
+        metrics: Optional[ChatMetrics] = None,
+    ):
         self.system_message = None
         self.api_key = api_key
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        self.governor = governor or LlmGovernor()
+        self.metrics = metrics
+        # Retries and deadlines are the governor's job, SDK retries would multiply its retry budget
+        self.client = AsyncOpenAI(
+            api_key=self.api_key, base_url=base_url, max_retries=0, timeout=self.governor.timeout_seconds
+        )
         self.model = model
 
     def set_system_message(self, system_message: str):
         self.system_message = system_message
 
+    def _messages(self, user_message: str) -> list:
+        return [
+            {"role": "system", "content": self.system_message},
+            {"role": "user", "content": user_message},
+        ]
+
     async def ask_structured(self, user_message: str, schema: Type[BaseModel]) -> Type[BaseModel]:
         try:
-            completion = await self.client.chat.completions.parse(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_message},
-                    {"role": "user", "content": user_message},
-                ],
-                response_format=schema,
+            completion = await self.governor.call(
+                lambda: self.client.chat.completions.parse(
+                    model=self.model,
+                    messages=self._messages(user_message),
+                    response_format=schema,
+                )
             )
-            parsed = completion.choices[0].message.parsed
-            return parsed
+            if self.metrics is not None:
+                self.metrics.record_llm_usage(completion.usage)
+            return parsed_message(completion)
         except Exception as e:  # noqa: BLE001
             LOGGER.error(f"Error during ask_structured(): {e!s}")
             raise e
+
+    async def stream_structured(
+        self, user_message: str, schema: Type[BaseModel], text_field: str
+    ) -> AsyncIterator[Union[str, BaseModel]]:
+        """Streams a structured completion, yielding the text of text_field as it grows and then the parsed schema.
+
+        The stream holds a governor slot but is not retried, its first tokens may already have been sent.
+        """
+        try:
+            async with (
+                self.governor.guard(),
+                self.client.chat.completions.stream(
+                    model=self.model,
+                    messages=self._messages(user_message),
+                    response_format=schema,
+                    stream_options={"include_usage": True},
+                ) as stream,
+            ):
+                streamed_text = ""
+                async for event in stream:
+                    if event.type != "content.delta":
+                        continue
+                    text = partial_field_text(event.snapshot, text_field)
+                    if text is not None and len(text) > len(streamed_text) and text.startswith(streamed_text):
+                        yield text[len(streamed_text) :]
+                        streamed_text = text
+
+                completion = await stream.get_final_completion()
+            if self.metrics is not None:
+                self.metrics.record_llm_usage(completion.usage)
+            yield parsed_message(completion)
+        except Exception as e:  # noqa: BLE001
+            LOGGER.error(f"Error during stream_structured(): {e!s}")
+            raise e
@@ -1,11 +1,18 @@
-from typing import List
+from typing import List, Optional
 
 
+from api.chat.context_packer import ContextPacker
+from api.shared.logger import get_logger
 from api.vector.store import ContextEntry
 
+LOGGER = get_logger(__name__)
+
+NO_ANSWER_MESSAGE = "I cannot provide an answer to your query."
+
 
 class PromptBuilder:
-    def __init__(self):
+    def __init__(self, context_packer: Optional[ContextPacker] = None):
+        self.context_packer = context_packer
         self.system_message = (
             "You are a helpful and knowledgeable assistant tasked with answering user queries based strictly on the provided context. "
             "The input format will consist of multiple sections in the following structure:\n\n"
@@ -21,7 +28,7 @@ class PromptBuilder:
             "If a URL within the context supports or relates to your answer, include it in your response.\n\n"
             "Rules:\n"
             "1. Use only the information explicitly contained in the provided context. Do NOT make up facts, assumptions, or external details.\n"
-            "2. If the context does not contain enough information to answer the user’s question, respond with: 'I cannot provide an answer to your query.'\n"
+            f"2. If the context does not contain enough information to answer the user’s question, respond with: '{NO_ANSWER_MESSAGE}'\n"
             "3. Always be polite and professional.\n"
             "4. Keep answers short, clear, and concise.\n"
             "5. When relevant, include URLs encapsulated with () found in the context that directly support your answer.\n"
@@ -33,8 +40,22 @@ class PromptBuilder:
     def get_system_message(self) -> str:
         return self.system_message
 
+    def pack_context(self, context: List[ContextEntry]) -> List[ContextEntry]:
+        if self.context_packer is None or not context:
+            return context
+
+        packed = self.context_packer.pack(context)
+        LOGGER.info(
+            f"Packed {len(context)} context chunks into {len(packed.entries)}: "
+            f"{packed.tokens} tokens, {packed.tokens_saved} saved"
+        )
+        return packed.entries
+
+    def build_user_message(self, query: str, context: List[ContextEntry]) -> str:
+        return self.format_user_message(query, self.pack_context(context))
+
     @staticmethod
-    def build_user_message(query: str, context: List[ContextEntry]) -> str:
+    def format_user_message(query: str, context: List[ContextEntry]) -> str:
         user_prompt = "".join(entry.format_entry() for entry in context)
         user_prompt += f"### User Question\n{query}\n"
         return user_prompt
@@ -1,11 +1,14 @@
-from typing import Annotated
+import math
+from typing import Annotated, AsyncIterator
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from fastapi_injector import Injected
 from fastapi import HTTPException
 
 from api.chat.chat_service import ChatService
-from api.chat.models import ChatRequest
+from api.chat.llm_governor import LlmUnavailableError
+from api.chat.models import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatStreamEvent
 from api.shared.logger import get_logger
 
 LOGGER = get_logger(__name__)
@@ -16,6 +19,13 @@ router = APIRouter(
 )
 
 
+def _service_unavailable(error: LlmUnavailableError) -> HTTPException:
+    # Shed requests are cheap to reject, Retry-After keeps well-behaved clients from retrying straight away
+    return HTTPException(
+        status_code=503, detail=str(error), headers={"Retry-After": str(math.ceil(error.retry_after_seconds))}
+    )
+
+
 @router.post("/")
 async def chat_endpoint(
     request: ChatRequest,
@@ -25,6 +35,60 @@ async def chat_endpoint(
         return await chat_handler.chat(request)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except LlmUnavailableError as e:
+        raise _service_unavailable(e)
     except Exception as e:
         LOGGER.info(f"Chat endpoint error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/batch")
+async def chat_batch_endpoint(
+    request: ChatBatchRequest,
+    chat_handler: Annotated[ChatService, Injected(ChatService)],
+) -> ChatBatchResponse:
+    try:
+        return await chat_handler.chat_batch(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LlmUnavailableError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        LOGGER.info(f"Chat batch endpoint error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    chat_handler: Annotated[ChatService, Injected(ChatService)],
+):
+    events = chat_handler.chat_stream(request)
+    # Retrieval runs before the response starts, so its errors still get a proper status code
+    try:
+        first_event = await anext(events)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LlmUnavailableError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        LOGGER.info(f"Chat stream endpoint error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return StreamingResponse(
+        _encode_events(first_event, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _encode_events(first_event: ChatStreamEvent, events: AsyncIterator[ChatStreamEvent]) -> AsyncIterator[str]:
+    yield first_event.encode()
+    try:
+        async for event in events:
+            yield event.encode()
+    except LlmUnavailableError as e:
+        yield ChatStreamEvent(event="error", data={"detail": str(e)}).encode()
+    except Exception as e:
+        LOGGER.info(f"Chat stream error: {e}")
+        yield ChatStreamEvent(event="error", data={"detail": "Internal server error"}).encode()
@@ -0,0 +1,17 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Response
+from fastapi_injector import Injected
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from api.chat.metrics import ChatMetrics
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+
+# Served without a trailing slash, the path Prometheus scrapes by default
+@router.get("/metrics")
+async def metrics_endpoint(metrics: Annotated[ChatMetrics, Injected(ChatMetrics)]) -> Response:
+    return Response(content=generate_latest(metrics.registry), media_type=CONTENT_TYPE_LATEST)
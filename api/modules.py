@@ -3,6 +3,7 @@ import os
 from injector import Module, provider, singleton
 
 from api.chat.chat_service import ChatService
+from api.chat.metrics import ChatMetrics
 from paths import ROOT_DIR
 from api.shared.configs import Configs
 
@@ -26,8 +27,13 @@ class AppModule(Module):
 
     @provider
     @singleton
-    def provide_chat_service(self, configs: Configs) -> ChatService:
-        return ChatService(configs=configs)
+    def provide_chat_metrics(self) -> ChatMetrics:
+        return ChatMetrics()
+
+    @provider
+    @singleton
+    def provide_chat_service(self, configs: Configs, metrics: ChatMetrics) -> ChatService:
+        return ChatService(configs=configs, metrics=metrics)
 
 
 def create_modules():
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -22,6 +22,152 @@ class Configs(BaseSettings):
         description="Model name for OpenAI",
         default="gpt-4.1-2025-04-14",
     )
+    openai_base_url: Optional[str] = Field(
+        description="Base URL of an OpenAI compatible API, such as the local fake server used for load tests",
+        default=None,
+    )
     scraped_data_path: str = Field(
-        description="Path of the scraped data file",
+        description="Path of the scraped data file, a JSON array or JSONL",
+    )
+    vector_index_engine: Literal["chroma", "flat"] = Field(
+        description="Index engine behind the vector store: persistent Chroma or the in-process NumPy flat index",
+        default="chroma",
+    )
+    retrieval_mode: Literal["dense", "hybrid"] = Field(
+        description="Dense vector retrieval only, or dense fused with BM25 lexical retrieval",
+        default="dense",
+    )
+    lexical_fast_path_enabled: bool = Field(
+        description="Serve purely lexical results without embedding the query when the BM25 top hit is strong",
+        default=False,
+    )
+    lexical_fast_path_min_confidence: float = Field(
+        description="Minimum normalized BM25 score (0..1) of the top hit for the lexical fast path",
+        default=0.8,
+    )
+    retrieval_max_distance: Optional[float] = Field(
+        description="Questions with no chunk within this squared L2 distance (2 - 2 * cosine) of them are refused "
+        "without calling the LLM. Unset uses the embedding model's calibrated threshold, 0.5 for "
+        "text-embedding-ada-002 and none for other models, 4 lets every question through",
+        default=None,
+    )
+    vector_search_max_workers: int = Field(
+        description="Size of the thread pool that runs blocking vector store queries off the event loop",
+        default=4,
+    )
+    embedding_provider: Literal["openai", "sentence_transformers"] = Field(
+        description="Backend used to embed documents and queries",
+        default="openai",
+    )
+    embedding_model: Optional[str] = Field(
+        description="Embedding model name, defaults to the provider's default model",
+        default=None,
+    )
+    embedding_device: str = Field(
+        description="Device the local sentence-transformers model runs on",
+        default="cpu",
+    )
+    embedding_batch_size: int = Field(
+        description="Number of texts the local sentence-transformers model encodes per batch",
+        default=64,
+    )
+    embedding_cache_size: int = Field(
+        description="Maximum number of query embeddings kept in the LRU cache",
+        default=10_000,
+    )
+    embedding_cache_ttl_seconds: Optional[float] = Field(
+        description="Time after which a cached query embedding expires, no expiry if unset",
+        default=7 * 24 * 60 * 60,
+    )
+    embedding_cache_path: Optional[str] = Field(
+        description="Path of the SQLite file the query embedding cache is persisted to, in-memory only if unset",
+        default=None,
+    )
+    embedding_batch_window_ms: float = Field(
+        description="Window in which concurrent query embeddings are collected into one API call, 0 disables batching",
+        default=5.0,
+    )
+    embedding_max_batch_size: int = Field(
+        description="Maximum number of queries embedded in one batched API call",
+        default=64,
+    )
+    ingestion_batch_size: int = Field(
+        description="Number of chunks embedded per API call during ingestion",
+        default=128,
+    )
+    ingestion_max_workers: int = Field(
+        description="Maximum number of embedding batches in flight during ingestion",
+        default=4,
+    )
+    crawl_manifest_enabled: bool = Field(
+        description="Sync only the pages listed in the re-crawl manifest next to the scraped data, when it is current",
+        default=False,
+    )
+    ingestion_stream_batch_size: int = Field(
+        description="Number of scraped entries read, cleaned and indexed together while streaming the scraped data",
+        default=500,
+    )
+    preprocessing_max_workers: int = Field(
+        description="Worker processes cleaning and splitting the scraped data, 1 keeps preprocessing in-process",
+        default=1,
+    )
+    answer_cache_enabled: bool = Field(
+        description="Whether answers are reused for questions semantically close to an already answered one",
+        default=True,
+    )
+    answer_cache_similarity_threshold: float = Field(
+        description="Minimum cosine similarity between question embeddings for a cached answer to be reused",
+        default=0.95,
+    )
+    answer_cache_size: int = Field(
+        description="Maximum number of answers kept in the semantic answer cache",
+        default=1024,
+    )
+    answer_cache_ttl_seconds: Optional[float] = Field(
+        description="Time after which a cached answer expires, no expiry if unset",
+        default=60 * 60,
+    )
+    context_packing_enabled: bool = Field(
+        description="Merge overlapping chunks of the same page and fit the prompt context into a token budget",
+        default=True,
+    )
+    context_token_budget: int = Field(
+        description="Maximum tokens of retrieved context in a prompt, 0 for no limit",
+        default=2000,
+    )
+    llm_timeout_seconds: float = Field(
+        description="Deadline of one LLM call including queueing and retries",
+        default=30.0,
+    )
+    llm_max_retries: int = Field(
+        description="Retries of an LLM call failing with a timeout, connection error, 429 or 5xx",
+        default=2,
+    )
+    llm_initial_concurrency: int = Field(
+        description="Concurrent LLM calls allowed at start-up, adapted to how the LLM copes afterwards",
+        default=16,
+    )
+    llm_max_concurrency: int = Field(
+        description="Upper bound of the adaptive LLM concurrency limit",
+        default=64,
+    )
+    llm_max_queue_size: int = Field(
+        description="LLM calls allowed to wait for a slot, further calls are rejected with 503",
+        default=64,
+    )
+    llm_circuit_failure_threshold: int = Field(
+        description="Consecutive failed LLM calls after which calls are rejected with 503 until the LLM recovers",
+        default=5,
+    )
+    llm_circuit_reset_seconds: float = Field(
+        description="Time the LLM circuit stays open before a single call probes whether it recovered",
+        default=30.0,
+    )
+    chat_batch_max_questions: int = Field(
+        description="Maximum number of questions accepted by one batch chat request",
+        default=256,
+    )
+    chat_batch_llm_concurrency: int = Field(
+        description="Maximum LLM calls in flight for one batch chat request",
+        default=8,
     )
@@ -0,0 +1,55 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def create_process_pool(max_workers: int, preload: Sequence[str] = ()) -> ProcessPoolExecutor:
+    """Process pool whose workers never fork the parent, which runs thread pools and an event loop.
+
+    Where available workers come from a fork server that imports the preload modules once, so each worker starts in
+    milliseconds instead of importing langchain again.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(list(preload))
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def ordered_parallel_map(
+    executor: Executor,
+    func: Callable[[List[T]], List[R]],
+    items: Iterable[T],
+    chunk_size: int,
+    max_pending: int,
+) -> Iterator[R]:
+    """Runs func over chunks of items on the executor and yields the flattened results in input order.
+
+    Unlike Executor.map the input is not consumed upfront, at most max_pending chunks are in flight at once.
+    """
+    iterator = iter(items)
+    pending: Deque[Future] = deque()
+
+    def submit_next() -> bool:
+        chunk = list(islice(iterator, chunk_size))
+        if chunk:
+            pending.append(executor.submit(func, chunk))
+        return bool(chunk)
+
+    while len(pending) < max_pending and submit_next():
+        pass
+
+    try:
+        while pending:
+            results = pending.popleft().result()
+            submit_next()
+            yield from results
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,20 @@
+from typing import Optional
+
+import openai
+
+
+def is_retryable_error(error: Exception) -> bool:
+    # Timeouts and dropped connections carry no status code but are as transient as a 503
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    # openai.RateLimitError and httpx style errors both expose the status code
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Groups concurrent async query embeddings into a single embedding API call."""
+
+    def __init__(self, embeddings: Embeddings, window_seconds: float = 0.005, max_batch_size: int = 64):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.queries = 0
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The event loop only holds weak references to tasks, an unreferenced batch could be collected mid-flight
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._embed_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.queries += len(batch)
+
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:  # noqa: BLE001
+            LOGGER.warning(f"Embedding batch of {len(texts)} queries failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        vectors_by_text: Dict[str, List[float]] = dict(zip(texts, vectors))
+        for text, future in batch:
+            # A waiter may have been cancelled while its batch was in flight
+            if not future.done():
+                future.set_result(vectors_by_text[text])
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "average_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,171 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel
+
+from api.shared.logger import get_logger
+from api.shared.retry import is_retryable_error, retry_after_seconds
+
+LOGGER = get_logger(__name__)
+
+CommitBatch = Callable[[List[Document], List[List[float]]], None]
+
+
+class BulkEmbeddingResult(BaseModel):
+    embedded_chunks: int
+    batches: int
+    retries: int
+    elapsed_seconds: float
+    chunks_per_second: float
+
+
+class IngestionCheckpoint:
+    """Progress of a running ingestion, kept on disk until the run completes.
+
+    Committed batches live in the index under content-hash ids, so an interrupted run resumes by syncing again, which
+    skips every chunk already stored. The checkpoint records how far the previous run got.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, float]]:
+        if not self.path.exists():
+            return None
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Ignoring unreadable ingestion checkpoint {self.path}: {e}")
+            return None
+
+    def save(self, total_chunks: int, committed_chunks: int) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"total_chunks": total_chunks, "committed_chunks": committed_chunks, "updated_at": time.time()}),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class BulkEmbedder:
+    """Embeds chunks in batches on a bounded pool, backing off on rate limits and committing batches as they finish."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 128,
+        max_workers: int = 4,
+        max_retries: int = 6,
+        initial_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        # A rate limit hit by one worker pauses all of them, otherwise the others keep hammering the API
+        self._paused_until = 0.0
+        self._retries = 0
+        self._lock = threading.Lock()
+
+    def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _back_off(self, error: Exception, attempt: int) -> None:
+        delay = retry_after_seconds(error)
+        if delay is None:
+            backoff = min(self.max_backoff_seconds, self.initial_backoff_seconds * 2**attempt)
+            delay = backoff * (0.5 + random.random() / 2)
+
+        with self._lock:
+            self._retries += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        LOGGER.warning(f"Embedding batch failed ({error}), retrying in {delay:.1f}s")
+
+    def _embed_batch(self, batch: List[Document]) -> List[List[float]]:
+        texts = [chunk.page_content for chunk in batch]
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                self._back_off(e, attempt)
+
+    def embed(
+        self, chunks: List[Document], commit: CommitBatch, checkpoint: Optional[IngestionCheckpoint] = None
+    ) -> BulkEmbeddingResult:
+        batches = [chunks[start : start + self.batch_size] for start in range(0, len(chunks), self.batch_size)]
+        if checkpoint is not None:
+            previous = checkpoint.load()
+            if previous is not None:
+                LOGGER.info(
+                    f"Resuming interrupted ingestion, the previous run committed "
+                    f"{previous['committed_chunks']} of {previous['total_chunks']} chunks"
+                )
+            checkpoint.save(len(chunks), 0)
+
+        self._retries = 0
+        committed = 0
+        started_at = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-embedding")
+        try:
+            pending: Dict[Future, List[Document]] = {
+                executor.submit(self._embed_batch, batch): batch for batch in batches
+            }
+            error: Optional[BaseException] = None
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    if future.exception() is not None:
+                        if error is None:
+                            error = future.exception()
+                            # Batches not started yet are dropped, the running ones are waited for and committed
+                            for queued in [queued for queued in pending if queued.cancel()]:
+                                del pending[queued]
+                        continue
+
+                    # Committed one batch at a time from this thread, so index writes never interleave
+                    commit(batch, future.result())
+                    committed += len(batch)
+                    if checkpoint is not None:
+                        checkpoint.save(len(chunks), committed)
+
+                    elapsed = time.perf_counter() - started_at
+                    LOGGER.info(f"Embedded {committed}/{len(chunks)} chunks ({committed / elapsed:.1f} chunks/s)")
+
+            # Raised only once no batch is running, so no paid for embedding is thrown away
+            if error is not None:
+                raise error
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if checkpoint is not None:
+            checkpoint.clear()
+
+        elapsed = time.perf_counter() - started_at
+        return BulkEmbeddingResult(
+            embedded_chunks=committed,
+            batches=len(batches),
+            retries=self._retries,
+            elapsed_seconds=elapsed,
+            chunks_per_second=committed / elapsed if elapsed > 0 else 0.0,
+        )
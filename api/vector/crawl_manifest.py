@@ -0,0 +1,73 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint_file(path: Path) -> Optional[str]:
+    """SHA-256 of a file's bytes, None when there is no file."""
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CrawlManifest(BaseModel):
+    """Pages a conditional re-crawl changed or removed, written by the scraper next to its output.
+
+    The changes take the scraped data from base_fingerprint to data_fingerprint. Each re-crawl overwrites the
+    manifest, so it only describes the last step and is of use only to an index holding exactly the base data.
+    """
+
+    changed: List[str] = Field(default_factory=list)
+    removed: List[str] = Field(default_factory=list)
+    unchanged: int = 0
+    generated_at: float = Field(default_factory=time.time)
+    base_fingerprint: Optional[str] = None
+    data_fingerprint: Optional[str] = None
+
+    @property
+    def affected_urls(self) -> Set[str]:
+        return set(self.changed) | set(self.removed)
+
+    @staticmethod
+    def path_for(data_path: Path) -> Path:
+        return data_path.with_name(f"{data_path.stem}.manifest.json")
+
+    @classmethod
+    def load(cls, path: Path) -> "CrawlManifest":
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(**json.load(file))
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
+        tmp_path.replace(path)
+
+
+class AppliedCrawl(BaseModel):
+    """Fingerprint of the scraped data the vector store was last synced with, kept next to the index."""
+
+    data_fingerprint: str
+    applied_at: float = Field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["AppliedCrawl"]:
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(**json.load(file))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
+        tmp_path.replace(path)
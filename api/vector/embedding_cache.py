@@ -0,0 +1,206 @@
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class EmbeddingCache:
+    """LRU cache of query embeddings, optionally persisted to SQLite.
+
+    Lookups and inserts only touch memory. Changes are written to SQLite by a background thread every
+    flush_interval_seconds in a single transaction, so the request path never waits for a disk commit. Changes of the
+    last interval are lost on a crash, which for a cache only costs re-embedding those queries.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+        persist_path: Optional[Path] = None,
+        flush_interval_seconds: float = 1.0,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.flush_interval_seconds = flush_interval_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[CacheKey, Tuple[float, List[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Statements waiting for the writer thread, in the order the changes were made
+        self._pending_writes: List[Tuple[str, tuple]] = []
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        if self.persist_path is not None:
+            self._connection = self._open_persistent_store(self.persist_path)
+            self._load_persisted_entries()
+            threading.Thread(target=self._write_behind, name="embedding-cache-writer", daemon=True).start()
+
+    @staticmethod
+    def _open_persistent_store(persist_path: Path) -> sqlite3.Connection:
+        persist_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(persist_path), check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, created_at REAL NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, query))"
+        )
+        connection.commit()
+        return connection
+
+    def _load_persisted_entries(self) -> None:
+        if self.ttl_seconds is not None:
+            self._connection.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._connection.commit()
+
+        rows = self._connection.execute(
+            "SELECT model, query, created_at, vector FROM query_embeddings ORDER BY created_at DESC LIMIT ?",
+            (self.max_size,),
+        ).fetchall()
+        for model, query, created_at, blob in reversed(rows):
+            self._entries[(model, query)] = (created_at, array("d", blob).tolist())
+
+        LOGGER.info(f"Loaded {len(self._entries)} cached query embeddings from {self.persist_path}")
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = (model, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry[0]):
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model: str, query: str, vector: List[float]) -> None:
+        key = (model, normalize_query(query))
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (created_at, vector)
+            self._entries.move_to_end(key)
+            self._write(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, created_at, vector) VALUES (?, ?, ?, ?)",
+                (key[0], key[1], created_at, array("d", vector).tobytes()),
+            )
+
+            while len(self._entries) > self.max_size:
+                self._delete(next(iter(self._entries)))
+
+    def _delete(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        self._write("DELETE FROM query_embeddings WHERE model = ? AND query = ?", key)
+
+    def _write(self, statement: str, parameters: tuple) -> None:
+        if self._connection is not None:
+            self._pending_writes.append((statement, parameters))
+
+    def _write_behind(self) -> None:
+        while not self._closed.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                LOGGER.warning(f"Failed to persist query embeddings to {self.persist_path}: {e}")
+
+    def flush(self) -> None:
+        """Writes the pending changes to SQLite in one transaction."""
+        # Taken first, so a concurrent flush can not commit later changes before earlier ones
+        with self._write_lock:
+            with self._lock:
+                pending_writes, self._pending_writes = self._pending_writes, []
+            if not pending_writes or self._connection is None:
+                return
+            for statement, parameters in pending_writes:
+                self._connection.execute(statement, parameters)
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Stops the writer thread after writing what is still pending."""
+        if self._connection is None:
+            return
+        self._closed.set()
+        self.flush()
+        with self._write_lock:
+            self._connection.close()
+            self._connection = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending_writes.clear()
+            self._write("DELETE FROM query_embeddings", ())
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Puts an EmbeddingCache in front of the query embedder; document embeddings pass straight through."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model_name, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(self.model_name, text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model_name, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(self.model_name, text, vector)
+        return vector
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeds many queries, the ones missing from the cache in a single call."""
+        vectors = [self.cache.get(self.model_name, text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+            for text, vector in embedded.items():
+                self.cache.put(self.model_name, text, vector)
+            vectors = [embedded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
@@ -0,0 +1,94 @@
+import asyncio
+import re
+from typing import List, Literal, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+EmbeddingProvider = Literal["openai", "sentence_transformers"]
+
+DEFAULT_EMBEDDING_MODELS = {
+    "openai": "text-embedding-ada-002",
+    "sentence_transformers": "sentence-transformers/all-MiniLM-L6-v2",
+}
+
+# Squared L2 distances between normalized embeddings, 2 - 2 * cosine. ada-002 puts even unrelated texts at a cosine
+# of about 0.7, so 0.5 (cosine 0.75) separates on-topic questions; other models spread their similarities
+# differently and get no threshold until one is calibrated for them.
+DEFAULT_MAX_DISTANCES = {
+    "text-embedding-ada-002": 0.5,
+}
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Runs a sentence-transformers model locally, loaded once and encoding in batches."""
+
+    def __init__(self, model_name: str, device: str = "cpu", batch_size: int = 64):
+        # Imported lazily, loading torch is only worth it when the local backend is selected
+        from sentence_transformers import SentenceTransformer
+
+        self.model = model_name
+        self.device = device
+        self.batch_size = batch_size
+
+        LOGGER.info(f"Loading sentence-transformers model {model_name} on {device}")
+        self._model = SentenceTransformer(model_name, device=device)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        vectors = self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def resolve_embedding_model(provider: EmbeddingProvider, model: Optional[str] = None) -> str:
+    return model or DEFAULT_EMBEDDING_MODELS[provider]
+
+
+def create_embeddings(
+    provider: EmbeddingProvider,
+    model: Optional[str] = None,
+    openai_api_key: Optional[str] = None,
+    device: str = "cpu",
+    batch_size: int = 64,
+    openai_base_url: Optional[str] = None,
+) -> Embeddings:
+    model = resolve_embedding_model(provider, model)
+
+    if provider == "openai":
+        return OpenAIEmbeddings(model=model, openai_api_key=openai_api_key, openai_api_base=openai_base_url)
+    if provider == "sentence_transformers":
+        return SentenceTransformerEmbeddings(model, device=device, batch_size=batch_size)
+
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+def collection_name_for(provider: EmbeddingProvider, model: Optional[str] = None) -> str:
+    """Chroma collection holding the embeddings of one model, so vectors of different models are never mixed."""
+    name = f"{provider}-{resolve_embedding_model(provider, model)}"
+    return re.sub(r"[^a-zA-Z0-9._-]+", "-", name).strip("-._")[:512]
+
+
+def default_max_distance(provider: EmbeddingProvider, model: Optional[str] = None) -> Optional[float]:
+    """Relevance threshold calibrated for the embedding model, None if there is none."""
+    return DEFAULT_MAX_DISTANCES.get(resolve_embedding_model(provider, model))
@@ -0,0 +1,302 @@
+import json
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as LangchainVectorStore
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+EMBEDDINGS_FILE_NAME = "embeddings.npy"
+METADATA_FILE_NAME = "metadata.jsonl"
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Rows and chunks of the index as one search sees them, replaced as a whole on every change.
+
+    The lists are shared with later snapshots and only appended to in place, chunks past size are not visible yet.
+    """
+
+    buffer: np.ndarray
+    size: int
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        # Rows past size are spare capacity
+        return self.buffer[: self.size]
+
+    def document(self, position: int) -> Document:
+        return Document(id=self.ids[position], page_content=self.texts[position], metadata=self.metadatas[position])
+
+
+class FlatIndex(LangchainVectorStore):
+    """Exact in-process vector index holding every chunk embedding in one contiguous float32 matrix.
+
+    Rows are normalized on insert, so top-k is a single matrix-vector product followed by argpartition. Scores are
+    squared L2 distances between the normalized vectors (2 - 2 * cosine), matching Chroma's default l2 space.
+
+    The matrix grows by doubling its capacity, so appending is amortized O(rows added). Changes are written to
+    persist_directory only by flush(), once at the end of a bulk load rather than after every batch.
+    """
+
+    def __init__(self, embedding_function: Embeddings, persist_directory: Optional[Path] = None):
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+
+        # Searches read _snapshot once and without the lock, writers swap it in a single assignment
+        self._snapshot = _Snapshot(np.empty((0, 0), dtype=np.float32), 0, [], [], [])
+        self._dirty = False
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if self.persist_directory is not None and (self.persist_directory / EMBEDDINGS_FILE_NAME).exists():
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def count(self) -> int:
+        return self._snapshot.size
+
+    @property
+    def _matrix(self) -> np.ndarray:
+        return self._snapshot.matrix
+
+    @staticmethod
+    def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding_function.embed_documents(texts), metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        if not texts:
+            return []
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            snapshot = self._snapshot
+            size = snapshot.size
+            # Chunks a search can see are only changed in copies of the lists, new ones are appended in place
+            replacing = any(id_ in self._positions for id_ in ids)
+            all_ids = list(snapshot.ids) if replacing else snapshot.ids
+            all_texts = list(snapshot.texts) if replacing else snapshot.texts
+            all_metadatas = list(snapshot.metadatas) if replacing else snapshot.metadatas
+
+            # Ids already in the index are replaced, the rest are appended
+            new_rows = []
+            replaced_rows = {}
+            for id_, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                position = self._positions.get(id_)
+                if position is None:
+                    self._positions[id_] = len(all_ids)
+                    all_ids.append(id_)
+                    all_texts.append(text)
+                    all_metadatas.append(metadata)
+                    new_rows.append(vector)
+                else:
+                    all_texts[position] = text
+                    all_metadatas[position] = metadata
+                    if position < size:
+                        replaced_rows[position] = vector
+                    else:
+                        new_rows[position - size] = vector
+
+            buffer = self._reserve(size + len(new_rows), vectors.shape[1], copy=bool(replaced_rows))
+            for position, vector in replaced_rows.items():
+                buffer[position] = vector
+            if new_rows:
+                buffer[size : size + len(new_rows)] = new_rows
+            self._snapshot = _Snapshot(buffer, size + len(new_rows), all_ids, all_texts, all_metadatas)
+            self._dirty = True
+
+        return ids
+
+    def _reserve(self, rows: int, dimension: int, copy: bool) -> np.ndarray:
+        """The buffer to write rows into, reallocated with double the capacity when full.
+
+        Searches read the current snapshot without the lock, so existing rows are only overwritten in a copy. A
+        memory-mapped index is read-only and copied on the first write.
+        """
+        snapshot = self._snapshot
+        capacity = snapshot.buffer.shape[0]
+        if rows <= capacity and not copy and snapshot.buffer.flags.writeable:
+            return snapshot.buffer
+
+        buffer = np.empty((max(rows, 2 * capacity) if rows > capacity else capacity, dimension), dtype=np.float32)
+        if snapshot.size:
+            buffer[: snapshot.size] = snapshot.matrix
+        return buffer
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+
+        with self._lock:
+            removed = {self._positions[id_] for id_ in ids if id_ in self._positions}
+            if not removed:
+                return False
+
+            snapshot = self._snapshot
+            keep = [position for position in range(snapshot.size) if position not in removed]
+            self._snapshot = _Snapshot(
+                np.ascontiguousarray(snapshot.matrix[keep]),
+                len(keep),
+                [snapshot.ids[position] for position in keep],
+                [snapshot.texts[position] for position in keep],
+                [snapshot.metadatas[position] for position in keep],
+            )
+            self._positions = {id_: position for position, id_ in enumerate(self._snapshot.ids)}
+            self._dirty = True
+
+        return True
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Same shape as Chroma.get so VectorStore can inspect either engine."""
+        with self._lock:
+            snapshot = self._snapshot
+            positions = (
+                range(snapshot.size) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+            )
+        return {
+            "ids": [snapshot.ids[position] for position in positions],
+            "documents": [snapshot.texts[position] for position in positions],
+            "metadatas": [snapshot.metadatas[position] for position in positions],
+        }
+
+    @staticmethod
+    def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+        if k >= similarities.shape[-1]:
+            return np.argsort(-similarities, axis=-1)
+
+        candidates = np.argpartition(-similarities, k - 1, axis=-1)[..., :k]
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=-1)
+        return np.take_along_axis(candidates, np.argsort(-candidate_scores, axis=-1), axis=-1)
+
+    def similarity_search_by_vectors_with_score(
+        self, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Tuple[Document, float]]]:
+        queries = self._normalize_rows(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        snapshot = self._snapshot
+        if not snapshot.size or k <= 0:
+            return [[] for _ in queries]
+
+        similarities = queries @ snapshot.matrix.T
+        top_positions = self._top_k(similarities, k)
+        return [
+            [(snapshot.document(int(position)), float(2.0 - 2.0 * row[position])) for position in positions]
+            for row, positions in zip(similarities, top_positions)
+        ]
+
+    def similarity_search_by_vectors(self, embeddings: Sequence[Sequence[float]], k: int = 4) -> List[List[Document]]:
+        return [
+            [document for document, _ in results]
+            for results in self.similarity_search_by_vectors_with_score(embeddings, k=k)
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors_with_score([embedding], k=k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k=k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding_function.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
+
+    def flush(self) -> None:
+        """Writes the index to persist_directory, if it changed since the last flush."""
+        with self._lock:
+            if self._dirty:
+                self._persist()
+                self._dirty = False
+
+    def _persist(self) -> None:
+        if self.persist_directory is None:
+            return
+
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        embeddings_path = self.persist_directory / EMBEDDINGS_FILE_NAME
+        metadata_path = self.persist_directory / METADATA_FILE_NAME
+
+        # Written to temporary files first so a crash never leaves a half-written index behind
+        snapshot = self._snapshot
+        tmp_embeddings_path = embeddings_path.with_suffix(".tmp.npy")
+        np.save(tmp_embeddings_path, snapshot.matrix)
+        tmp_metadata_path = metadata_path.with_suffix(".tmp")
+        with open(tmp_metadata_path, "w", encoding="utf-8") as file:
+            for id_, text, metadata in zip(snapshot.ids, snapshot.texts, snapshot.metadatas):
+                file.write(json.dumps({"id": id_, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+        tmp_metadata_path.replace(metadata_path)
+        tmp_embeddings_path.replace(embeddings_path)
+
+    def _load(self) -> None:
+        matrix = np.load(self.persist_directory / EMBEDDINGS_FILE_NAME, mmap_mode="r")
+        ids, texts, metadatas = [], [], []
+        with open(self.persist_directory / METADATA_FILE_NAME, "r", encoding="utf-8") as file:
+            for line in file:
+                row = json.loads(line)
+                ids.append(row["id"])
+                texts.append(row["text"])
+                metadatas.append(row["metadata"])
+
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(
+                f"Flat index at {self.persist_directory} is inconsistent: "
+                f"{matrix.shape[0]} embeddings but {len(ids)} metadata rows"
+            )
+        self._snapshot = _Snapshot(matrix, matrix.shape[0], ids, texts, metadatas)
+        self._positions = {id_: position for position, id_ in enumerate(ids)}
+        LOGGER.info(f"Memory-mapped flat index with {len(ids)} chunks from {self.persist_directory}")
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[Path] = None,
+        **kwargs: Any,
+    ) -> "FlatIndex":
+        index = cls(embedding_function=embedding, persist_directory=persist_directory)
+        index.add_texts(texts, metadatas, ids=ids)
+        index.flush()
+        return index
@@ -0,0 +1,150 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# Compound terms such as "ip.oxylabs.io/location" are indexed whole and split into their parts
+COMPOUND_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._/:-][a-z0-9]+)*")
+TOKEN_SEPARATOR_PATTERN = re.compile(r"[._/:-]")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for compound in COMPOUND_TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(compound)
+        parts = TOKEN_SEPARATOR_PATTERN.split(compound)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+@dataclass
+class LexicalMatch:
+    document: Document
+    score: float
+    confidence: float
+
+
+class BM25Index:
+    """Inverted-index BM25 over the same chunks the dense index holds."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._documents: Dict[str, Document] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def document_key(document: Document) -> str:
+        # Content based, so the same chunk coming back from either index engine maps to one key
+        return f"{document.metadata.get('source_url')}\x1f{document.page_content}"
+
+    def add_documents(self, documents: List[Document]) -> None:
+        with self._lock:
+            for document in documents:
+                key = self.document_key(document)
+                if key in self._documents:
+                    self._remove(key)
+
+                term_frequencies = Counter(tokenize(document.page_content))
+                for term, frequency in term_frequencies.items():
+                    self._postings.setdefault(term, {})[key] = frequency
+
+                length = sum(term_frequencies.values())
+                self._documents[key] = document
+                self._lengths[key] = length
+                self._total_length += length
+
+    def delete(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                if key in self._documents:
+                    self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        for term in set(tokenize(self._documents[key].page_content)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+        self._total_length -= self._lengths.pop(key)
+        del self._documents[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self._documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int = 4) -> List[LexicalMatch]:
+        query_terms = tokenize(query)
+        if not query_terms or not self._documents:
+            return []
+
+        with self._lock:
+            average_length = self._total_length / len(self._documents)
+            scores: Dict[str, float] = {}
+            # Score of a chunk of average length containing every query term once, used to turn raw BM25 scores
+            # into a 0..1 confidence
+            full_match_score = 0.0
+
+            for term in query_terms:
+                idf = self._idf(term)
+                full_match_score += idf
+                for key, frequency in self._postings.get(term, {}).items():
+                    length_norm = 1 - self.b + self.b * self._lengths[key] / average_length
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (
+                        frequency + self.k1 * length_norm
+                    )
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [LexicalMatch(self._documents[key], score, min(1.0, score / full_match_score)) for key, score in top]
+
+    def confident_search(
+        self, query: str, k: int = 4, min_confidence: float = 0.8, min_margin: float = 1.2
+    ) -> Optional[List[LexicalMatch]]:
+        """Returns the lexical results only when the top hit is strong and clearly ahead of other pages."""
+        matches = self.search(query, k=max(k, 8))
+        if not matches or matches[0].confidence < min_confidence:
+            return None
+
+        # Chunks of the same page competing with each other do not make the lookup ambiguous
+        top_source = matches[0].document.metadata.get("source_url")
+        runner_up = next((m for m in matches if m.document.metadata.get("source_url") != top_source), None)
+        if runner_up is not None and matches[0].score < min_margin * runner_up.score:
+            return None
+        return matches[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rank_constant: int = 60) -> List[Document]:
+    fused: Dict[str, Tuple[float, Document]] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = BM25Index.document_key(document)
+            score, _ = fused.get(key, (0.0, document))
+            fused[key] = (score + 1 / (rank_constant + rank + 1), document)
+
+    return [document for _, document in sorted(fused.values(), key=lambda item: item[0], reverse=True)[:k]]
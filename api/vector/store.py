@@ -1,19 +1,38 @@
+import asyncio
+import hashlib
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple, TypeVar, Union
 
 from pydantic import BaseModel
 
 from api.shared.logger import get_logger
+from api.shared.parallel import create_process_pool, ordered_parallel_map
+from api.vector.batching import MicroBatchingEmbeddings
+from api.vector.bulk_embedding import BulkEmbedder, BulkEmbeddingResult, IngestionCheckpoint
+from api.vector.embedding_cache import CachedEmbeddings, EmbeddingCache
+from api.vector.flat_index import FlatIndex
+from api.vector.lexical_index import BM25Index, reciprocal_rank_fusion
 from paths import DATA_DIR
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 import re
 
 LOGGER = get_logger(__name__)
 
+# Documents handed to a split worker process per task
+SPLIT_CHUNK_SIZE = 32
+
+# Hybrid retrieval fuses this many times k candidates from each ranking
+HYBRID_CANDIDATE_MULTIPLIER = 4
+
 
 class ContextEntry(BaseModel):
     section_name: str
@@ -25,6 +44,25 @@ class ContextEntry(BaseModel):
         return f"### {self.section_name} <{self.source_url}>\n{content}\n\n"
 
 
+T = TypeVar("T")
+
+
+def batched(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def content_hash(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class SyncResult(BaseModel):
+    added_chunks: int
+    removed_chunks: int
+    unchanged_chunks: int
+
+
 class VectorStore:
     def __init__(
         self,
@@ -32,10 +70,32 @@ class VectorStore:
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
         persist_directory: Optional[Path] = None,
+        embeddings: Optional[Embeddings] = None,
+        search_max_workers: int = 4,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        query_batch_window_seconds: float = 0.0,
+        query_max_batch_size: int = 64,
+        collection_name: str = "langchain",
+        index_engine: Literal["chroma", "flat"] = "chroma",
+        retrieval_mode: Literal["dense", "hybrid"] = "dense",
+        lexical_fast_path: bool = False,
+        lexical_min_confidence: float = 0.8,
+        ingestion_batch_size: int = 128,
+        ingestion_max_workers: int = 4,
+        split_max_workers: int = 1,
     ):
         self.openai_api_key = openai_api_key
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.collection_name = collection_name
+        self.index_engine = index_engine
+        self.retrieval_mode = retrieval_mode
+        self.lexical_fast_path_enabled = lexical_fast_path
+        self.lexical_min_confidence = lexical_min_confidence
+        self.ingestion_batch_size = ingestion_batch_size
+        self.ingestion_max_workers = ingestion_max_workers
+        self.split_max_workers = split_max_workers
+        self._split_pool: Optional[ProcessPoolExecutor] = None
 
         if persist_directory is None:
             self.persist_directory = DATA_DIR / "persistent_chroma_db"
@@ -52,16 +112,52 @@ class VectorStore:
             separators=["\n\n", "\n", " ", ""],
         )
 
-        self._embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+        if embeddings is None:
+            self._embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+        else:
+            self._embeddings = embeddings
+
+        if query_batch_window_seconds > 0:
+            self._embeddings = MicroBatchingEmbeddings(
+                self._embeddings, window_seconds=query_batch_window_seconds, max_batch_size=query_max_batch_size
+            )
+
+        # The cache sits in front of the batcher so cache hits never wait for a batch window
+        self.embedding_cache = embedding_cache
+        if self.embedding_cache is not None:
+            self._embeddings = CachedEmbeddings(self._embeddings, self.embedding_cache)
+
+        self._ingestion_checkpoint = IngestionCheckpoint(
+            self.persist_directory / f"ingestion_{self.collection_name}.json"
+        )
+
+        # Chroma queries are blocking, so async searches run on a bounded pool instead of the event loop
+        self._search_executor = ThreadPoolExecutor(max_workers=search_max_workers, thread_name_prefix="vector-search")
         self._vector_store = self._load_existing_store()
+        self._corpus_version = 0
+
+        self._lexical_index = BM25Index() if retrieval_mode == "hybrid" or lexical_fast_path else None
+        self._build_lexical_index()
+
+    @property
+    def _flat_index_directory(self) -> Path:
+        return self.persist_directory / f"flat_{self.collection_name}"
+
+    def _load_existing_store(self) -> Optional[Union[Chroma, FlatIndex]]:
+        if self.index_engine == "flat":
+            return self._load_existing_flat_index()
 
-    def _load_existing_store(self) -> Optional[Chroma]:
         try:
             if self.persist_directory.exists() and list(self.persist_directory.glob("*")):
                 _vector_store = Chroma(
-                    persist_directory=str(self.persist_directory), embedding_function=self._embeddings
+                    collection_name=self.collection_name,
+                    persist_directory=str(self.persist_directory),
+                    embedding_function=self._embeddings,
                 )
-                LOGGER.info("Loaded existing ChromaDB from disk")
+                if _vector_store._collection.count() == 0:
+                    LOGGER.info(f"ChromaDB collection {self.collection_name} is empty, will populate it")
+                    return None
+                LOGGER.info(f"Loaded existing ChromaDB collection {self.collection_name} from disk")
                 return _vector_store
             else:
                 LOGGER.info("No existing ChromaDB found, will create new one")
@@ -70,8 +166,51 @@ class VectorStore:
             LOGGER.warning(f"Failed to load existing ChromaDB: {e}. Will create new one.")
             return None
 
+    def _load_existing_flat_index(self) -> Optional[FlatIndex]:
+        try:
+            flat_index = FlatIndex(embedding_function=self._embeddings, persist_directory=self._flat_index_directory)
+        except Exception as e:
+            LOGGER.warning(f"Failed to load existing flat index: {e}. Will create new one.")
+            return None
+
+        if flat_index.count() == 0:
+            LOGGER.info("No existing flat index found, will create new one")
+            return None
+        return flat_index
+
+    def _build_lexical_index(self) -> None:
+        if self._lexical_index is None or self._vector_store is None:
+            return
+
+        stored = self._vector_store.get(include=["documents", "metadatas"])
+        self._lexical_index.add_documents(
+            [
+                Document(page_content=text, metadata=metadata)
+                for text, metadata in zip(stored["documents"], stored["metadatas"])
+            ]
+        )
+        LOGGER.info(f"Built lexical index over {len(self._lexical_index)} document chunks")
+
     def _split_documents(self, documents: List[Document]) -> List[Document]:
-        return self._text_splitter.split_documents(documents)
+        if self.split_max_workers <= 1 or len(documents) <= SPLIT_CHUNK_SIZE:
+            return self._text_splitter.split_documents(documents)
+
+        if self._split_pool is None:
+            self._split_pool = create_process_pool(self.split_max_workers, preload=[__name__])
+        return list(
+            ordered_parallel_map(
+                self._split_pool,
+                self._text_splitter.split_documents,
+                documents,
+                chunk_size=SPLIT_CHUNK_SIZE,
+                max_pending=2 * self.split_max_workers,
+            )
+        )
+
+    def _close_split_pool(self) -> None:
+        if self._split_pool is not None:
+            self._split_pool.shutdown()
+            self._split_pool = None
 
     @staticmethod
     def _create_documents_from_pairs(context_entries: List[ContextEntry]) -> List[Document]:
@@ -80,51 +219,315 @@ class VectorStore:
         for entry in context_entries:
             doc = Document(
                 page_content=entry.content,
-                metadata={"source_url": entry.source_url, "section_name": entry.section_name},
+                metadata={
+                    "source_url": entry.source_url,
+                    "section_name": entry.section_name,
+                    "document_hash": content_hash(entry.source_url, entry.content),
+                },
             )
             documents.append(doc)
 
         LOGGER.info(f"Created {len(documents)} documents from URL-content pairs")
         return documents
 
+    def _split_into_chunks(self, documents: List[Document]) -> List[Document]:
+        """Splits documents and ids every chunk by its content hash, so identical chunks are never embedded twice."""
+        chunks: Dict[str, Document] = {}
+
+        for doc in self._split_documents(documents):
+            source_url = doc.metadata.get("source_url", "")
+            doc.metadata.setdefault("document_hash", content_hash(source_url, doc.page_content))
+            doc.metadata["chunk_hash"] = content_hash(source_url, doc.page_content)
+            doc.id = doc.metadata["chunk_hash"]
+            chunks.setdefault(doc.id, doc)
+
+        # Lets a sync tell a fully stored document from one an interrupted ingestion only partly committed
+        chunk_counts = Counter(chunk.metadata["document_hash"] for chunk in chunks.values())
+        for chunk in chunks.values():
+            chunk.metadata["document_chunks"] = chunk_counts[chunk.metadata["document_hash"]]
+
+        return list(chunks.values())
+
+    def _create_empty_store(self) -> Union[Chroma, FlatIndex]:
+        if self.index_engine == "flat":
+            LOGGER.info("Creating new flat index")
+            return FlatIndex(embedding_function=self._embeddings, persist_directory=self._flat_index_directory)
+
+        LOGGER.info(f"Creating new ChromaDB collection {self.collection_name}")
+        return Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self._embeddings,
+            persist_directory=str(self.persist_directory),
+        )
+
+    def _commit_chunks(self, chunks: List[Document], embeddings: List[List[float]]) -> None:
+        ids = [chunk.id for chunk in chunks]
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+
+        if isinstance(self._vector_store, FlatIndex):
+            self._vector_store.add_embeddings(texts, embeddings, metadatas, ids)
+        else:
+            self._vector_store._collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=texts)
+
+        if self._lexical_index is not None:
+            self._lexical_index.add_documents(chunks)
+        self._corpus_version += 1
+
+    def _add_chunks(self, chunks: List[Document]) -> BulkEmbeddingResult:
+        if self._vector_store is None:
+            self._vector_store = self._create_empty_store()
+
+        bulk_embedder = BulkEmbedder(
+            self._embeddings, batch_size=self.ingestion_batch_size, max_workers=self.ingestion_max_workers
+        )
+        result = bulk_embedder.embed(chunks, self._commit_chunks, self._ingestion_checkpoint)
+        LOGGER.info(
+            f"Added {result.embedded_chunks} document chunks to vector store in {result.elapsed_seconds:.1f}s "
+            f"({result.chunks_per_second:.1f} chunks/s, {result.retries} retries)"
+        )
+        return result
+
+    def _flush_index(self) -> None:
+        # Chroma writes through on every upsert, the flat index is persisted once per bulk change
+        if isinstance(self._vector_store, FlatIndex):
+            self._vector_store.flush()
+
+    def _delete_chunks(self, ids: List[str]) -> None:
+        if self._lexical_index is not None:
+            stored = self._vector_store.get(ids=ids, include=["documents", "metadatas"])
+            self._lexical_index.delete(
+                [
+                    BM25Index.document_key(Document(page_content=text, metadata=metadata))
+                    for text, metadata in zip(stored["documents"], stored["metadatas"])
+                ]
+            )
+
+        self._vector_store.delete(ids=ids)
+        LOGGER.info(f"Removed {len(ids)} document chunks from vector store")
+        self._corpus_version += 1
+
     def add_documents(self, documents: List[Document]) -> None:
         if not documents:
             LOGGER.warning("No documents to add to vector store")
             return
 
-        split_docs = self._split_documents(documents)
-
-        if self._vector_store is None:
-            self._vector_store = Chroma.from_documents(
-                documents=split_docs, embedding=self._embeddings, persist_directory=str(self.persist_directory)
-            )
-            LOGGER.info(f"Created new ChromaDB with {len(split_docs)} document chunks")
-        else:
-            self._vector_store.add_documents(split_docs)
-            LOGGER.info(f"Added {len(split_docs)} document chunks to existing vector store")
+        try:
+            self._add_chunks(self._split_into_chunks(documents))
+        finally:
+            self._close_split_pool()
+            self._flush_index()
 
     def add_from_preprocessed_data(self, context_entries: List[ContextEntry]) -> None:
         documents = self._create_documents_from_pairs(context_entries)
         self.add_documents(documents)
 
+    def sync_from_preprocessed_data(
+        self,
+        context_entries: Iterable[ContextEntry],
+        batch_size: int = 500,
+        scope_urls: Optional[Set[str]] = None,
+    ) -> SyncResult:
+        """Brings the index in line with the given entries, embedding only new or changed chunks.
+
+        Entries are consumed batch_size at a time, so a streamed corpus is never held in memory as a whole. With
+        scope_urls only chunks of those pages are synced, the entries then only need to cover those pages.
+        """
+        stored_ids_by_document: Dict[Optional[str], Set[str]] = defaultdict(set)
+        expected_chunks_by_document: Dict[Optional[str], int] = {}
+        if self._vector_store is not None:
+            stored = self._vector_store.get(include=["metadatas"])
+            for id_, metadata in zip(stored["ids"], stored["metadatas"]):
+                if scope_urls is not None and (metadata or {}).get("source_url") not in scope_urls:
+                    continue
+                document_hash = (metadata or {}).get("document_hash")
+                stored_ids_by_document[document_hash].add(id_)
+                expected_chunks_by_document[document_hash] = (metadata or {}).get("document_chunks")
+        stored_ids = set().union(*stored_ids_by_document.values())
+
+        keep_ids: Set[str] = set()
+        added_ids: Set[str] = set()
+        try:
+            for entries in batched(context_entries, batch_size):
+                # Fully stored documents keep all their chunks without being split again
+                changed_documents = []
+                for document in self._create_documents_from_pairs(entries):
+                    document_hash = document.metadata["document_hash"]
+                    unchanged_ids = stored_ids_by_document.get(document_hash)
+                    if unchanged_ids and len(unchanged_ids) == expected_chunks_by_document.get(document_hash):
+                        keep_ids |= unchanged_ids
+                    else:
+                        changed_documents.append(document)
+
+                # A changed document may still contain chunks that are already embedded
+                new_chunks = []
+                for chunk in self._split_into_chunks(changed_documents):
+                    if chunk.id in stored_ids:
+                        keep_ids.add(chunk.id)
+                    elif chunk.id not in added_ids:
+                        added_ids.add(chunk.id)
+                        new_chunks.append(chunk)
+
+                if new_chunks:
+                    self._add_chunks(new_chunks)
+        finally:
+            self._close_split_pool()
+            # Also after a failure, so the batches embedded so far are kept
+            self._flush_index()
+
+        removed_ids = sorted(stored_ids - keep_ids)
+        if removed_ids:
+            self._delete_chunks(removed_ids)
+            self._flush_index()
+
+        result = SyncResult(
+            added_chunks=len(added_ids), removed_chunks=len(removed_ids), unchanged_chunks=len(keep_ids)
+        )
+        LOGGER.info(
+            f"Synced vector store: {result.added_chunks} chunks added, {result.removed_chunks} removed, "
+            f"{result.unchanged_chunks} unchanged"
+        )
+        return result
+
+    @staticmethod
+    def _to_context_entry(document: Document) -> ContextEntry:
+        return ContextEntry(
+            section_name=document.metadata["section_name"],
+            source_url=document.metadata["source_url"],
+            content=document.page_content,
+        )
+
     def similarity_search(self, query: str, k: int = 4) -> List[ContextEntry]:
         if self._vector_store is None:
             LOGGER.warning("Vector store is empty. No documents to search.")
             return []
 
-        results = [
-            ContextEntry(
-                section_name=entry.metadata["section_name"],
-                source_url=entry.metadata["source_url"],
-                content=entry.page_content,
-            )
-            for entry in self._vector_store.similarity_search(query, k=k)
+        return [self._to_context_entry(entry) for entry in self._vector_store.similarity_search(query, k=k)]
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self._embeddings.aembed_query(query)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeds many queries in one embedding call instead of one call per query."""
+        if not queries:
+            return []
+        if isinstance(self._embeddings, CachedEmbeddings):
+            return await self._embeddings.aembed_queries(queries)
+        # Queries and documents share one embedding for every supported provider, as the micro-batcher relies on too
+        return await self._embeddings.aembed_documents(queries)
+
+    def lexical_search(self, query: str, k: int = 4) -> List[ContextEntry]:
+        if self._lexical_index is None:
+            return []
+        return [self._to_context_entry(match.document) for match in self._lexical_index.search(query, k=k)]
+
+    def lexical_fast_path(self, query: str, k: int = 4) -> Optional[List[ContextEntry]]:
+        """Lexical results for exact term lookups BM25 is confident about, None when dense search is needed."""
+        if not self.lexical_fast_path_enabled or self._lexical_index is None:
+            return None
+
+        matches = self._lexical_index.confident_search(query, k=k, min_confidence=self.lexical_min_confidence)
+        if matches is None:
+            return None
+        return [self._to_context_entry(match.document) for match in matches]
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> List[ContextEntry]:
+        if self._vector_store is None:
+            LOGGER.warning("Vector store is empty. No documents to search.")
+            return []
+
+        lexical_results = self.lexical_fast_path(query, k=k)
+        if lexical_results is not None:
+            return lexical_results
+
+        embedding = await self.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k, query=query)
+
+    async def asimilarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, query: Optional[str] = None
+    ) -> List[ContextEntry]:
+        results = await self.asimilarity_search_by_vector_with_distances(embedding, k=k, query=query)
+        return [entry for entry, _ in results]
+
+    async def asimilarity_search_by_vector_with_distances(
+        self, embedding: List[float], k: int = 4, query: Optional[str] = None
+    ) -> List[Tuple[ContextEntry, Optional[float]]]:
+        """Single query variant of asimilarity_search_by_vectors_with_distances."""
+        results = await self.asimilarity_search_by_vectors_with_distances(
+            [embedding], k=k, queries=None if query is None else [query]
+        )
+        return results[0]
+
+    def _similarity_search_by_vectors(
+        self, embeddings: List[List[float]], k: int
+    ) -> List[List[Tuple[Document, float]]]:
+        if isinstance(self._vector_store, FlatIndex):
+            return self._vector_store.similarity_search_by_vectors_with_score(embeddings, k=k)
+        if not embeddings:
+            return []
+
+        # One query for all embeddings, langchain's Chroma wrapper sends them one at a time
+        results = self._vector_store._collection.query(
+            query_embeddings=embeddings, n_results=k, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(id=id_, page_content=text, metadata=metadata or {}), distance)
+                for id_, text, metadata, distance in zip(*columns)
+            ]
+            for columns in zip(results["ids"], results["documents"], results["metadatas"], results["distances"])
         ]
-        return results
+
+    async def asimilarity_search_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, queries: Optional[List[str]] = None
+    ) -> List[List[ContextEntry]]:
+        """Searches for several embeddings at once, fused with lexical results of queries in hybrid mode."""
+        results = await self.asimilarity_search_by_vectors_with_distances(embeddings, k=k, queries=queries)
+        return [[entry for entry, _ in entries] for entries in results]
+
+    async def asimilarity_search_by_vectors_with_distances(
+        self, embeddings: List[List[float]], k: int = 4, queries: Optional[List[str]] = None
+    ) -> List[List[Tuple[ContextEntry, Optional[float]]]]:
+        """Same as asimilarity_search_by_vectors, each entry paired with its distance to the query embedding.
+
+        Distances are squared L2 distances, 2 - 2 * cosine for normalized embeddings, lower being closer. Entries only
+        the lexical index found in hybrid mode have no distance.
+        """
+        if self._vector_store is None:
+            LOGGER.warning("Vector store is empty. No documents to search.")
+            return [[] for _ in embeddings]
+
+        hybrid = self.retrieval_mode == "hybrid" and queries is not None and self._lexical_index is not None
+        candidates = k * HYBRID_CANDIDATE_MULTIPLIER if hybrid else k
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._search_executor, partial(self._similarity_search_by_vectors, embeddings, candidates)
+        )
+        if hybrid:
+            results = [
+                self._fuse_with_lexical(scored_documents, query, k, candidates)
+                for scored_documents, query in zip(results, queries)
+            ]
+
+        return [[(self._to_context_entry(document), distance) for document, distance in scored] for scored in results]
+
+    def _fuse_with_lexical(
+        self, scored_documents: List[Tuple[Document, float]], query: str, k: int, candidates: int
+    ) -> List[Tuple[Document, Optional[float]]]:
+        distances = {BM25Index.document_key(document): distance for document, distance in scored_documents}
+        lexical_documents = [match.document for match in self._lexical_index.search(query, k=candidates)]
+        fused = reciprocal_rank_fusion([[document for document, _ in scored_documents], lexical_documents], k=k)
+        return [(document, distances.get(BM25Index.document_key(document))) for document in fused]
 
     def is_vector_store_initialized(self) -> bool:
         return self._vector_store is not None
 
+    @property
+    def corpus_version(self) -> int:
+        """Changes whenever the indexed corpus changes, so answers derived from it can be invalidated."""
+        return self._corpus_version
+
     def remove_persisted_store(self) -> None:
         if self.persist_directory.exists():
             for item in self.persist_directory.iterdir():
@@ -139,3 +542,6 @@ class VectorStore:
         else:
             LOGGER.info(f"No persisted vector store found at {self.persist_directory} to remove")
         self._vector_store = None
+        if self._lexical_index is not None:
+            self._lexical_index.clear()
+        self._corpus_version += 1
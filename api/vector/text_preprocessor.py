@@ -1,15 +1,75 @@
 import json
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Iterable, Iterator, List, Optional
 from urllib.parse import urlparse
 
 from pydantic import BaseModel
 
 from api.shared.logger import get_logger
+from api.shared.parallel import create_process_pool, ordered_parallel_map
 from api.vector.store import ContextEntry
 
 LOGGER = get_logger(__name__)
 
+READ_CHUNK_SIZE = 1 << 20
+WHITESPACE_PATTERN = re.compile(r"[ \t\r\n]*")
+ARRAY_SEPARATOR_PATTERN = re.compile(r"[ \t\r\n,]*")
+
+
+def iter_json_values(file: IO[str], chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Yields the items of a top level JSON array, or each value of a JSONL / concatenated JSON file, one at a time.
+
+    Only the unread part of the current chunk is buffered, so memory stays flat however large the file is.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+        return not eof
+
+    fill()
+    position = WHITESPACE_PATTERN.match(buffer).end()
+    while position == len(buffer) and fill():
+        position = WHITESPACE_PATTERN.match(buffer).end()
+
+    in_array = buffer.startswith("[", position)
+    if in_array:
+        position += 1
+    separator_pattern = ARRAY_SEPARATOR_PATTERN if in_array else WHITESPACE_PATTERN
+
+    while True:
+        position = separator_pattern.match(buffer, position).end()
+        if position == len(buffer):
+            if fill():
+                continue
+            if in_array:
+                raise ValueError("Unterminated JSON array")
+            return
+        if in_array and buffer[position] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Most likely a value cut off at the chunk boundary, only an error once the whole file is read
+            if fill():
+                continue
+            raise
+        # A value ending exactly at the buffer end may be a cut off number or literal
+        if end == len(buffer) and fill():
+            continue
+
+        position = end
+        yield value
+
 
 class TextEntry(BaseModel):
     url: str
@@ -17,21 +77,32 @@ class TextEntry(BaseModel):
 
 
 class RawDataPreprocessor:
-    def __init__(self):
-        pass
+    def __init__(self, max_workers: int = 1, chunk_size: int = 64):
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def close(self) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
 
     @staticmethod
-    def read_json_file(file_path: str) -> List[TextEntry]:
+    def iter_json_file(file_path: str) -> Iterator[TextEntry]:
+        """Streams the entries of a JSON array or JSONL file without loading the whole file."""
         try:
             with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                if isinstance(data, dict):
-                    data = [data]
-                return [TextEntry(**item) for item in data if "url" in item and "content" in item]
+                for item in iter_json_values(file):
+                    if isinstance(item, dict) and "url" in item and "content" in item:
+                        yield TextEntry(**item)
         except Exception as e:
             LOGGER.error(f"Error reading JSON file {file_path}: {e}")
             raise
 
+    @staticmethod
+    def read_json_file(file_path: str) -> List[TextEntry]:
+        return list(RawDataPreprocessor.iter_json_file(file_path))
+
     @staticmethod
     def extract_title_from_url(url: str) -> str:
         try:
@@ -66,28 +137,51 @@ class RawDataPreprocessor:
         cleaned = re.sub(r"([.,!?;:])\1+", r"\1", cleaned)
         return cleaned.strip()
 
-    def process_text_entries(self, text_entries: List[TextEntry]) -> List[ContextEntry]:
-        processed_entries = []
-
-        for item in text_entries:
-            url = item.url
-            content = item.content
-
-            title = self.extract_title_from_url(url)
-            cleaned_content = self.clean_text_content(content)
-
-            if cleaned_content:
-                formatted_content = f"<{title}>\n{cleaned_content}"
-                processed_entries.append(ContextEntry(source_url=url, content=formatted_content, section_name=title))
-            else:
-                LOGGER.warning(f"Empty content after cleaning for URL: {url}")
+    def process_text_entry(self, item: TextEntry) -> Optional[ContextEntry]:
+        url = item.url
+        content = item.content
+
+        title = self.extract_title_from_url(url)
+        cleaned_content = self.clean_text_content(content)
+
+        if not cleaned_content:
+            LOGGER.warning(f"Empty content after cleaning for URL: {url}")
+            return None
+
+        formatted_content = f"<{title}>\n{cleaned_content}"
+        return ContextEntry(source_url=url, content=formatted_content, section_name=title)
+
+    def iter_text_entries(self, text_entries: Iterable[TextEntry]) -> Iterator[ContextEntry]:
+        if self.max_workers <= 1:
+            for item in text_entries:
+                entry = self.process_text_entry(item)
+                if entry is not None:
+                    yield entry
+            return
+
+        # Entries are cleaned in chunks on worker processes, results come back in input order
+        if self._process_pool is None:
+            self._process_pool = create_process_pool(self.max_workers, preload=[__name__])
+        yield from ordered_parallel_map(
+            self._process_pool,
+            process_text_entry_chunk,
+            text_entries,
+            chunk_size=self.chunk_size,
+            max_pending=2 * self.max_workers,
+        )
 
-        return processed_entries
+    def process_text_entries(self, text_entries: List[TextEntry]) -> List[ContextEntry]:
+        return list(self.iter_text_entries(text_entries))
 
     @staticmethod
     def _remove_duplicate_entries(entries: List[TextEntry]) -> List[TextEntry]:
         return list(set(entries))
 
+    def stream_json_file(self, file_path: str) -> Iterator[ContextEntry]:
+        """Lazily reads and cleans entries, nothing is materialized until the consumer pulls a batch."""
+        LOGGER.info(f"Streaming JSON file: {file_path}")
+        return self.iter_text_entries(self.iter_json_file(file_path))
+
     def process_json_file(self, file_path: str) -> List[ContextEntry]:
         LOGGER.info(f"Processing JSON file: {file_path}")
 
@@ -96,3 +190,7 @@ class RawDataPreprocessor:
 
         LOGGER.info(f"Processed {len(processed_context_entries)} URL-content pairs")
         return processed_context_entries
+
+
+def process_text_entry_chunk(text_entries: List[TextEntry]) -> List[ContextEntry]:
+    return RawDataPreprocessor().process_text_entries(text_entries)
@@ -1,8 +1,33 @@
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
 from unittest.mock import MagicMock, AsyncMock
+from prometheus_client.parser import text_string_to_metric_families
+from api.chat.answer_cache import SemanticAnswerCache
+from api.chat.context_packer import ContextPacker
+from api.chat.llm_governor import AdaptiveConcurrencyLimit, CircuitBreaker, LlmGovernor, LlmOverloadedError
+from api.chat.metrics import ChatMetrics
 from api.chat.models import ChatResponse
+from api.chat.openai_llm import OpenAiLlmWrapper
+from api.vector.crawl_manifest import AppliedCrawl, CrawlManifest, fingerprint_file
 from api.vector.store import ContextEntry
 
 
+RELEVANT_DISTANCE = 0.2
+RELEVANT_CONTEXT_ENTRY = ContextEntry(
+    section_name="Integration Guides",
+    source_url="https://developers.oxylabs.io/proxies/integration-guides",
+    content="<Integration Guides>\nOxylabs proxies are compatible with many software platforms",
+)
+
+
+def fake_question_embedding(question: str):
+    return [byte / 255 for byte in hashlib.sha256(question.encode("utf-8")).digest()[:16]]
+
+
 def set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm):
     def step(context):
         context.mock_preprocessor = mock_preprocessor
@@ -20,6 +45,40 @@ def prepare_mock_chat_dependencies():
 
         if hasattr(context, "mock_vector_store"):
             context.mock_vector_store_instance = MagicMock()
+            context.mock_vector_store_instance.corpus_version = 0
+            context.mock_vector_store_instance.lexical_fast_path.return_value = None
+            context.mock_vector_store_instance.aembed_query = AsyncMock(side_effect=fake_question_embedding)
+            context.mock_vector_store_instance.asimilarity_search = AsyncMock(return_value=[])
+            context.mock_vector_store_instance.asimilarity_search_by_vector = AsyncMock(
+                return_value=[RELEVANT_CONTEXT_ENTRY]
+            )
+            context.mock_vector_store_instance.aembed_queries = AsyncMock(
+                side_effect=lambda questions: [fake_question_embedding(question) for question in questions]
+            )
+            context.mock_vector_store_instance.asimilarity_search_by_vectors = AsyncMock(
+                side_effect=lambda embeddings, k, queries=None: [[RELEVANT_CONTEXT_ENTRY] for _ in embeddings]
+            )
+            # Results of the plain search mocks, all of them close enough to pass the relevance threshold
+            context.search_distance = RELEVANT_DISTANCE
+
+            async def search_with_distances(embedding, k, query=None):
+                entries = await context.mock_vector_store_instance.asimilarity_search_by_vector(
+                    embedding, k=k, query=query
+                )
+                return [(entry, context.search_distance) for entry in entries]
+
+            async def search_many_with_distances(embeddings, k, queries=None):
+                results = await context.mock_vector_store_instance.asimilarity_search_by_vectors(
+                    embeddings, k=k, queries=queries
+                )
+                return [[(entry, context.search_distance) for entry in entries] for entries in results]
+
+            context.mock_vector_store_instance.asimilarity_search_by_vector_with_distances = AsyncMock(
+                side_effect=search_with_distances
+            )
+            context.mock_vector_store_instance.asimilarity_search_by_vectors_with_distances = AsyncMock(
+                side_effect=search_many_with_distances
+            )
             context.mock_vector_store.return_value = context.mock_vector_store_instance
 
         if hasattr(context, "mock_llm"):
@@ -42,6 +101,9 @@ def prepare_initialized_vector_store():
                     content="<Integration Guides>\nOxylabs proxies are compatible with many software platforms",
                 )
             ]
+            context.mock_preprocessor_instance.stream_json_file.return_value = iter(
+                context.mock_preprocessor_instance.process_json_file.return_value
+            )
 
     return step
 
@@ -53,6 +115,7 @@ def prepare_empty_vector_store():
             context.mock_vector_store_instance.add_from_preprocessed_data = MagicMock()
         if hasattr(context, "mock_preprocessor_instance"):
             context.mock_preprocessor_instance.process_json_file.return_value = []
+            context.mock_preprocessor_instance.stream_json_file.return_value = iter([])
 
     return step
 
@@ -88,6 +151,27 @@ def prepare_failing_llm():
     return step
 
 
+def prepare_overloaded_llm():
+    def step(context):
+        if hasattr(context, "mock_llm_instance"):
+            context.mock_llm_instance.ask_structured = AsyncMock(
+                side_effect=LlmOverloadedError("LLM is overloaded, try again later", retry_after_seconds=2.5)
+            )
+
+    return step
+
+
+def prepare_irrelevant_vector_search_results(distance: Optional[float] = 1.2):
+    """Results too far from the question, or with distance None found by the lexical index alone."""
+
+    def step(context):
+        if hasattr(context, "mock_vector_store_instance"):
+            context.mock_vector_store_instance.asimilarity_search_by_vector.return_value = [RELEVANT_CONTEXT_ENTRY]
+            context.search_distance = distance
+
+    return step
+
+
 def prepare_vector_search_results():
     def step(context):
         if hasattr(context, "mock_vector_store_instance"):
@@ -103,7 +187,9 @@ def prepare_vector_search_results():
                     content="<API Documentation>\nHow to use the API for proxy requests",
                 ),
             ]
-            context.mock_vector_store_instance.similarity_search.return_value = context.expected_context_entries
+            context.mock_vector_store_instance.asimilarity_search_by_vector.return_value = (
+                context.expected_context_entries
+            )
 
     return step
 
@@ -119,3 +205,224 @@ def prepare_pricing_llm_response():
             )
 
     return step
+
+
+def prepare_semantic_answer_cache(similarity_threshold: float = 0.95, max_size: int = 16, ttl_seconds=None):
+    def step(context):
+        context.answer_cache = SemanticAnswerCache(
+            similarity_threshold=similarity_threshold, max_size=max_size, ttl_seconds=ttl_seconds
+        )
+
+    return step
+
+
+def parse_sse_events(body: str):
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def metric_value(exposition: str, sample_name: str, **labels):
+    """Value of a sample in a Prometheus text exposition, None when it is not there."""
+    for family in text_string_to_metric_families(exposition):
+        for sample in family.samples:
+            if sample.name == sample_name and sample.labels == labels:
+                return sample.value
+    return None
+
+
+def prepare_streaming_llm_response(fail_after_tokens: bool = False, end_without_response: bool = False):
+    def step(context):
+        if hasattr(context, "mock_llm_instance"):
+            response = ChatResponse(
+                answer="Oxylabs proxies are compatible with many software platforms.",
+                sources=["https://developers.oxylabs.io/proxies/integration-guides"],
+            )
+
+            async def stream_structured(user_message, schema, text_field):
+                for delta in ("Oxylabs proxies ", "are compatible with ", "many software platforms."):
+                    yield delta
+                if fail_after_tokens:
+                    raise Exception("LLM stream interrupted")
+                if not end_without_response:
+                    yield response
+
+            context.mock_llm_instance.stream_structured = MagicMock(side_effect=stream_structured)
+            context.streamed_response = response
+
+    return step
+
+
+FAKE_USAGE = SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+
+
+def fake_completion(parsed):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=parsed))], usage=FAKE_USAGE)
+
+
+class FakeCompletionStream:
+    """Stands in for the OpenAI SDK chat completion stream, replaying content snapshots."""
+
+    def __init__(self, snapshots, parsed):
+        self.snapshots = snapshots
+        self.parsed = parsed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        yield SimpleNamespace(type="chunk")
+        for snapshot in self.snapshots:
+            yield SimpleNamespace(type="content.delta", snapshot=snapshot)
+
+    async def get_final_completion(self):
+        return fake_completion(self.parsed)
+
+
+def prepare_llm_wrapper_with_completion_stream(snapshots, refused: bool = False):
+    def step(context):
+        context.metrics = ChatMetrics()
+        context.llm_wrapper = OpenAiLlmWrapper(api_key="test", model="test-model", metrics=context.metrics)
+        context.llm_wrapper.set_system_message("system")
+        # A refusal leaves nothing to parse
+        context.parsed_response = None if refused else ChatResponse(answer='Use the proxy "here".', sources=[])
+        context.llm_wrapper.client = MagicMock()
+        context.llm_wrapper.client.chat.completions.stream = MagicMock(
+            return_value=FakeCompletionStream(snapshots, context.parsed_response)
+        )
+        context.llm_wrapper.client.chat.completions.parse = AsyncMock(
+            return_value=fake_completion(context.parsed_response)
+        )
+
+    return step
+
+
+def prepare_batch_llm_responses(failing_question: str = "", latency: float = 0.0):
+    def step(context):
+        if hasattr(context, "mock_llm_instance"):
+            context.asked_questions = []
+            context.llm_calls_in_flight = 0
+            context.max_llm_calls_in_flight = 0
+
+            async def ask_structured(user_message, schema):
+                question = user_message.split("### User Question\n")[-1].strip()
+                # The warm-up question asked at start-up is not part of any batch
+                if question == "Proxy China":
+                    return ChatResponse(answer="Warm-up", sources=[])
+
+                context.asked_questions.append(question)
+                context.llm_calls_in_flight += 1
+                context.max_llm_calls_in_flight = max(context.max_llm_calls_in_flight, context.llm_calls_in_flight)
+                try:
+                    await asyncio.sleep(latency)
+                    if question == failing_question:
+                        raise Exception("LLM service unavailable")
+                    return ChatResponse(answer=f"Answer to {question}", sources=[])
+                finally:
+                    context.llm_calls_in_flight -= 1
+
+            context.mock_llm_instance.ask_structured = AsyncMock(side_effect=ask_structured)
+
+    return step
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def prepare_llm_governor(
+    initial_limit: int = 4,
+    max_queue: int = 4,
+    failure_threshold: int = 5,
+    reset_timeout_seconds: float = 30.0,
+    timeout_seconds: float = 5.0,
+    max_retries: int = 2,
+):
+    def step(context):
+        context.governor = LlmGovernor(
+            limiter=AdaptiveConcurrencyLimit(initial_limit=initial_limit, max_queue=max_queue),
+            circuit_breaker=CircuitBreaker(failure_threshold, reset_timeout_seconds),
+            timeout_seconds=timeout_seconds,
+            max_retries=max_retries,
+            initial_backoff_seconds=0.001,
+            max_backoff_seconds=0.01,
+        )
+
+    return step
+
+
+def prepare_flaky_llm_call(failures: int, status_code: int = 503, latency: float = 0.0):
+    def step(context):
+        context.llm_attempts = 0
+
+        async def call():
+            context.llm_attempts += 1
+            await asyncio.sleep(latency)
+            if context.llm_attempts <= failures:
+                raise FakeStatusError(status_code)
+            return "answer"
+
+        context.llm_call = call
+
+    return step
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def prepare_context_packer(token_budget=None):
+    def step(context):
+        context.context_packer = ContextPacker(token_budget=token_budget, token_counter=count_words)
+
+    return step
+
+
+def prepare_overlapping_chunks():
+    def step(context):
+        page = " ".join(f"word{i}" for i in range(60))
+        url = "https://developers.oxylabs.io/proxies"
+        # Consecutive splitter chunks of one page sharing 20 words, retrieved out of page order
+        context.page_content = page
+        context.chunks = [
+            ContextEntry(section_name="Proxies", source_url=url, content=page[page.index("word20 ") :]),
+            ContextEntry(
+                section_name="Other", source_url="https://developers.oxylabs.io/other", content="unrelated text " * 5
+            ),
+            ContextEntry(section_name="Proxies", source_url=url, content=page[: page.index(" word40")]),
+        ]
+
+    return step
+
+
+CHANGED_PAGE_URL = "https://developers.oxylabs.io/proxies/integration-guides"
+
+
+def prepare_crawl_manifest(directory: Path, applied_fingerprint: Optional[str], base_fingerprint: str = "base"):
+    """Scraped data, a re-crawl manifest leading to it from base_fingerprint and the marker of the last synced data."""
+
+    def step(context):
+        context.data_path = directory / "raw_data.jsonl"
+        context.data_path.write_text(json.dumps({"url": CHANGED_PAGE_URL, "content": "Page"}) + "\n")
+        CrawlManifest(
+            changed=[CHANGED_PAGE_URL],
+            base_fingerprint=base_fingerprint,
+            data_fingerprint=fingerprint_file(context.data_path),
+        ).save(CrawlManifest.path_for(context.data_path))
+
+        context.applied_crawl_path = directory / "persistent_chroma_db" / "applied_crawl.json"
+        if applied_fingerprint is not None:
+            AppliedCrawl(data_fingerprint=applied_fingerprint).save(context.applied_crawl_path)
+
+    return step
+
+
+def synced_scope_urls(context):
+    return context.mock_vector_store_instance.sync_from_preprocessed_data.call_args.kwargs["scope_urls"]
@@ -0,0 +1,103 @@
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, has_entries, none
+
+from api.chat.answer_cache import SemanticAnswerCache
+from api.chat.models import ChatResponse
+from tests.chat.steps import prepare_semantic_answer_cache
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    QUESTION = "How do I set up a proxy in Chrome?"
+    RESPONSE = ChatResponse(answer="Use the proxy settings page.", sources=["https://oxylabs.io/chrome"])
+
+    def test_when_question_embedding_is_close_then_cached_answer_is_returned(self):
+        with given([prepare_semantic_answer_cache(similarity_threshold=0.95)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            result = cache.get(self.QUESTION, [0.99, 0.05, 0.0], corpus_version=1)
+
+        with then():
+            assert_that(result, equal_to(self.RESPONSE))
+            assert_that(cache.hits, equal_to(1))
+
+    def test_when_question_embedding_is_far_then_cache_misses(self):
+        with given([prepare_semantic_answer_cache(similarity_threshold=0.95)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            result = cache.get(self.QUESTION, [0.0, 1.0, 0.0], corpus_version=1)
+
+        with then():
+            assert_that(result, none())
+            assert_that(cache.misses, equal_to(1))
+
+    def test_when_corpus_version_changes_then_cache_is_invalidated(self):
+        with given([prepare_semantic_answer_cache()]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            result = cache.get(self.QUESTION, [1.0, 0.0, 0.0], corpus_version=2)
+
+        with then():
+            assert_that(result, none())
+            assert_that(cache.stats()["size"], equal_to(0))
+
+    def test_when_cache_is_full_then_least_recently_used_answer_is_evicted(self):
+        with given([prepare_semantic_answer_cache(max_size=2)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+            cache.put(self.QUESTION, [0.0, 1.0, 0.0], self.RESPONSE, corpus_version=1)
+            cache.get(self.QUESTION, [1.0, 0.0, 0.0], corpus_version=1)
+
+        with when():
+            cache.put(self.QUESTION, [0.0, 0.0, 1.0], self.RESPONSE, corpus_version=1)
+
+        with then():
+            assert_that(cache.get(self.QUESTION, [0.0, 1.0, 0.0], corpus_version=1), none())
+            assert_that(cache.get(self.QUESTION, [1.0, 0.0, 0.0], corpus_version=1), equal_to(self.RESPONSE))
+
+    def test_when_answer_is_older_than_ttl_then_cache_misses(self):
+        with given([prepare_semantic_answer_cache(ttl_seconds=-1)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            result = cache.get(self.QUESTION, [1.0, 0.0, 0.0], corpus_version=1)
+
+        with then():
+            assert_that(result, none())
+
+    def test_when_close_question_asks_about_another_entity_then_cache_misses(self):
+        with given([prepare_semantic_answer_cache(similarity_threshold=0.95)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put(self.QUESTION, [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            # The embeddings of the questions are almost the same, only the browser differs
+            other_entity = cache.get("How do I set up a proxy in Firefox?", [0.99, 0.05, 0.0], corpus_version=1)
+            other_entity_lowercase = cache.get("how to set up a proxy in firefox", [0.99, 0.05, 0.0], corpus_version=1)
+
+        with then():
+            assert_that(other_entity, none())
+            assert_that(other_entity_lowercase, none())
+            assert_that(cache.stats(), has_entries({"hits": 0, "misses": 2}))
+
+    def test_when_close_question_is_reworded_then_cached_answer_is_returned(self):
+        with given([prepare_semantic_answer_cache(similarity_threshold=0.95)]) as context:
+            cache: SemanticAnswerCache = context.answer_cache
+            cache.put("how do I set up proxy in chrome", [1.0, 0.0, 0.0], self.RESPONSE, corpus_version=1)
+
+        with when():
+            paraphrase = cache.get("chrome proxy setup", [0.99, 0.05, 0.0], corpus_version=1)
+            other_spelling = cache.get("How do I set up a proxy in Chrome?", [0.98, 0.1, 0.0], corpus_version=1)
+
+        with then():
+            assert_that(paraphrase, equal_to(self.RESPONSE))
+            assert_that(other_spelling, equal_to(self.RESPONSE))
+            assert_that(cache.stats(), has_entries({"hits": 2, "misses": 0}))
@@ -1,11 +1,15 @@
+import os
+import tempfile
 import unittest
+from pathlib import Path
 from typing import TYPE_CHECKING, cast
 from unittest.mock import patch
 
 from givenpy import given, then, when
-from hamcrest import assert_that, equal_to, instance_of, not_none, has_key
+from hamcrest import assert_that, equal_to, has_length, instance_of, none, not_none, has_key, starts_with
 
 from api.chat.models import ChatRequest
+from api.vector.crawl_manifest import AppliedCrawl, fingerprint_file
 from tests.infrastructure.steps import prepare_api_server
 from tests.chat.steps import (
     prepare_mock_chat_dependencies,
@@ -14,9 +18,18 @@ from tests.chat.steps import (
     prepare_successful_llm_response,
     prepare_empty_llm_response,
     prepare_failing_llm,
+    prepare_overloaded_llm,
     prepare_vector_search_results,
+    prepare_irrelevant_vector_search_results,
     prepare_pricing_llm_response,
+    prepare_streaming_llm_response,
+    prepare_batch_llm_responses,
+    parse_sse_events,
+    metric_value,
     set_mock_objects,
+    prepare_crawl_manifest,
+    synced_scope_urls,
+    CHANGED_PAGE_URL,
 )
 
 if TYPE_CHECKING:
@@ -40,7 +53,7 @@ class TestChatPipeline(unittest.TestCase):
             client = cast("TestClient", context.client)
 
             # Set up vector store search results
-            context.mock_vector_store_instance.similarity_search.return_value = [
+            context.mock_vector_store_instance.asimilarity_search_by_vector.return_value = [
                 context.mock_preprocessor_instance.process_json_file.return_value[0]
             ]
 
@@ -75,7 +88,7 @@ class TestChatPipeline(unittest.TestCase):
             client = cast("TestClient", context.client)
 
             # Set up empty search results
-            context.mock_vector_store_instance.similarity_search.return_value = []
+            context.mock_vector_store_instance.asimilarity_search_by_vector.return_value = []
 
             chat_request = ChatRequest(question="How do I use proxies?")
 
@@ -116,9 +129,6 @@ class TestChatPipeline(unittest.TestCase):
         ) as context:
             client = cast("TestClient", context.client)
 
-            # Set up empty search results for this test
-            context.mock_vector_store_instance.similarity_search.return_value = []
-
             chat_request = ChatRequest(question="Test question")
 
         with when():
@@ -130,6 +140,114 @@ class TestChatPipeline(unittest.TestCase):
             assert_that(response_data, has_key("detail"))
             assert_that(response_data["detail"], equal_to("Internal server error"))
 
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_endpoint_returns_503_with_retry_after_when_llm_is_overloaded(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_overloaded_llm(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+            chat_request = ChatRequest(question="Test question")
+
+        with when():
+            response = client.post("/chat/", json=chat_request.model_dump())
+
+        with then():
+            assert_that(response.status_code, equal_to(503))
+            assert_that(response.headers["Retry-After"], equal_to("3"))
+            assert_that(response.json()["detail"], equal_to("LLM is overloaded, try again later"))
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_endpoint_refuses_without_llm_call_when_no_context_is_relevant(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_irrelevant_vector_search_results(),
+                prepare_batch_llm_responses(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+            chat_request = ChatRequest(question="What is the weather like in Paris?")
+
+        with when():
+            response = client.post("/chat/", json=chat_request.model_dump())
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            assert_that(
+                response.json(), equal_to({"answer": "I cannot provide an answer to your query.", "sources": []})
+            )
+            assert_that(context.asked_questions, equal_to([]))
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_endpoint_refuses_when_context_was_only_found_lexically(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_irrelevant_vector_search_results(distance=None),
+                prepare_batch_llm_responses(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            response = client.post("/chat/", json={"question": "What is the weather like in Paris?"})
+
+        with then():
+            assert_that(response.json()["answer"], equal_to("I cannot provide an answer to your query."))
+            assert_that(context.asked_questions, equal_to([]))
+
+    @patch.dict(os.environ, {"EMBEDDING_PROVIDER": "sentence_transformers"})
+    @patch("api.chat.chat_service.create_embeddings")
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_endpoint_has_no_relevance_threshold_for_an_uncalibrated_embedding_model(
+        self, mock_preprocessor, mock_vector_store, mock_llm, mock_create_embeddings
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_irrelevant_vector_search_results(),
+                prepare_batch_llm_responses(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            client.post("/chat/", json={"question": "What is the weather like in Paris?"})
+
+        with then():
+            assert_that(context.asked_questions, has_length(1))
+
     @patch("api.chat.chat_service.OpenAiLlmWrapper")
     @patch("api.chat.chat_service.VectorStore")
     @patch("api.chat.chat_service.RawDataPreprocessor")
@@ -154,17 +272,359 @@ class TestChatPipeline(unittest.TestCase):
         with then():
             assert_that(response.status_code, equal_to(200))
 
-            # Verify vector store was called (it gets called twice - once during warmup and once for actual request)
-            call_args_list = context.mock_vector_store_instance.similarity_search.call_args_list
-            # Check that our specific query was called
-            actual_chat_call = any(
-                call.args[0] == "What are the pricing options for residential proxies?" and call.kwargs.get("k") == 3
-                for call in call_args_list
+            # Verify the question was embedded and the vector store searched with its embedding
+            context.mock_vector_store_instance.aembed_query.assert_any_call(
+                "What are the pricing options for residential proxies?"
             )
-            assert_that(actual_chat_call, equal_to(True))
+            search_call = context.mock_vector_store_instance.asimilarity_search_by_vector.call_args
+            assert_that(search_call.kwargs.get("k"), equal_to(3))
             assert_that(context.mock_llm_instance.ask_structured.called, equal_to(True))
 
             response_data = response.json()
             assert_that(
                 response_data["sources"], equal_to(["https://oxylabs.io/pricing", "https://developers.oxylabs.io/api"])
             )
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_stream_endpoint_sends_sources_then_tokens_then_answer(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_vector_search_results(),
+                prepare_streaming_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+            chat_request = ChatRequest(question="How do I integrate Oxylabs proxies?")
+
+        with when():
+            response = client.post("/chat/stream", json=chat_request.model_dump())
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            assert_that(response.headers["content-type"], starts_with("text/event-stream"))
+
+            events = parse_sse_events(response.text)
+            assert_that([name for name, _ in events], equal_to(["sources", "token", "token", "token", "answer"]))
+            assert_that(
+                events[0][1]["sources"], equal_to(["https://oxylabs.io/pricing", "https://developers.oxylabs.io/api"])
+            )
+            streamed_answer = "".join(data["delta"] for name, data in events if name == "token")
+            assert_that(streamed_answer, equal_to(context.streamed_response.answer))
+            assert_that(events[-1][1], equal_to(context.streamed_response.model_dump()))
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_stream_endpoint_reports_llm_failure_as_error_event(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_streaming_llm_response(fail_after_tokens=True),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+            chat_request = ChatRequest(question="Test question")
+
+        with when():
+            response = client.post("/chat/stream", json=chat_request.model_dump())
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            events = parse_sse_events(response.text)
+            assert_that(events[0][0], equal_to("sources"))
+            assert_that(events[-1], equal_to(("error", {"detail": "Internal server error"})))
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_stream_endpoint_reports_stream_without_response_as_error_event(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_streaming_llm_response(end_without_response=True),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            response = client.post("/chat/stream", json={"question": "Test question"})
+            metrics = client.get("/metrics").text
+
+        with then():
+            events = parse_sse_events(response.text)
+            assert_that(events[-1], equal_to(("error", {"detail": "Internal server error"})))
+            # Failing before the answer is counted, like a completion the non-streaming path could not parse
+            assert_that(metric_value(metrics, "qna_chat_answers_total", source="llm"), none())
+            assert_that(
+                metric_value(metrics, "qna_chat_errors_total", endpoint="stream", cause="internal"), equal_to(1)
+            )
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_batch_endpoint_answers_distinct_questions_once_in_order_with_item_errors(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_batch_llm_responses(failing_question="Broken question"),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+            questions = ["How do I integrate proxies?", "Broken question", "  how do I integrate PROXIES? ", "Pricing?"]
+
+        with when():
+            response = client.post("/chat/batch", json={"questions": questions})
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            results = response.json()["results"]
+            assert_that([result["question"] for result in results], equal_to(questions))
+            assert_that(results[0]["response"]["answer"], equal_to("Answer to How do I integrate proxies?"))
+            assert_that(results[2]["response"], equal_to(results[0]["response"]))
+            assert_that(results[1]["error"], equal_to("Internal server error"))
+            assert_that(results[3]["error"], equal_to(None))
+
+            # One embedding call and one vectorized search for the three distinct questions
+            context.mock_vector_store_instance.aembed_queries.assert_awaited_once_with(
+                ["How do I integrate proxies?", "Broken question", "Pricing?"]
+            )
+            assert_that(context.mock_vector_store_instance.asimilarity_search_by_vectors.await_count, equal_to(1))
+            assert_that(
+                sorted(context.asked_questions),
+                equal_to(["Broken question", "How do I integrate proxies?", "Pricing?"]),
+            )
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_chat_batch_endpoint_caps_concurrent_llm_calls(self, mock_preprocessor, mock_vector_store, mock_llm):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_batch_llm_responses(latency=0.01),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+            questions = [f"Question number {i}" for i in range(30)]
+
+        with when():
+            response = client.post("/chat/batch", json={"questions": questions})
+            too_large = client.post("/chat/batch", json={"questions": questions * 10})
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            assert_that(context.max_llm_calls_in_flight, equal_to(8))
+            assert_that(too_large.status_code, equal_to(400))
+
+
+class TestChatMetrics(unittest.TestCase):
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_metrics_endpoint_reports_stage_latencies_answer_sources_and_cache_hit_ratio(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_successful_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            # The second question is answered from the answer cache
+            for _ in range(2):
+                client.post("/chat/", json={"question": "How do I integrate Oxylabs proxies?"})
+            response = client.get("/metrics")
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            assert_that(response.headers["content-type"], starts_with("text/plain"))
+            metrics = response.text
+            for stage, count in [("embedding", 2), ("answer_cache", 2), ("vector_search", 1), ("llm", 1)]:
+                assert_that(
+                    metric_value(metrics, "qna_chat_stage_duration_seconds_count", stage=stage), equal_to(count)
+                )
+            assert_that(metric_value(metrics, "qna_chat_request_duration_seconds_count", endpoint="chat"), equal_to(2))
+            assert_that(metric_value(metrics, "qna_chat_requests_in_flight", endpoint="chat"), equal_to(0))
+            assert_that(metric_value(metrics, "qna_chat_answers_total", source="llm"), equal_to(1))
+            assert_that(metric_value(metrics, "qna_chat_answers_total", source="answer_cache"), equal_to(1))
+            assert_that(metric_value(metrics, "qna_cache_hit_ratio", cache="answer"), equal_to(0.5))
+            assert_that(metric_value(metrics, "qna_llm_calls_in_flight"), equal_to(0))
+            assert_that(metric_value(metrics, "qna_llm_circuit_state", state="closed"), equal_to(1))
+
+    @patch("api.chat.chat_service.OpenAiLlmWrapper")
+    @patch("api.chat.chat_service.VectorStore")
+    @patch("api.chat.chat_service.RawDataPreprocessor")
+    def test_metrics_endpoint_counts_errors_by_cause(self, mock_preprocessor, mock_vector_store, mock_llm):
+        with given(
+            [
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_overloaded_llm(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            client.post("/chat/", json={"question": "Test question"})
+            client.post("/chat/batch", json={"questions": ["Test question"] * 300})
+            response = client.get("/metrics")
+
+        with then():
+            metrics = response.text
+            assert_that(
+                metric_value(metrics, "qna_chat_errors_total", endpoint="chat", cause="llm_overloaded"), equal_to(1)
+            )
+            assert_that(
+                metric_value(metrics, "qna_chat_errors_total", endpoint="batch", cause="invalid_request"), equal_to(1)
+            )
+
+
+@patch("api.chat.chat_service.OpenAiLlmWrapper")
+@patch("api.chat.chat_service.VectorStore")
+@patch("api.chat.chat_service.RawDataPreprocessor")
+class TestCrawlManifestSync(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = Path(tmp_dir.name)
+        for patcher in (
+            patch("api.chat.chat_service.TEST_DATA_DIR", self.directory),
+            patch.dict(
+                os.environ,
+                {"CRAWL_MANIFEST_ENABLED": "true", "SCRAPED_DATA_PATH": str(self.directory / "raw_data.jsonl")},
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_when_index_holds_manifest_base_data_then_only_manifest_pages_are_synced(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_crawl_manifest(self.directory, applied_fingerprint="base"),
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_successful_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            # The service syncs the vector store when the first request creates it
+            client.post("/chat/", json={"question": "How do I integrate Oxylabs proxies?"})
+
+        with then():
+            assert_that(synced_scope_urls(context), equal_to({CHANGED_PAGE_URL}))
+            assert_that(
+                AppliedCrawl.load(context.applied_crawl_path).data_fingerprint,
+                equal_to(fingerprint_file(context.data_path)),
+            )
+
+    def test_when_applied_marker_is_missing_then_all_data_is_synced(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_crawl_manifest(self.directory, applied_fingerprint=None),
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_successful_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            # The service syncs the vector store when the first request creates it
+            client.post("/chat/", json={"question": "How do I integrate Oxylabs proxies?"})
+
+        with then():
+            assert_that(synced_scope_urls(context), none())
+            assert_that(
+                AppliedCrawl.load(context.applied_crawl_path).data_fingerprint,
+                equal_to(fingerprint_file(context.data_path)),
+            )
+
+    def test_when_a_recrawl_was_missed_then_all_data_is_synced(self, mock_preprocessor, mock_vector_store, mock_llm):
+        with given(
+            [
+                prepare_crawl_manifest(self.directory, applied_fingerprint="older", base_fingerprint="base"),
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_successful_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+
+        with when():
+            # The service syncs the vector store when the first request creates it
+            client.post("/chat/", json={"question": "How do I integrate Oxylabs proxies?"})
+
+        with then():
+            assert_that(synced_scope_urls(context), none())
+
+    def test_when_data_changed_after_the_manifest_then_all_data_is_synced(
+        self, mock_preprocessor, mock_vector_store, mock_llm
+    ):
+        with given(
+            [
+                prepare_crawl_manifest(self.directory, applied_fingerprint="base"),
+                prepare_api_server(),
+                set_mock_objects(mock_preprocessor, mock_vector_store, mock_llm),
+                prepare_mock_chat_dependencies(),
+                prepare_initialized_vector_store(),
+                prepare_successful_llm_response(),
+            ]
+        ) as context:
+            client = cast("TestClient", context.client)
+            with open(context.data_path, "a", encoding="utf-8") as file:
+                file.write('{"url": "https://developers.oxylabs.io/other", "content": "Edited by hand"}\n')
+
+        with when():
+            # The service syncs the vector store when the first request creates it
+            client.post("/chat/", json={"question": "How do I integrate Oxylabs proxies?"})
+
+        with then():
+            assert_that(synced_scope_urls(context), none())
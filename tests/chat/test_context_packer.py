@@ -0,0 +1,91 @@
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, greater_than, less_than_or_equal_to
+
+from api.chat.context_packer import overlap_length
+from api.vector.store import ContextEntry
+from tests.chat.steps import count_words, prepare_context_packer, prepare_overlapping_chunks
+
+
+class TestContextPacker(unittest.TestCase):
+    def test_when_chunks_of_same_page_overlap_then_they_are_merged_at_rank_of_best_chunk(self):
+        with given([prepare_context_packer(), prepare_overlapping_chunks()]) as context:
+            packer = context.context_packer
+
+        with when():
+            packed = packer.pack(context.chunks)
+
+        with then():
+            assert_that(len(packed.entries), equal_to(2))
+            assert_that(packed.entries[0].content, equal_to(context.page_content))
+            assert_that(packed.entries[1].section_name, equal_to("Other"))
+            assert_that(packed.tokens_saved, greater_than(0))
+
+    def test_when_chunk_is_contained_in_another_then_it_is_dropped(self):
+        with given([prepare_context_packer()]) as context:
+            packer = context.context_packer
+            url = "https://developers.oxylabs.io/proxies"
+            entries = [
+                ContextEntry(section_name="Proxies", source_url=url, content="a b c d e f g h " * 10),
+                ContextEntry(section_name="Proxies", source_url=url, content="c d e f g h a b " * 3),
+            ]
+
+        with when():
+            packed = packer.pack(entries)
+
+        with then():
+            assert_that([entry.content for entry in packed.entries], equal_to([entries[0].content]))
+
+    def test_when_chunks_of_different_pages_share_text_then_they_are_kept_apart(self):
+        with given([prepare_context_packer()]) as context:
+            packer = context.context_packer
+            text = " ".join(f"word{i}" for i in range(20))
+            entries = [
+                ContextEntry(section_name="A", source_url="https://a", content=text),
+                ContextEntry(section_name="B", source_url="https://b", content=text),
+            ]
+
+        with when():
+            packed = packer.pack(entries)
+
+        with then():
+            assert_that(packed.entries, equal_to(entries))
+            assert_that(packed.tokens_saved, equal_to(0))
+
+    def test_when_context_exceeds_budget_then_most_relevant_entries_that_fit_are_kept(self):
+        with given([prepare_context_packer(token_budget=30)]) as context:
+            packer = context.context_packer
+            entries = [
+                ContextEntry(section_name="Best", source_url="https://a", content="best " * 10),
+                ContextEntry(section_name="Long", source_url="https://b", content="long " * 40),
+                ContextEntry(section_name="Short", source_url="https://c", content="short " * 5),
+            ]
+
+        with when():
+            packed = packer.pack(entries)
+
+        with then():
+            assert_that([entry.section_name for entry in packed.entries], equal_to(["Best", "Short"]))
+            assert_that(packed.tokens, less_than_or_equal_to(30))
+            assert_that(packed.tokens, equal_to(sum(count_words(entry.format_entry()) for entry in packed.entries)))
+
+    def test_when_best_entry_alone_exceeds_budget_then_it_is_truncated_to_fit(self):
+        with given([prepare_context_packer(token_budget=12)]) as context:
+            packer = context.context_packer
+            entries = [ContextEntry(section_name="Long", source_url="https://a", content="long " * 40)]
+
+        with when():
+            packed = packer.pack(entries)
+
+        with then():
+            assert_that(len(packed.entries), equal_to(1))
+            assert_that(packed.tokens, less_than_or_equal_to(12))
+            assert_that(packed.entries[0].content.startswith("long long"), equal_to(True))
+
+    def test_overlap_length_finds_longest_suffix_prefix_match(self):
+        head = "The quick brown fox jumps over the lazy dog and runs away"
+        tail = "over the lazy dog and runs away into the forest"
+
+        assert_that(overlap_length(head, tail, min_overlap=8), equal_to(len("over the lazy dog and runs away")))
+        assert_that(overlap_length(tail, head, min_overlap=8), equal_to(0))
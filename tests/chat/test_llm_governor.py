@@ -0,0 +1,154 @@
+import asyncio
+import time
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, less_than, instance_of
+
+from api.chat.llm_governor import CircuitOpenError, LlmOverloadedError, LlmTimeoutError
+from tests.chat.steps import FakeStatusError, prepare_flaky_llm_call, prepare_llm_governor
+
+
+class TestLlmGovernor(unittest.TestCase):
+    def test_when_llm_returns_transient_error_then_call_is_retried_and_limit_is_decreased(self):
+        with given([prepare_llm_governor(initial_limit=8), prepare_flaky_llm_call(failures=2)]) as context:
+            governor = context.governor
+
+        with when():
+            answer = asyncio.run(governor.call(context.llm_call))
+
+        with then():
+            assert_that(answer, equal_to("answer"))
+            assert_that(context.llm_attempts, equal_to(3))
+            assert_that(governor.limiter.limit, less_than(8))
+            assert_that(governor.limiter.in_flight, equal_to(0))
+            assert_that(governor.circuit_breaker.state, equal_to("closed"))
+
+    def test_when_llm_rejects_request_then_call_is_not_retried_nor_counted_for_or_against_its_health(self):
+        with given([prepare_llm_governor(), prepare_flaky_llm_call(failures=1, status_code=400)]) as context:
+            governor = context.governor
+            governor.circuit_breaker.record_failure()
+
+        with when():
+            with self.assertRaises(FakeStatusError):
+                asyncio.run(governor.call(context.llm_call))
+
+        with then():
+            assert_that(context.llm_attempts, equal_to(1))
+            assert_that(governor.circuit_breaker.consecutive_failures, equal_to(1))
+            assert_that(governor.limiter.in_flight, equal_to(0))
+
+    def test_when_rejected_request_is_the_probe_then_circuit_stays_half_open_for_the_next_probe(self):
+        with given(
+            [
+                prepare_llm_governor(failure_threshold=1, reset_timeout_seconds=0.01),
+                prepare_flaky_llm_call(failures=1, status_code=400),
+            ]
+        ) as context:
+            governor = context.governor
+            governor.circuit_breaker.record_failure()
+            time.sleep(0.02)
+
+        with when():
+            with self.assertRaises(FakeStatusError):
+                asyncio.run(governor.call(context.llm_call))
+            state_after_rejected_probe = governor.circuit_breaker.state
+            answer = asyncio.run(governor.call(context.llm_call))
+
+        with then():
+            assert_that(state_after_rejected_probe, equal_to("half_open"))
+            assert_that(answer, equal_to("answer"))
+            assert_that(governor.circuit_breaker.state, equal_to("closed"))
+
+    def test_when_queue_is_full_then_new_calls_are_shed_immediately(self):
+        with given(
+            [prepare_llm_governor(initial_limit=1, max_queue=1), prepare_flaky_llm_call(failures=0, latency=0.2)]
+        ) as context:
+            governor = context.governor
+
+        with when():
+
+            async def run_concurrently():
+                return await asyncio.gather(
+                    *(governor.call(context.llm_call) for _ in range(4)), return_exceptions=True
+                )
+
+            start = time.perf_counter()
+            outcomes = asyncio.run(run_concurrently())
+            elapsed = time.perf_counter() - start
+
+        with then():
+            # One call runs, one waits for its slot and the other two are turned away without waiting
+            assert_that(outcomes[:2], equal_to(["answer", "answer"]))
+            assert_that(outcomes[2], instance_of(LlmOverloadedError))
+            assert_that(outcomes[3], instance_of(LlmOverloadedError))
+            assert_that(governor.limiter.shed, equal_to(2))
+            assert_that(elapsed, less_than(1.0))
+
+    def test_when_llm_keeps_failing_then_circuit_opens_and_is_closed_by_successful_probe(self):
+        with given(
+            [
+                prepare_llm_governor(failure_threshold=2, reset_timeout_seconds=0.2, max_retries=0),
+                prepare_flaky_llm_call(failures=2),
+            ]
+        ) as context:
+            governor = context.governor
+
+        with when():
+
+            async def fail_then_recover():
+                for _ in range(2):
+                    with self.assertRaises(FakeStatusError):
+                        await governor.call(context.llm_call)
+                with self.assertRaises(CircuitOpenError):
+                    await governor.call(context.llm_call)
+                attempts_while_open = context.llm_attempts
+
+                await asyncio.sleep(0.25)
+                return attempts_while_open, await governor.call(context.llm_call)
+
+            attempts_while_open, answer = asyncio.run(fail_then_recover())
+
+        with then():
+            assert_that(attempts_while_open, equal_to(2))
+            assert_that(answer, equal_to("answer"))
+            assert_that(governor.circuit_breaker.state, equal_to("closed"))
+
+    def test_when_llm_does_not_answer_before_deadline_then_timeout_error_is_raised(self):
+        with given(
+            [prepare_llm_governor(initial_limit=4, timeout_seconds=0.05), prepare_flaky_llm_call(failures=0, latency=1)]
+        ) as context:
+            governor = context.governor
+
+        with when():
+            with self.assertRaises(LlmTimeoutError):
+                asyncio.run(governor.call(context.llm_call))
+
+        with then():
+            assert_that(governor.limiter.limit, less_than(4))
+            assert_that(governor.limiter.in_flight, equal_to(0))
+            assert_that(governor.circuit_breaker.consecutive_failures, equal_to(1))
+
+    def test_when_deadline_passes_while_waiting_for_a_slot_then_llm_health_is_not_affected(self):
+        with given(
+            [prepare_llm_governor(initial_limit=1, timeout_seconds=0.05), prepare_flaky_llm_call(failures=0)]
+        ) as context:
+            governor = context.governor
+
+        with when():
+
+            async def call_while_slot_is_taken():
+                await governor.limiter.acquire()
+                try:
+                    await governor.call(context.llm_call)
+                finally:
+                    governor.limiter.release()
+
+            with self.assertRaises(LlmTimeoutError):
+                asyncio.run(call_while_slot_is_taken())
+
+        with then():
+            assert_that(context.llm_attempts, equal_to(0))
+            assert_that(governor.limiter.limit, equal_to(1))
+            assert_that(governor.circuit_breaker.consecutive_failures, equal_to(0))
+            assert_that(governor.limiter.queued, equal_to(0))
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, calling, equal_to, raises
+
+from api.chat.models import ChatResponse
+from api.chat.openai_llm import LlmResponseError
+from tests.chat.steps import prepare_llm_wrapper_with_completion_stream
+
+
+class TestOpenAiLlmWrapperStreaming(unittest.TestCase):
+    def test_when_structured_completion_streams_then_answer_text_is_yielded_incrementally(self):
+        # The escaped quote arrives split across two deltas
+        snapshots = [
+            '{"ans',
+            '{"answer": "Use the',
+            '{"answer": "Use the proxy \\',
+            '{"answer": "Use the proxy \\"here\\".", "sour',
+            '{"answer": "Use the proxy \\"here\\".", "sources": []}',
+        ]
+        with given([prepare_llm_wrapper_with_completion_stream(snapshots)]) as context:
+            llm_wrapper = context.llm_wrapper
+
+        with when():
+
+            async def collect():
+                return [item async for item in llm_wrapper.stream_structured("question", ChatResponse, "answer")]
+
+            items = asyncio.run(collect())
+
+        with then():
+            deltas = [item for item in items if isinstance(item, str)]
+            assert_that("".join(deltas), equal_to('Use the proxy "here".'))
+            assert_that(len(deltas) > 1, equal_to(True))
+            assert_that(items[-1], equal_to(context.parsed_response))
+
+    def test_when_structured_completion_streams_then_token_usage_is_recorded(self):
+        snapshots = ['{"answer": "Use the proxy \\"here\\".", "sources": []}']
+        with given([prepare_llm_wrapper_with_completion_stream(snapshots)]) as context:
+            llm_wrapper = context.llm_wrapper
+
+        with when():
+
+            async def collect():
+                return [item async for item in llm_wrapper.stream_structured("question", ChatResponse, "answer")]
+
+            asyncio.run(collect())
+
+        with then():
+            stream_kwargs = llm_wrapper.client.chat.completions.stream.call_args.kwargs
+            assert_that(stream_kwargs["stream_options"], equal_to({"include_usage": True}))
+            registry = context.metrics.registry
+            assert_that(registry.get_sample_value("qna_llm_tokens_total", {"type": "prompt"}), equal_to(120))
+            assert_that(registry.get_sample_value("qna_llm_tokens_total", {"type": "completion"}), equal_to(30))
+
+
+class TestOpenAiLlmWrapperUsage(unittest.TestCase):
+    def test_when_structured_completion_is_parsed_then_token_usage_is_recorded(self):
+        with given([prepare_llm_wrapper_with_completion_stream(snapshots=[])]) as context:
+            llm_wrapper = context.llm_wrapper
+
+        with when():
+            for _ in range(2):
+                response = asyncio.run(llm_wrapper.ask_structured("question", ChatResponse))
+
+        with then():
+            assert_that(response, equal_to(context.parsed_response))
+            registry = context.metrics.registry
+            assert_that(registry.get_sample_value("qna_llm_tokens_total", {"type": "prompt"}), equal_to(240))
+            assert_that(registry.get_sample_value("qna_llm_tokens_total", {"type": "completion"}), equal_to(60))
+
+
+class TestOpenAiLlmWrapperRefusal(unittest.TestCase):
+    def test_when_completion_has_no_parsed_response_then_both_paths_raise_the_same_error(self):
+        with given([prepare_llm_wrapper_with_completion_stream(snapshots=['{"ans'], refused=True)]) as context:
+            llm_wrapper = context.llm_wrapper
+
+        with when():
+
+            async def collect():
+                return [item async for item in llm_wrapper.stream_structured("question", ChatResponse, "answer")]
+
+            ask = calling(asyncio.run).with_args(llm_wrapper.ask_structured("question", ChatResponse))
+            stream = calling(asyncio.run).with_args(collect())
+
+        with then():
+            assert_that(ask, raises(LlmResponseError))
+            assert_that(stream, raises(LlmResponseError))
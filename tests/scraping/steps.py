@@ -0,0 +1,151 @@
+import io
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from tools.scraping.crawl_cache import CrawlCache, CrawlCacheEntry
+from tools.scraping.rate_limiter import TokenBucket
+from tools.scraping.scraper import AsyncScraper, Scraper
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def prepare_async_scraper(max_retries: int = 3):
+    def step(context):
+        # No rate limit, pacing is the token bucket's own test
+        context.scraper = AsyncScraper(max_retries=max_retries, requests_per_second=0)
+
+    return step
+
+
+def prepare_page_responses(statuses: List[int], retry_after: Optional[str] = None):
+    """Serves a page with the given statuses in turn, the last one repeated, Retry-After on the retryable ones."""
+
+    def step(context):
+        context.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses[min(len(context.requests), len(statuses) - 1)]
+            context.requests.append(request)
+            headers: Dict[str, str] = {}
+            if status in (429, 503) and retry_after is not None:
+                headers["Retry-After"] = retry_after
+            return httpx.Response(status, headers=headers, text="<p>page</p>")
+
+        context.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    return step
+
+
+def prepare_token_bucket(rate: float, capacity: Optional[float] = None):
+    def step(context):
+        context.token_bucket = TokenBucket(rate, capacity)
+
+    return step
+
+
+def prepare_jsonl_output(directory: Path, lines: List[str]):
+    def step(context):
+        context.output_path = directory / "raw_data.jsonl"
+        context.output_path.write_text("".join(lines), encoding="utf-8")
+
+    return step
+
+
+def prepare_sync_scraper(batch_size: int = 2):
+    def step(context):
+        context.scraper = Scraper(delay=0.0, batch_size=batch_size)
+        context.fetched_urls = []
+
+        def scrape_url(url):
+            context.fetched_urls.append(url)
+            return {"url": url, "content": f"Content of {url}"}
+
+        context.scraper._scrape_url = scrape_url
+
+    return step
+
+
+def prepare_crawl_cache(directory: Path, entries: Dict[str, CrawlCacheEntry]):
+    """A crawl cache saved by an earlier crawl and loaded again."""
+
+    def step(context):
+        path = directory / "crawl_cache.json"
+        path.write_text(json.dumps({url: entry.model_dump() for url, entry in entries.items()}), encoding="utf-8")
+        context.crawl_cache = CrawlCache(path)
+
+    return step
+
+
+def prepare_recrawl_scraper(lastmods: Dict[str, Optional[str]]):
+    def step(context):
+        context.scraper = Scraper(delay=0.0, crawl_cache=context.crawl_cache)
+        # As read from the sitemap by run()
+        context.scraper._sitemap_lastmods = dict(lastmods)
+
+    return step
+
+
+def prepare_site_pages(pages: Dict[str, Tuple[int, str, Dict[str, str]]]):
+    """Serves each page's status, HTML and headers to requests.get, recording the headers of every request."""
+
+    def step(context):
+        context.request_headers = {}
+
+        def get(url, headers=None, timeout=None):
+            context.request_headers[url] = headers or {}
+            status, html, response_headers = pages[url]
+            response = requests.Response()
+            response.status_code = status
+            response.url = url
+            response.encoding = "utf-8"
+            response._content = html.encode("utf-8")
+            response.headers = CaseInsensitiveDict(response_headers)
+            return response
+
+        context.get = get
+
+    return step
+
+
+def prepare_html_pages(fixtures: List[Path], extra: Optional[Dict[str, str]] = None):
+    def step(context):
+        context.pages = {fixture.name: fixture.read_text(encoding="utf-8") for fixture in fixtures}
+        context.pages.update(extra or {})
+
+    return step
+
+
+def sitemap_index_xml(sitemap_urls: List[str]) -> bytes:
+    sitemaps = "".join(f"<sitemap><loc>{url}</loc></sitemap>" for url in sitemap_urls)
+    return f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">{sitemaps}</sitemapindex>'.encode("utf-8")
+
+
+def urlset_xml(entries: List[Tuple[str, Optional[str]]]) -> bytes:
+    urls = "".join(
+        f"<url><loc>{url}</loc>{f'<lastmod>{lastmod}</lastmod>' if lastmod else ''}</url>" for url, lastmod in entries
+    )
+    return f'<urlset xmlns="{SITEMAP_NAMESPACE}">{urls}</urlset>'.encode("utf-8")
+
+
+def prepare_sitemaps(documents: Dict[str, bytes]):
+    """Streams each sitemap document to requests.get, a 404 for any other URL, recording the fetched URLs."""
+
+    def step(context):
+        context.fetched_sitemaps = []
+
+        def get(url, headers=None, timeout=None, stream=False):
+            context.fetched_sitemaps.append(url)
+            response = requests.Response()
+            response.url = url
+            response.status_code = 200 if url in documents else 404
+            response.raw = io.BytesIO(documents.get(url, b""))
+            return response
+
+        context.get = get
+
+    return step
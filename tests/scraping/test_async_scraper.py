@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, greater_than_or_equal_to, less_than
+
+from tests.scraping.steps import prepare_async_scraper, prepare_page_responses, prepare_token_bucket
+
+
+class TestAsyncScraperFetch(unittest.TestCase):
+    def test_when_page_returns_retryable_status_then_it_is_retried_after_retry_after_seconds(self):
+        with given([prepare_async_scraper(), prepare_page_responses([503, 429, 200], retry_after="7")]) as context:
+            scraper = context.scraper
+
+        with when(), patch("tools.scraping.scraper.asyncio.sleep", new=AsyncMock()) as sleep:
+            response = asyncio.run(scraper.fetch_page(context.client, "https://example.com/page"))
+
+        with then():
+            assert_that(response.status_code, equal_to(200))
+            assert_that(len(context.requests), equal_to(3))
+            assert_that([call.args[0] for call in sleep.await_args_list], equal_to([7.0, 7.0]))
+
+    def test_when_retry_after_is_missing_then_backoff_is_jittered_and_grows(self):
+        with given([prepare_async_scraper(), prepare_page_responses([500, 500, 200])]) as context:
+            scraper = context.scraper
+
+        with when(), patch("tools.scraping.scraper.asyncio.sleep", new=AsyncMock()) as sleep:
+            asyncio.run(scraper.fetch_page(context.client, "https://example.com/page"))
+
+        with then():
+            first, second = [call.args[0] for call in sleep.await_args_list]
+            assert_that(0.5 <= first <= 1.0, equal_to(True))
+            assert_that(1.0 <= second <= 2.0, equal_to(True))
+
+    def test_when_page_keeps_failing_then_error_is_raised_after_max_retries(self):
+        with given([prepare_async_scraper(max_retries=2), prepare_page_responses([503], retry_after="0")]) as context:
+            scraper = context.scraper
+
+        with when(), patch("tools.scraping.scraper.asyncio.sleep", new=AsyncMock()):
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(scraper.fetch_page(context.client, "https://example.com/page"))
+
+        with then():
+            assert_that(len(context.requests), equal_to(3))
+
+    def test_when_page_is_not_found_then_it_is_not_retried(self):
+        with given([prepare_async_scraper(), prepare_page_responses([404, 200])]) as context:
+            scraper = context.scraper
+
+        with when():
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(scraper.fetch_page(context.client, "https://example.com/page"))
+
+        with then():
+            assert_that(len(context.requests), equal_to(1))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_when_bucket_is_empty_then_acquires_are_paced_at_rate(self):
+        with given([prepare_token_bucket(rate=50, capacity=1)]) as context:
+            token_bucket = context.token_bucket
+
+            async def acquire_many():
+                for _ in range(6):
+                    await token_bucket.acquire()
+
+        with when():
+            start = time.perf_counter()
+            asyncio.run(acquire_many())
+            elapsed = time.perf_counter() - start
+
+        with then():
+            # The first token is there already, the other five come in at 50 per second
+            assert_that(elapsed, greater_than_or_equal_to(0.09))
+            assert_that(elapsed, less_than(0.5))
+
+    def test_when_bucket_is_full_then_burst_of_capacity_is_not_delayed(self):
+        with given([prepare_token_bucket(rate=1, capacity=5)]) as context:
+            token_bucket = context.token_bucket
+
+            async def acquire_many():
+                await asyncio.gather(*(token_bucket.acquire() for _ in range(5)))
+
+        with when():
+            start = time.perf_counter()
+            asyncio.run(acquire_many())
+            elapsed = time.perf_counter() - start
+
+        with then():
+            assert_that(elapsed, less_than(0.1))
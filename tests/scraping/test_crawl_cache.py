@@ -0,0 +1,120 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, has_entries, is_not, has_key
+
+from api.vector.crawl_manifest import CrawlManifest, fingerprint_file
+from tests.scraping.steps import prepare_crawl_cache, prepare_jsonl_output, prepare_recrawl_scraper, prepare_site_pages
+from tools.scraping.crawl_cache import CrawlCache, CrawlCacheEntry
+
+PAGE_A = "https://example.com/docs/a"
+PAGE_B = "https://example.com/docs/b"
+PAGE_C = "https://example.com/docs/c"
+PAGE_D = "https://example.com/docs/d"
+
+CACHED_PAGES = {
+    PAGE_A: CrawlCacheEntry(lastmod="2024-01-01", etag='"a1"'),
+    PAGE_B: CrawlCacheEntry(lastmod="2024-01-01", etag='"b1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT"),
+    PAGE_C: CrawlCacheEntry(lastmod="2024-01-01", etag='"c1"'),
+    PAGE_D: CrawlCacheEntry(lastmod="2024-01-01"),
+}
+OUTPUT_LINES = [json.dumps({"url": url, "content": f"Old {url}"}) + "\n" for url in CACHED_PAGES]
+
+
+class TestCrawlCache(unittest.TestCase):
+    def test_when_page_was_crawled_then_conditional_request_carries_its_validators(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_crawl_cache(Path(tmp_dir), CACHED_PAGES)]) as context:
+                crawl_cache = context.crawl_cache
+
+            with when():
+                headers = crawl_cache.conditional_headers(PAGE_B)
+                unknown_page_headers = crawl_cache.conditional_headers("https://example.com/docs/new")
+
+            with then():
+                assert_that(
+                    headers,
+                    equal_to({"If-None-Match": '"b1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+                )
+                assert_that(unknown_page_headers, equal_to({}))
+
+    def test_when_sitemap_lastmod_did_not_move_then_page_is_fresh(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_crawl_cache(Path(tmp_dir), CACHED_PAGES)]) as context:
+                crawl_cache = context.crawl_cache
+
+            with then():
+                assert_that(crawl_cache.is_fresh(PAGE_A, "2024-01-01"), equal_to(True))
+                assert_that(crawl_cache.is_fresh(PAGE_A, "2024-02-01"), equal_to(False))
+                # Without a lastmod in the sitemap the page has to be asked for
+                assert_that(crawl_cache.is_fresh(PAGE_A, None), equal_to(False))
+                assert_that(crawl_cache.is_fresh("https://example.com/docs/new", "2024-01-01"), equal_to(False))
+
+    def test_when_page_is_refetched_then_only_different_content_counts_as_changed_and_survives_a_reload(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_crawl_cache(Path(tmp_dir), {})]) as context:
+                crawl_cache = context.crawl_cache
+                crawl_cache.update(PAGE_A, "Page a", lastmod="2024-01-01", etag='"a1"', last_modified=None)
+
+            with when():
+                unchanged = crawl_cache.update(PAGE_A, "Page a", lastmod="2024-02-01", etag='"a2"', last_modified=None)
+                changed = crawl_cache.update(PAGE_A, "Page a v2", lastmod="2024-03-01", etag='"a3"', last_modified=None)
+                crawl_cache.save()
+                reloaded = CrawlCache(crawl_cache.path)
+
+            with then():
+                assert_that(unchanged, equal_to(False))
+                assert_that(changed, equal_to(True))
+                assert_that(reloaded.is_fresh(PAGE_A, "2024-03-01"), equal_to(True))
+                assert_that(reloaded.conditional_headers(PAGE_A), equal_to({"If-None-Match": '"a3"'}))
+
+
+class TestRecrawl(unittest.TestCase):
+    def test_when_recrawled_then_only_stale_pages_are_fetched_and_manifest_lists_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given(
+                [
+                    prepare_crawl_cache(Path(tmp_dir), CACHED_PAGES),
+                    prepare_jsonl_output(Path(tmp_dir), OUTPUT_LINES),
+                    # Page a is unchanged in the sitemap, b and c moved and d left it
+                    prepare_recrawl_scraper({PAGE_A: "2024-01-01", PAGE_B: "2024-02-01", PAGE_C: "2024-02-01"}),
+                    prepare_site_pages(
+                        {
+                            PAGE_B: (304, "", {}),
+                            PAGE_C: (200, "<html><body><p>New content of c</p></body></html>", {"ETag": '"c2"'}),
+                        }
+                    ),
+                ]
+            ) as context:
+                output_path = context.output_path
+                base_fingerprint = fingerprint_file(output_path)
+
+            with when(), patch("tools.scraping.scraper.requests.get", side_effect=context.get):
+                manifest = context.scraper.recrawl([PAGE_A, PAGE_B, PAGE_C], output_path)
+
+            with then():
+                assert_that(context.request_headers, is_not(has_key(PAGE_A)))
+                assert_that(context.request_headers[PAGE_B], has_entries({"If-None-Match": '"b1"'}))
+                assert_that(manifest.changed, equal_to([PAGE_C]))
+                assert_that(manifest.removed, equal_to([PAGE_D]))
+                assert_that(manifest.unchanged, equal_to(2))
+                assert_that(manifest.base_fingerprint, equal_to(base_fingerprint))
+                assert_that(manifest.data_fingerprint, equal_to(fingerprint_file(output_path)))
+                assert_that(
+                    CrawlManifest.load(CrawlManifest.path_for(output_path)).model_dump(),
+                    equal_to(manifest.model_dump()),
+                )
+
+                pages = {item["url"]: item["content"] for item in map(json.loads, output_path.open())}
+                assert_that(
+                    pages,
+                    equal_to({PAGE_A: f"Old {PAGE_A}", PAGE_B: f"Old {PAGE_B}", PAGE_C: "New content of c"}),
+                )
+                reloaded = CrawlCache(context.crawl_cache.path)
+                assert_that(sorted(reloaded.urls()), equal_to([PAGE_A, PAGE_B, PAGE_C]))
+                assert_that(reloaded.is_fresh(PAGE_B, "2024-02-01"), equal_to(True))
+                assert_that(reloaded.conditional_headers(PAGE_C), equal_to({"If-None-Match": '"c2"'}))
@@ -0,0 +1,123 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to
+
+from tests.scraping.steps import prepare_jsonl_output, prepare_sync_scraper
+from tools.scraping.scraper import convert_jsonl_to_json, load_scraped_urls, merge_scraped_output, repair_jsonl
+
+COMPLETE_LINES = [
+    '{"url": "https://example.com/a", "content": "Page a"}\n',
+    '{"url": "https://example.com/b", "content": "Page b"}\n',
+]
+
+
+class TestJsonlOutput(unittest.TestCase):
+    def test_when_last_line_is_truncated_then_repair_drops_only_that_line(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES + ['{"url": "https://exam'])]) as context:
+                output_path = context.output_path
+
+            with when():
+                repair_jsonl(output_path)
+
+            with then():
+                assert_that(output_path.read_text(encoding="utf-8"), equal_to("".join(COMPLETE_LINES)))
+
+    def test_when_file_ends_with_complete_line_then_repair_leaves_it_untouched(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES)]) as context:
+                output_path = context.output_path
+
+            with when():
+                repair_jsonl(output_path)
+
+            with then():
+                assert_that(output_path.read_text(encoding="utf-8"), equal_to("".join(COMPLETE_LINES)))
+
+    def test_when_file_is_empty_then_repair_leaves_it_untouched_without_warning(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_jsonl_output(Path(tmp_dir), [])]) as context:
+                output_path = context.output_path
+
+            with when(), self.assertNoLogs("tools.scraping.scraper", level="WARNING"):
+                repair_jsonl(output_path)
+
+            with then():
+                assert_that(output_path.read_bytes(), equal_to(b""))
+
+    def test_when_output_has_truncated_line_then_only_complete_pages_count_as_scraped(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given(
+                [prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES + ['{"url": "https://example.com/c", "co'])]
+            ) as context:
+                output_path = context.output_path
+
+            with when():
+                urls = load_scraped_urls(output_path)
+
+            with then():
+                assert_that(urls, equal_to({"https://example.com/a", "https://example.com/b"}))
+
+    def test_when_scraping_resumes_then_only_pages_missing_from_output_are_fetched_and_appended(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given(
+                [prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES + ['{"url": "https://ex']), prepare_sync_scraper()]
+            ) as context:
+                output_path = context.output_path
+                urls = [f"https://example.com/{name}" for name in ("a", "b", "c", "d", "e")]
+
+            with when():
+                context.scraper.scrape_pages(urls, output_path)
+
+            with then():
+                assert_that(context.fetched_urls, equal_to(urls[2:]))
+                lines = output_path.read_text(encoding="utf-8").splitlines()
+                assert_that([json.loads(line)["url"] for line in lines], equal_to(urls))
+
+    def test_when_jsonl_is_converted_then_json_array_holds_every_item_in_order(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = Path(tmp_dir) / "raw_data.json"
+            with given([prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES)]) as context:
+                output_path = context.output_path
+
+            with when():
+                convert_jsonl_to_json(output_path, json_path)
+
+            with then():
+                items = json.loads(json_path.read_text(encoding="utf-8"))
+                assert_that(items, equal_to([json.loads(line) for line in COMPLETE_LINES]))
+
+    def test_when_recrawled_pages_are_merged_then_replaced_and_removed_pages_leave_the_output(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            delta_path = Path(tmp_dir) / "raw_data.delta.jsonl"
+            delta_path.write_text('{"url": "https://example.com/b", "content": "Page b v2"}\n', encoding="utf-8")
+            with given([prepare_jsonl_output(Path(tmp_dir), COMPLETE_LINES)]) as context:
+                output_path = context.output_path
+
+            with when():
+                merge_scraped_output(output_path, delta_path, {"https://example.com/a", "https://example.com/b"})
+
+            with then():
+                lines = output_path.read_text(encoding="utf-8").splitlines()
+                assert_that(
+                    [json.loads(line) for line in lines],
+                    equal_to([{"url": "https://example.com/b", "content": "Page b v2"}]),
+                )
+                assert_that(delta_path.exists(), equal_to(False))
+
+    def test_when_first_crawl_is_merged_then_output_is_created_from_the_delta(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = Path(tmp_dir) / "raw_data.json"
+            delta_path = Path(tmp_dir) / "raw_data.delta.jsonl"
+            delta_path.write_text("".join(COMPLETE_LINES), encoding="utf-8")
+
+            with when():
+                merge_scraped_output(output_path, delta_path, set())
+
+            with then():
+                items = json.loads(output_path.read_text(encoding="utf-8"))
+                assert_that(items, equal_to([json.loads(line) for line in COMPLETE_LINES]))
@@ -0,0 +1,86 @@
+import gzip
+import unittest
+from unittest.mock import MagicMock, patch
+
+from givenpy import given, when, then
+from hamcrest import assert_that, calling, contains_inanyorder, equal_to, raises
+from requests import HTTPError
+
+from tests.scraping.steps import prepare_sitemaps, sitemap_index_xml, urlset_xml
+from tools.scraping.scraper import Scraper
+from tools.scraping.sitemap import SitemapReader
+
+SITE = "https://example.com"
+INDEX_URL = f"{SITE}/sitemap.xml"
+GZIPPED_URL = f"{SITE}/sitemap-docs.xml.gz"
+PLAIN_URL = f"{SITE}/sitemap-blog.xml"
+
+DOCS_ENTRIES = [(f"{SITE}/docs/a", "2024-01-01"), (f"{SITE}/docs/b", None)]
+BLOG_ENTRIES = [(f"{SITE}/blog/post", "2024-02-01")]
+
+
+class TestSitemapReader(unittest.TestCase):
+    # Tiny reads split elements and the gzip header across chunks
+    @patch("tools.scraping.sitemap.READ_CHUNK_SIZE", 7)
+    def test_when_index_lists_gzipped_and_plain_sitemaps_then_every_page_is_read_once_per_sitemap(self):
+        with given(
+            [
+                prepare_sitemaps(
+                    {
+                        # The index lists a child twice and itself, neither may be read again
+                        INDEX_URL: sitemap_index_xml([GZIPPED_URL, PLAIN_URL, GZIPPED_URL, INDEX_URL]),
+                        GZIPPED_URL: gzip.compress(urlset_xml(DOCS_ENTRIES)),
+                        PLAIN_URL: urlset_xml(BLOG_ENTRIES),
+                    }
+                )
+            ]
+        ) as context:
+            reader = SitemapReader()
+
+        with when(), patch("tools.scraping.sitemap.requests.get", side_effect=context.get):
+            entries = list(reader.iter_entries(INDEX_URL))
+
+        with then():
+            assert_that(entries, contains_inanyorder(*DOCS_ENTRIES, *BLOG_ENTRIES))
+            assert_that(context.fetched_sitemaps, contains_inanyorder(INDEX_URL, GZIPPED_URL, PLAIN_URL))
+
+    @patch("tools.scraping.sitemap.requests.get")
+    def test_when_child_sitemap_fails_then_it_is_skipped_but_a_failing_root_raises(self, mock_get):
+        with given(
+            [
+                prepare_sitemaps(
+                    {
+                        INDEX_URL: sitemap_index_xml([f"{SITE}/missing.xml", PLAIN_URL]),
+                        PLAIN_URL: urlset_xml(BLOG_ENTRIES),
+                    }
+                )
+            ]
+        ) as context:
+            mock_get.side_effect = context.get
+            reader = SitemapReader()
+
+        with when():
+            entries = list(reader.iter_entries(INDEX_URL))
+
+        with then():
+            assert_that(entries, equal_to(BLOG_ENTRIES))
+            assert_that(calling(list).with_args(reader.iter_entries(f"{SITE}/missing.xml")), raises(HTTPError))
+
+    def test_when_page_is_listed_twice_then_it_is_scraped_once_with_its_first_lastmod(self):
+        with given(
+            [
+                prepare_sitemaps(
+                    {INDEX_URL: urlset_xml([*DOCS_ENTRIES, (f"{SITE}/docs/a", "2024-03-01"), (f"{SITE}/docs/b", None)])}
+                )
+            ]
+        ) as context:
+            scraper = Scraper(delay=0.0)
+            scraper.scrape_pages = MagicMock()
+
+        with when(), patch("tools.scraping.sitemap.requests.get", side_effect=context.get):
+            scraper.run(INDEX_URL, num_sections=1, output_file_name="raw_data.jsonl")
+
+        with then():
+            urls = scraper.scrape_pages.call_args.args[0]
+            assert_that(urls, equal_to([f"{SITE}/docs/a", f"{SITE}/docs/b"]))
+            assert_that(scraper._sitemap_lastmods, equal_to(dict(DOCS_ENTRIES)))
@@ -0,0 +1,54 @@
+import unittest
+
+from bs4 import BeautifulSoup
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, not_
+
+from tests.scraping.steps import prepare_html_pages
+from tools.benchmarks.html_extraction import FIXTURES_DIR
+from tools.scraping.scraper import TextExtractor
+
+LINK_PAGE = """<html><body>
+<p class="page-width">Read the integration guide <a href="https://example.com/guide">here</a> to start.</p>
+<p class="page-width">Proxies work with <a href="https://example.com/tools">many tools</a> out of the box.</p>
+<p class="page-width">Short</p>
+<script>var ignored = "<p>not a paragraph</p>";</script>
+</body></html>"""
+# lxml would close the paragraph at the div, html.parser keeps the div inside it
+NESTED_BLOCK_PAGE = "<html><body><p>Paragraph holding <div>a block element</div> inside of it.</p></body></html>"
+
+
+class TestTextExtractor(unittest.TestCase):
+    def test_when_pages_are_extracted_with_lxml_then_text_matches_beautiful_soup(self):
+        with given(
+            [
+                prepare_html_pages(
+                    sorted(FIXTURES_DIR.glob("*.html")), extra={"links": LINK_PAGE, "nested": NESTED_BLOCK_PAGE}
+                )
+            ]
+        ) as context:
+            extractor = TextExtractor()
+
+        for name, html in context.pages.items():
+            with self.subTest(page=name):
+                with when():
+                    text = extractor.extract_text(html)
+
+                with then():
+                    assert_that(text, not_(equal_to("")))
+                    assert_that(
+                        text, equal_to(extractor.extract_text_blocks(BeautifulSoup(html, "html.parser")).strip())
+                    )
+
+    def test_when_link_follows_a_keyword_then_its_url_is_kept(self):
+        with when():
+            text = TextExtractor().extract_text(LINK_PAGE)
+
+        with then():
+            assert_that(
+                text,
+                equal_to(
+                    "Read the integration guide here (https://example.com/guide) to start.\n"
+                    "Proxies work with many tools out of the box."
+                ),
+            )
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.shared.single_flight import SingleFlight
+
+
+def prepare_single_flight():
+    def step(context):
+        context.single_flight = SingleFlight()
+        context.calls = 0
+
+        async def slow_work():
+            context.calls += 1
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        context.slow_work = slow_work
+
+    return step
+
+
+def prepare_thread_executor():
+    def step(context):
+        context.executor = ThreadPoolExecutor(max_workers=4)
+        context.consumed = []
+
+        def items():
+            for i in range(10):
+                context.consumed.append(i)
+                yield i
+
+        def slow_square(chunk):
+            # Earlier chunks finish last, so completion order differs from input order
+            time.sleep(0.02 / (chunk[0] + 1))
+            return [i * i for i in chunk]
+
+        context.items = items
+        context.slow_square = slow_square
+
+    return step
@@ -0,0 +1,37 @@
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to
+
+from api.shared.parallel import ordered_parallel_map
+from tests.shared.steps import prepare_thread_executor
+
+
+class TestOrderedParallelMap(unittest.TestCase):
+    def test_when_chunks_finish_out_of_order_then_results_keep_input_order(self):
+        with given([prepare_thread_executor()]) as context:
+            self.addCleanup(context.executor.shutdown)
+
+        with when():
+            results = list(
+                ordered_parallel_map(
+                    context.executor, context.slow_square, context.items(), chunk_size=3, max_pending=2
+                )
+            )
+
+        with then():
+            assert_that(results, equal_to([i * i for i in range(10)]))
+
+    def test_when_first_result_is_taken_then_input_is_only_read_ahead_by_max_pending_chunks(self):
+        with given([prepare_thread_executor()]) as context:
+            self.addCleanup(context.executor.shutdown)
+            results = ordered_parallel_map(
+                context.executor, context.slow_square, context.items(), chunk_size=2, max_pending=2
+            )
+
+        with when():
+            first = next(results)
+
+        with then():
+            assert_that(first, equal_to(0))
+            assert_that(context.consumed, equal_to([0, 1, 2, 3, 4, 5]))
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, is_
+
+from api.shared.single_flight import SingleFlight
+from tests.shared.steps import prepare_single_flight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_when_same_key_is_requested_concurrently_then_work_runs_once(self):
+        with given([prepare_single_flight()]) as context:
+            single_flight: SingleFlight = context.single_flight
+
+            async def run():
+                return await asyncio.gather(*(single_flight.do("question", context.slow_work) for _ in range(5)))
+
+        with when():
+            results = asyncio.run(run())
+
+        with then():
+            assert_that(results, equal_to(["answer"] * 5))
+            assert_that(context.calls, equal_to(1))
+            assert_that(single_flight.in_flight, equal_to(0))
+
+    def test_when_one_waiter_is_cancelled_then_other_waiters_still_get_the_result(self):
+        with given([prepare_single_flight()]) as context:
+            single_flight: SingleFlight = context.single_flight
+
+            async def run():
+                cancelled = asyncio.create_task(single_flight.do("question", context.slow_work))
+                remaining = asyncio.create_task(single_flight.do("question", context.slow_work))
+                await asyncio.sleep(0.01)
+                cancelled.cancel()
+                return await remaining, cancelled.cancelled()
+
+        with when():
+            result, was_cancelled = asyncio.run(run())
+
+        with then():
+            assert_that(result, equal_to("answer"))
+            assert_that(was_cancelled, is_(True))
+            assert_that(context.calls, equal_to(1))
+
+    def test_when_all_waiters_are_cancelled_then_shared_work_is_cancelled(self):
+        with given([prepare_single_flight()]) as context:
+            single_flight: SingleFlight = context.single_flight
+
+            async def run():
+                waiter = asyncio.create_task(single_flight.do("question", context.slow_work))
+                await asyncio.sleep(0.01)
+                waiter.cancel()
+                await asyncio.sleep(0)
+                in_flight_after_cancel = single_flight.in_flight
+                return in_flight_after_cancel, await single_flight.do("question", context.slow_work)
+
+        with when():
+            in_flight_after_cancel, result = asyncio.run(run())
+
+        with then():
+            assert_that(in_flight_after_cancel, equal_to(0))
+            assert_that(result, equal_to("answer"))
+            assert_that(context.calls, equal_to(2))
+
+    def test_when_shared_work_fails_then_every_waiter_gets_the_error(self):
+        with given([prepare_single_flight()]) as context:
+            single_flight: SingleFlight = context.single_flight
+
+            async def failing_work():
+                await asyncio.sleep(0.01)
+                raise ValueError("upstream failed")
+
+            async def run():
+                return await asyncio.gather(
+                    *(single_flight.do("question", failing_work) for _ in range(3)), return_exceptions=True
+                )
+
+        with when():
+            results = asyncio.run(run())
+
+        with then():
+            assert_that([type(result) for result in results], equal_to([ValueError] * 3))
@@ -1,5 +1,18 @@
-from unittest.mock import MagicMock
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import List
+from unittest.mock import AsyncMock, MagicMock
 
+import httpx
+import numpy as np
+from langchain.schema import Document
+
+from api.vector.batching import MicroBatchingEmbeddings
+from api.vector.bulk_embedding import BulkEmbedder
+from api.vector.embedding_cache import CachedEmbeddings, EmbeddingCache
+from api.vector.flat_index import FlatIndex
+from api.vector.lexical_index import BM25Index
 from api.vector.store import VectorStore, ContextEntry
 from api.vector.text_preprocessor import RawDataPreprocessor
 from paths import TEST_DATA_DIR
@@ -11,9 +24,10 @@ def prepare_mock_vector_store():
             openai_api_key="test-key", persist_directory=TEST_DATA_DIR / "test_persistent_chroma_db"
         )
         # Mock the OpenAI embeddings to avoid actual API calls
-        context.vector_store.embeddings = MagicMock()
-        context.vector_store.embeddings.embed_documents.return_value = [[0.1] * 1536 for _ in range(10)]
-        context.vector_store.embeddings.embed_query.return_value = [0.1] * 1536
+        context.vector_store._embeddings = MagicMock()
+        context.vector_store._embeddings.embed_documents.return_value = [[0.1] * 1536 for _ in range(10)]
+        context.vector_store._embeddings.embed_query.return_value = [0.1] * 1536
+        context.vector_store._embeddings.aembed_query = AsyncMock(return_value=[0.1] * 1536)
 
     return step
 
@@ -46,3 +60,157 @@ def prepare_mock_raw_data_preprocessor():
         context.preprocessor = RawDataPreprocessor()
 
     return step
+
+
+def prepare_embedding_cache(max_size: int = 10, ttl_seconds=None, persist_path=None, flush_interval_seconds=1.0):
+    def step(context):
+        context.embedding_cache = EmbeddingCache(
+            max_size=max_size,
+            ttl_seconds=ttl_seconds,
+            persist_path=persist_path,
+            flush_interval_seconds=flush_interval_seconds,
+        )
+
+    return step
+
+
+def persisted_queries(persist_path: Path) -> List[str]:
+    with closing(sqlite3.connect(str(persist_path))) as connection:
+        return [query for (query,) in connection.execute("SELECT query FROM query_embeddings ORDER BY query")]
+
+
+def prepare_cached_embeddings():
+    def step(context):
+        context.inner_embeddings = MagicMock()
+        context.inner_embeddings.model = "text-embedding-test"
+        context.inner_embeddings.embed_query.side_effect = lambda text: [float(len(text)), 1.0]
+        context.inner_embeddings.aembed_documents = AsyncMock(
+            side_effect=lambda texts: [[float(len(text)), 1.0] for text in texts]
+        )
+        context.cached_embeddings = CachedEmbeddings(context.inner_embeddings, context.embedding_cache)
+
+    return step
+
+
+def prepare_micro_batching_embeddings(window_seconds: float = 0.01, max_batch_size: int = 64):
+    def step(context):
+        context.inner_embeddings = MagicMock()
+        context.inner_embeddings.model = "text-embedding-test"
+        context.inner_embeddings.aembed_documents = AsyncMock(
+            side_effect=lambda texts: [[float(len(text))] for text in texts]
+        )
+        context.batching_embeddings = MicroBatchingEmbeddings(
+            context.inner_embeddings, window_seconds=window_seconds, max_batch_size=max_batch_size
+        )
+
+    return step
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+EMBEDDINGS_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+def prepare_bulk_embedder(batch_size: int = 2, max_workers: int = 2, failures=()):
+    def step(context):
+        context.chunks = [Document(page_content=f"chunk {i}", id=str(i)) for i in range(5)]
+        context.committed = []
+        errors = list(failures)
+
+        def embed_documents(texts):
+            if errors:
+                raise errors.pop(0)
+            return [[float(len(text))] for text in texts]
+
+        context.inner_embeddings = MagicMock()
+        context.inner_embeddings.embed_documents.side_effect = embed_documents
+        context.bulk_embedder = BulkEmbedder(
+            context.inner_embeddings, batch_size=batch_size, max_workers=max_workers, initial_backoff_seconds=0.01
+        )
+
+    return step
+
+
+def prepare_fake_sentence_transformers_module():
+    def step(context):
+        context.sentence_transformer_model = MagicMock()
+        context.sentence_transformer_model.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text)), 1.0] for text in texts]
+        )
+        context.sentence_transformers_module = MagicMock()
+        context.sentence_transformers_module.SentenceTransformer.return_value = context.sentence_transformer_model
+
+    return step
+
+
+def prepare_one_hot_flat_index(size: int):
+    """Chunk i is the only one close to the unit vector along axis i and is named after i."""
+
+    def step(context):
+        context.flat_index = FlatIndex(embedding_function=MagicMock())
+        context.flat_index.add_embeddings(
+            texts=[str(i) for i in range(size)], embeddings=np.eye(size).tolist(), ids=[str(i) for i in range(size)]
+        )
+
+    return step
+
+
+def prepare_flat_index(persist_directory=None):
+    def step(context):
+        context.flat_embeddings = MagicMock()
+        context.flat_index = FlatIndex(embedding_function=context.flat_embeddings, persist_directory=persist_directory)
+        context.flat_index.add_embeddings(
+            texts=["proxy setup", "pricing plans", "api authentication"],
+            embeddings=[[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0]],
+            metadatas=[{"source_url": "a"}, {"source_url": "b"}, {"source_url": "c"}],
+            ids=["a", "b", "c"],
+        )
+
+    return step
+
+
+def prepare_flat_vector_store(persist_directory, **kwargs):
+    def step(context):
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [
+            [float("API" in text), float("Pricing" in text), float("Integration" in text)] for text in texts
+        ]
+        embeddings.aembed_query = AsyncMock(return_value=[0.0, 1.0, 0.0])
+        context.vector_store = VectorStore(
+            openai_api_key="test-key",
+            persist_directory=persist_directory,
+            embeddings=embeddings,
+            index_engine="flat",
+            **kwargs,
+        )
+
+    return step
+
+
+def prepare_lexical_index():
+    def step(context):
+        context.lexical_index = BM25Index()
+        context.lexical_index.add_documents(
+            [
+                Document(
+                    page_content="Use ip.oxylabs.io/location to check the parameters of your IPs.",
+                    metadata={"source_url": "https://developers.oxylabs.io/proxies/integration-guides"},
+                ),
+                Document(
+                    page_content="Enter the command: ping pr.oxylabs.io to get the IP address for integrations.",
+                    metadata={"source_url": "https://developers.oxylabs.io/proxies/get-ip-address"},
+                ),
+                Document(
+                    page_content="Set up a proxy in Chrome through the browser settings and proxy extensions.",
+                    metadata={"source_url": "https://developers.oxylabs.io/proxies/chrome"},
+                ),
+                Document(
+                    page_content="Residential proxies are priced per gigabyte of traffic.",
+                    metadata={"source_url": "https://oxylabs.io/pricing"},
+                ),
+            ]
+        )
+
+    return step
@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to
+
+from api.vector.batching import MicroBatchingEmbeddings
+from tests.vector.steps import prepare_micro_batching_embeddings
+
+
+class TestMicroBatchingEmbeddings(unittest.TestCase):
+    def test_when_queries_arrive_within_window_then_they_are_embedded_in_one_call(self):
+        with given([prepare_micro_batching_embeddings()]) as context:
+            embeddings: MicroBatchingEmbeddings = context.batching_embeddings
+
+            async def run():
+                return await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "bb", "ccc", "bb"]))
+
+        with when():
+            vectors = asyncio.run(run())
+
+        with then():
+            assert_that(vectors, equal_to([[1.0], [2.0], [3.0], [2.0]]))
+            context.inner_embeddings.aembed_documents.assert_awaited_once_with(["a", "bb", "ccc"])
+
+    def test_when_max_batch_size_is_reached_then_batch_is_sent_without_waiting_for_window(self):
+        with given([prepare_micro_batching_embeddings(window_seconds=60, max_batch_size=2)]) as context:
+            embeddings: MicroBatchingEmbeddings = context.batching_embeddings
+
+            async def run():
+                return await asyncio.wait_for(
+                    asyncio.gather(embeddings.aembed_query("a"), embeddings.aembed_query("bb")), timeout=1
+                )
+
+        with when():
+            vectors = asyncio.run(run())
+
+        with then():
+            assert_that(vectors, equal_to([[1.0], [2.0]]))
+            assert_that(embeddings.stats()["batches"], equal_to(1))
+
+    def test_when_batch_embedding_fails_then_every_waiter_gets_the_error(self):
+        with given([prepare_micro_batching_embeddings()]) as context:
+            embeddings: MicroBatchingEmbeddings = context.batching_embeddings
+            context.inner_embeddings.aembed_documents.side_effect = RuntimeError("rate limited")
+
+            async def run():
+                return await asyncio.gather(
+                    embeddings.aembed_query("a"), embeddings.aembed_query("b"), return_exceptions=True
+                )
+
+        with when():
+            results = asyncio.run(run())
+
+        with then():
+            assert_that([type(result) for result in results], equal_to([RuntimeError, RuntimeError]))
+
+    def test_when_batch_is_in_flight_then_its_task_is_referenced_until_it_completes(self):
+        with given([prepare_micro_batching_embeddings(window_seconds=0)]) as context:
+            embeddings: MicroBatchingEmbeddings = context.batching_embeddings
+
+            async def slow_embed(texts):
+                await asyncio.sleep(0.05)
+                return [[float(len(text))] for text in texts]
+
+            context.inner_embeddings.aembed_documents.side_effect = slow_embed
+
+            async def run():
+                query = asyncio.ensure_future(embeddings.aembed_query("a"))
+                await asyncio.sleep(0.01)
+                in_flight = len(embeddings._batch_tasks)
+                return in_flight, await query
+
+        with when():
+            in_flight, vector = asyncio.run(run())
+
+        with then():
+            assert_that(in_flight, equal_to(1))
+            assert_that(vector, equal_to([1.0]))
+            assert_that(len(embeddings._batch_tasks), equal_to(0))
@@ -0,0 +1,95 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import openai
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, calling, has_item, has_items, not_, raises
+
+from api.vector.bulk_embedding import BulkEmbedder, IngestionCheckpoint
+from tests.vector.steps import EMBEDDINGS_REQUEST, FakeRateLimitError, prepare_bulk_embedder
+
+
+class TestBulkEmbedder(unittest.TestCase):
+    def test_when_batch_is_rate_limited_then_it_is_retried_and_all_batches_are_committed(self):
+        with given([prepare_bulk_embedder(failures=[FakeRateLimitError("rate limited")])]) as context:
+            bulk_embedder: BulkEmbedder = context.bulk_embedder
+
+        with when():
+            result = bulk_embedder.embed(context.chunks, lambda batch, vectors: context.committed.extend(batch))
+
+        with then():
+            assert_that(result.embedded_chunks, equal_to(5))
+            assert_that(result.batches, equal_to(3))
+            assert_that(result.retries, equal_to(1))
+            assert_that(sorted(chunk.id for chunk in context.committed), equal_to(["0", "1", "2", "3", "4"]))
+
+    def test_when_connection_drops_then_batch_is_retried_and_all_batches_are_committed(self):
+        for error in [
+            openai.APIConnectionError(request=EMBEDDINGS_REQUEST),
+            openai.APITimeoutError(request=EMBEDDINGS_REQUEST),
+        ]:
+            with self.subTest(error=type(error).__name__):
+                with given([prepare_bulk_embedder(failures=[error])]) as context:
+                    bulk_embedder: BulkEmbedder = context.bulk_embedder
+
+                with when():
+                    result = bulk_embedder.embed(context.chunks, lambda batch, vectors: context.committed.extend(batch))
+
+                with then():
+                    assert_that(result.retries, equal_to(1))
+                    assert_that(sorted(chunk.id for chunk in context.committed), equal_to(["0", "1", "2", "3", "4"]))
+
+    def test_when_batch_fails_then_committed_progress_is_kept_in_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_bulk_embedder(max_workers=1)]) as context:
+                bulk_embedder: BulkEmbedder = context.bulk_embedder
+                checkpoint = IngestionCheckpoint(Path(tmp_dir) / "checkpoint.json")
+                embed_documents = context.inner_embeddings.embed_documents
+
+                def embed_first_batch_only(texts):
+                    if embed_documents.call_count > 1:
+                        raise ValueError("bad input")
+                    return [[1.0] for _ in texts]
+
+                embed_documents.side_effect = embed_first_batch_only
+
+            with when():
+                embed = calling(bulk_embedder.embed).with_args(
+                    context.chunks, lambda batch, vectors: context.committed.extend(batch), checkpoint
+                )
+
+            with then():
+                assert_that(embed, raises(ValueError))
+                assert_that(context.committed, equal_to(context.chunks[:2]))
+                assert_that(json.loads(checkpoint.path.read_text())["committed_chunks"], equal_to(2))
+
+    def test_when_batch_fails_then_batches_still_running_are_committed_before_raising(self):
+        with given([prepare_bulk_embedder(max_workers=2)]) as context:
+            bulk_embedder: BulkEmbedder = context.bulk_embedder
+            second_batch_started = threading.Event()
+
+            def embed_documents(texts):
+                if "chunk 0" in texts:
+                    # Fails while the second batch is still being embedded
+                    second_batch_started.wait(timeout=1)
+                    raise ValueError("bad input")
+                second_batch_started.set()
+                time.sleep(0.2)
+                return [[1.0] for _ in texts]
+
+            context.inner_embeddings.embed_documents.side_effect = embed_documents
+
+        with when():
+            embed = calling(bulk_embedder.embed).with_args(
+                context.chunks, lambda batch, vectors: context.committed.extend(batch)
+            )
+
+        with then():
+            assert_that(embed, raises(ValueError))
+            # The last batch may have started before the failure was seen, then it is committed too
+            assert_that([chunk.id for chunk in context.committed], has_items("2", "3"))
+            assert_that([chunk.id for chunk in context.committed], not_(has_item("0")))
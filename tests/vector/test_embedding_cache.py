@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, none, is_
+
+from api.vector.embedding_cache import EmbeddingCache
+from tests.vector.steps import prepare_embedding_cache, prepare_cached_embeddings, persisted_queries
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_when_same_normalized_query_is_embedded_twice_then_inner_embedder_is_called_once(self):
+        with given([prepare_embedding_cache(), prepare_cached_embeddings()]) as context:
+            cached_embeddings = context.cached_embeddings
+
+        with when():
+            first = cached_embeddings.embed_query("How do I set up a proxy?")
+            second = cached_embeddings.embed_query("  how do I   SET UP a proxy? ")
+
+        with then():
+            assert_that(first, equal_to(second))
+            assert_that(context.inner_embeddings.embed_query.call_count, equal_to(1))
+            assert_that(context.embedding_cache.hits, equal_to(1))
+            assert_that(context.embedding_cache.misses, equal_to(1))
+
+    def test_when_queries_are_embedded_together_then_only_cache_misses_are_embedded_in_one_call(self):
+        with given([prepare_embedding_cache(), prepare_cached_embeddings()]) as context:
+            cached_embeddings = context.cached_embeddings
+            cached_embeddings.embed_query("cached")
+
+        with when():
+            vectors = asyncio.run(cached_embeddings.aembed_queries(["cached", "new", "other", "new"]))
+
+        with then():
+            assert_that(vectors, equal_to([[6.0, 1.0], [3.0, 1.0], [5.0, 1.0], [3.0, 1.0]]))
+            context.inner_embeddings.aembed_documents.assert_awaited_once_with(["new", "other"])
+
+    def test_when_cache_is_full_then_least_recently_used_entry_is_evicted(self):
+        with given([prepare_embedding_cache(max_size=2)]) as context:
+            cache: EmbeddingCache = context.embedding_cache
+            cache.put("model", "first", [1.0])
+            cache.put("model", "second", [2.0])
+            cache.get("model", "first")
+
+        with when():
+            cache.put("model", "third", [3.0])
+
+        with then():
+            assert_that(cache.get("model", "second"), none())
+            assert_that(cache.get("model", "first"), equal_to([1.0]))
+            assert_that(cache.get("model", "third"), equal_to([3.0]))
+
+    def test_when_models_differ_then_entries_are_kept_apart(self):
+        with given([prepare_embedding_cache()]) as context:
+            cache: EmbeddingCache = context.embedding_cache
+            cache.put("model-a", "query", [1.0])
+
+        with when():
+            result = cache.get("model-b", "query")
+
+        with then():
+            assert_that(result, none())
+
+    def test_when_entry_is_older_than_ttl_then_it_is_a_miss(self):
+        with given([prepare_embedding_cache(ttl_seconds=-1)]) as context:
+            cache: EmbeddingCache = context.embedding_cache
+            cache.put("model", "query", [1.0])
+
+        with when():
+            result = cache.get("model", "query")
+
+        with then():
+            assert_that(result, none())
+            assert_that(cache.stats()["size"], equal_to(0))
+
+    def test_when_cache_is_persisted_then_entries_survive_a_restart(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            persist_path = Path(tmp_dir) / "embedding_cache.sqlite"
+            with given([prepare_embedding_cache(persist_path=persist_path)]) as context:
+                context.embedding_cache.put("model", "query", [0.25, -0.5])
+
+            with when():
+                context.embedding_cache.close()
+                restarted = EmbeddingCache(persist_path=persist_path)
+
+            with then():
+                assert_that(restarted.get("model", "query"), equal_to([0.25, -0.5]))
+                assert_that(restarted.hits, is_(1))
+
+    def test_when_entry_is_put_then_it_is_persisted_by_the_writer_thread_not_the_caller(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            persist_path = Path(tmp_dir) / "embedding_cache.sqlite"
+            with given([prepare_embedding_cache(persist_path=persist_path, flush_interval_seconds=60)]) as context:
+                cache = context.embedding_cache
+
+            with when():
+                cache.put("model", "query", [0.25, -0.5])
+                cache.put("model", "other query", [1.0, 0.0])
+                cache.clear()
+                cache.put("model", "last query", [0.5, 0.5])
+                persisted_before_flush = persisted_queries(persist_path)
+                cache.flush()
+
+            with then():
+                assert_that(persisted_before_flush, equal_to([]))
+                assert_that(persisted_queries(persist_path), equal_to(["last query"]))
+                cache.close()
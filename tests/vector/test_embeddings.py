@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, instance_of, is_not
+from langchain_openai import OpenAIEmbeddings
+
+from api.vector.embeddings import (
+    SentenceTransformerEmbeddings,
+    collection_name_for,
+    create_embeddings,
+    default_max_distance,
+)
+from tests.vector.steps import prepare_fake_sentence_transformers_module
+
+
+class TestEmbeddings(unittest.TestCase):
+    def test_when_openai_provider_is_selected_then_openai_embeddings_with_default_model_are_created(self):
+        with given([]):
+            provider = "openai"
+
+        with when():
+            embeddings = create_embeddings(provider, openai_api_key="test-key")
+
+        with then():
+            assert_that(embeddings, instance_of(OpenAIEmbeddings))
+            assert_that(embeddings.model, equal_to("text-embedding-ada-002"))
+
+    def test_when_openai_base_url_is_given_then_embeddings_are_requested_from_it(self):
+        with given([]):
+            base_url = "http://127.0.0.1:8099/v1"
+
+        with when():
+            embeddings = create_embeddings("openai", openai_api_key="test-key", openai_base_url=base_url)
+
+        with then():
+            assert_that(embeddings.openai_api_base, equal_to(base_url))
+
+    def test_when_local_provider_is_selected_then_model_is_loaded_once_and_encodes_in_batches(self):
+        with given([prepare_fake_sentence_transformers_module()]) as context:
+            modules = {"sentence_transformers": context.sentence_transformers_module}
+
+        with when(), patch.dict("sys.modules", modules):
+            embeddings = create_embeddings("sentence_transformers", batch_size=16)
+            documents = embeddings.embed_documents(["a", "bb"])
+            query = asyncio.run(embeddings.aembed_query("ccc"))
+
+        with then():
+            assert_that(embeddings, instance_of(SentenceTransformerEmbeddings))
+            assert_that(documents, equal_to([[1.0, 1.0], [2.0, 1.0]]))
+            assert_that(query, equal_to([3.0, 1.0]))
+            context.sentence_transformers_module.SentenceTransformer.assert_called_once_with(
+                "sentence-transformers/all-MiniLM-L6-v2", device="cpu"
+            )
+            encode_kwargs = context.sentence_transformer_model.encode.call_args.kwargs
+            assert_that(encode_kwargs["batch_size"], equal_to(16))
+
+    def test_when_models_differ_then_collections_differ(self):
+        with given([]):
+            models = ["sentence-transformers/all-MiniLM-L6-v2", "BAAI/bge-small-en-v1.5"]
+
+        with when():
+            names = [collection_name_for("sentence_transformers", model) for model in models]
+
+        with then():
+            assert_that(names[0], equal_to("sentence_transformers-sentence-transformers-all-MiniLM-L6-v2"))
+            assert_that(names[0], is_not(equal_to(names[1])))
+            assert_that(collection_name_for("openai"), equal_to("openai-text-embedding-ada-002"))
+
+    def test_when_no_threshold_is_calibrated_for_a_model_then_there_is_no_default_max_distance(self):
+        with when():
+            distances = [
+                default_max_distance("openai"),
+                default_max_distance("openai", "text-embedding-3-small"),
+                default_max_distance("sentence_transformers"),
+            ]
+
+        with then():
+            assert_that(distances, equal_to([0.5, None, None]))
@@ -0,0 +1,141 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, close_to, empty, is_
+
+from api.vector.flat_index import FlatIndex
+from tests.vector.steps import prepare_flat_index, prepare_one_hot_flat_index
+
+
+class TestFlatIndex(unittest.TestCase):
+    def test_when_searching_by_vector_then_closest_chunks_are_returned_in_order(self):
+        with given([prepare_flat_index()]) as context:
+            flat_index: FlatIndex = context.flat_index
+
+        with when():
+            results = flat_index.similarity_search_by_vector_with_relevance_scores([0.1, 0.9, 0.5], k=2)
+
+        with then():
+            assert_that(
+                [document.page_content for document, _ in results], equal_to(["pricing plans", "api authentication"])
+            )
+            expected_distance = 2.0 - 2.0 * 0.9 / np.linalg.norm([0.1, 0.9, 0.5])
+            assert_that(results[0][1], close_to(expected_distance, 1e-5))
+
+    def test_when_searching_with_several_vectors_then_each_gets_its_own_results(self):
+        with given([prepare_flat_index()]) as context:
+            flat_index: FlatIndex = context.flat_index
+
+        with when():
+            results = flat_index.similarity_search_by_vectors([[0.0, 0.0, 1.0], [1.0, 0.1, 0.0]], k=1)
+
+        with then():
+            assert_that([[document.id for document in documents] for documents in results], equal_to([["c"], ["a"]]))
+
+    def test_when_ids_are_added_again_or_deleted_then_index_is_updated_in_place(self):
+        with given([prepare_flat_index()]) as context:
+            flat_index: FlatIndex = context.flat_index
+
+        with when():
+            flat_index.add_embeddings(["proxy setup v2"], [[0.0, 1.0, 1.0]], [{"source_url": "a"}], ids=["a"])
+            flat_index.delete(["b"])
+
+        with then():
+            assert_that(flat_index.count(), equal_to(2))
+            assert_that(flat_index.get()["documents"], equal_to(["proxy setup v2", "api authentication"]))
+            assert_that(flat_index.similarity_search_by_vector([0.0, 1.0, 1.0], k=1)[0].id, equal_to("a"))
+
+    def test_when_index_is_persisted_then_it_is_memory_mapped_on_reload(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            persist_directory = Path(tmp_dir) / "flat"
+            with given([prepare_flat_index(persist_directory=persist_directory)]) as context:
+                flat_index: FlatIndex = context.flat_index
+
+            with when():
+                flat_index.flush()
+                reloaded = FlatIndex(embedding_function=MagicMock(), persist_directory=persist_directory)
+
+            with then():
+                assert_that(reloaded.count(), equal_to(3))
+                assert_that(isinstance(reloaded._matrix, np.memmap), is_(True))
+                assert_that(
+                    reloaded.similarity_search_by_vector([0.0, 0.0, 1.0], k=1)[0].page_content,
+                    equal_to("api authentication"),
+                )
+
+    def test_when_rows_are_appended_one_by_one_then_capacity_doubles_and_nothing_is_written_before_flush(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            persist_directory = Path(tmp_dir) / "flat"
+            with given([prepare_flat_index(persist_directory=persist_directory)]) as context:
+                flat_index: FlatIndex = context.flat_index
+                capacities = set()
+
+            with when():
+                for i in range(100):
+                    flat_index.add_embeddings([f"chunk {i}"], [[1.0, float(i), 0.0]], ids=[f"chunk-{i}"])
+                    capacities.add(flat_index._snapshot.buffer.shape[0])
+
+            with then():
+                assert_that(flat_index.count(), equal_to(103))
+                assert_that(sorted(capacities), equal_to([6, 12, 24, 48, 96, 192]))
+                assert_that(persist_directory.exists(), is_(False))
+                assert_that(flat_index.similarity_search_by_vector([1.0, 99.0, 0.0], k=1)[0].id, equal_to("chunk-99"))
+
+    def test_when_reloaded_index_is_updated_then_flush_persists_the_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            persist_directory = Path(tmp_dir) / "flat"
+            with given([prepare_flat_index(persist_directory=persist_directory)]) as context:
+                context.flat_index.flush()
+                reloaded = FlatIndex(embedding_function=MagicMock(), persist_directory=persist_directory)
+
+            with when():
+                reloaded.add_embeddings(["proxy setup v2"], [[0.0, 1.0, 1.0]], ids=["a"])
+                reloaded.add_embeddings(["rotating proxies"], [[1.0, 1.0, 0.0]], ids=["d"])
+                reloaded.flush()
+
+            with then():
+                flushed = FlatIndex(embedding_function=MagicMock(), persist_directory=persist_directory)
+                assert_that(flushed.count(), equal_to(4))
+                assert_that(flushed.get(ids=["a"])["documents"], equal_to(["proxy setup v2"]))
+                assert_that(flushed.similarity_search_by_vector([1.0, 1.0, 0.0], k=1)[0].id, equal_to("d"))
+
+    def test_when_chunks_are_deleted_during_searches_then_every_result_matches_its_row(self):
+        size = 200
+        with given([prepare_one_hot_flat_index(size)]) as context:
+            flat_index: FlatIndex = context.flat_index
+            queries = np.eye(size).tolist()
+            deleted = threading.Event()
+            mismatches, errors = [], []
+
+        def search():
+            while not deleted.is_set():
+                try:
+                    for axis, results in enumerate(flat_index.similarity_search_by_vectors_with_score(queries, k=1)):
+                        # Only chunk `axis` is at distance 0 from query `axis`, any other chunk is at distance 2
+                        mismatches.extend(
+                            (axis, document.page_content)
+                            for document, distance in results
+                            if distance < 1.0 and document.page_content != str(axis)
+                        )
+                except Exception as e:
+                    errors.append(e)
+
+        with when():
+            searchers = [threading.Thread(target=search) for _ in range(2)]
+            for searcher in searchers:
+                searcher.start()
+            for i in range(0, size - 1, 2):
+                flat_index.delete([str(i)])
+            deleted.set()
+            for searcher in searchers:
+                searcher.join()
+
+        with then():
+            assert_that(errors, empty())
+            assert_that(mismatches, empty())
+            assert_that(flat_index.count(), equal_to(size // 2))
@@ -0,0 +1,79 @@
+import unittest
+
+from givenpy import given, when, then
+from hamcrest import assert_that, equal_to, none, not_none, has_length
+from langchain.schema import Document
+
+from api.vector.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from tests.vector.steps import prepare_lexical_index
+
+
+class TestBM25Index(unittest.TestCase):
+    def test_when_text_has_compound_terms_then_they_are_indexed_whole_and_in_parts(self):
+        with given([]):
+            text = "Check ip.oxylabs.io/location"
+
+        with when():
+            tokens = tokenize(text)
+
+        with then():
+            assert_that(tokens, equal_to(["check", "ip.oxylabs.io/location", "ip", "oxylabs", "io", "location"]))
+
+    def test_when_exact_term_is_looked_up_then_chunk_containing_it_ranks_first(self):
+        with given([prepare_lexical_index()]) as context:
+            lexical_index: BM25Index = context.lexical_index
+
+        with when():
+            matches = lexical_index.search("pr.oxylabs.io", k=2)
+
+        with then():
+            assert_that(
+                matches[0].document.metadata["source_url"],
+                equal_to("https://developers.oxylabs.io/proxies/get-ip-address"),
+            )
+
+    def test_when_lexical_top_hit_is_strong_then_confident_search_returns_results(self):
+        with given([prepare_lexical_index()]) as context:
+            lexical_index: BM25Index = context.lexical_index
+
+        with when():
+            matches = lexical_index.confident_search("ip.oxylabs.io/location", k=3)
+
+        with then():
+            assert_that(matches, not_none())
+            assert_that(
+                matches[0].document.page_content,
+                equal_to(lexical_index.search("ip.oxylabs.io/location")[0].document.page_content),
+            )
+
+    def test_when_question_is_conversational_then_confident_search_defers_to_dense_retrieval(self):
+        with given([prepare_lexical_index()]) as context:
+            lexical_index: BM25Index = context.lexical_index
+
+        with when():
+            matches = lexical_index.confident_search("what is the best way to stay anonymous online", k=3)
+
+        with then():
+            assert_that(matches, none())
+
+    def test_when_chunk_is_deleted_then_it_is_no_longer_found(self):
+        with given([prepare_lexical_index()]) as context:
+            lexical_index: BM25Index = context.lexical_index
+            chunk = lexical_index.search("pricing gigabyte", k=1)[0].document
+
+        with when():
+            lexical_index.delete([BM25Index.document_key(chunk)])
+
+        with then():
+            assert_that(lexical_index.search("gigabyte", k=1), has_length(0))
+            assert_that(len(lexical_index), equal_to(3))
+
+    def test_when_rankings_are_fused_then_chunks_ranked_high_in_both_come_first(self):
+        with given([]):
+            a, b, c = (Document(page_content=text, metadata={"source_url": text}) for text in "abc")
+
+        with when():
+            fused = reciprocal_rank_fusion([[a, b, c], [b, c, a]], k=2)
+
+        with then():
+            assert_that([document.page_content for document in fused], equal_to(["b", "a"]))
@@ -1,11 +1,16 @@
+import io
+import json
+import tempfile
 import unittest
+from pathlib import Path
 from typing import List
 
 from api.vector.store import ContextEntry
+from api.vector.text_preprocessor import RawDataPreprocessor, iter_json_values
 
 from givenpy import given, when, then
 from paths import TEST_DATA_DIR
-from hamcrest import assert_that, instance_of, has_length, contains_string, not_
+from hamcrest import assert_that, instance_of, has_length, contains_string, not_, equal_to
 
 from tests.vector.steps import prepare_mock_raw_data_preprocessor
 
@@ -26,3 +31,45 @@ class TestRawDataPreprocessor(unittest.TestCase):
             assert_that(text_entries[0], instance_of(ContextEntry))
             assert_that(text_entries[0].content, contains_string("<Integration Guides>"))
             assert_that(text_entries[0].content, not_(contains_string("→")))
+
+    def test_when_data_is_streamed_from_jsonl_then_entries_match_the_json_array(self):
+        with given([prepare_mock_raw_data_preprocessor()]) as context:
+            preprocessor = context.preprocessor
+            expected = preprocessor.process_json_file(self.TEST_DATA_JSON)
+
+            with open(self.TEST_DATA_JSON, "r", encoding="utf-8") as file:
+                items = json.load(file)
+            tmp_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp_dir.cleanup)
+            jsonl_path = Path(tmp_dir.name) / "test_data.jsonl"
+            jsonl_path.write_text("\n".join(json.dumps(item) for item in items) + "\n", encoding="utf-8")
+
+        with when():
+            streamed = preprocessor.stream_json_file(jsonl_path)
+
+        with then():
+            assert_that(streamed, not_(instance_of(list)))
+            assert_that(list(streamed), equal_to(expected))
+
+    def test_when_json_array_is_read_in_small_chunks_then_every_item_is_decoded(self):
+        with given([]):
+            items = [{"url": f"https://oxylabs.io/{i}", "content": "text " * i, "rank": i * 1000} for i in range(50)]
+            file = io.StringIO(json.dumps(items, indent=2))
+
+        with when():
+            decoded = list(iter_json_values(file, chunk_size=7))
+
+        with then():
+            assert_that(decoded, equal_to(items))
+
+    def test_when_entries_are_processed_on_worker_processes_then_output_matches_in_order(self):
+        with given([prepare_mock_raw_data_preprocessor()]) as context:
+            expected = context.preprocessor.process_json_file(self.TEST_DATA_JSON)
+            preprocessor = RawDataPreprocessor(max_workers=2, chunk_size=4)
+            self.addCleanup(preprocessor.close)
+
+        with when():
+            entries = preprocessor.process_json_file(self.TEST_DATA_JSON)
+
+        with then():
+            assert_that(entries, equal_to(expected))
@@ -1,4 +1,7 @@
+import asyncio
+import tempfile
 import unittest
+from pathlib import Path
 from typing import List
 from unittest.mock import patch, MagicMock
 
@@ -6,8 +9,12 @@ from api.vector.store import VectorStore, ContextEntry
 from langchain.schema import Document
 
 from givenpy import given, when, then
-from hamcrest import assert_that, instance_of, has_length, equal_to, not_none, is_
-from tests.vector.steps import prepare_mock_vector_store, prepare_sample_context_entries
+from hamcrest import assert_that, instance_of, has_length, equal_to, not_none, is_, close_to
+from tests.vector.steps import (
+    prepare_flat_vector_store,
+    prepare_mock_vector_store,
+    prepare_sample_context_entries,
+)
 
 
 class TestVectorStore(unittest.TestCase):
@@ -18,7 +25,7 @@ class TestVectorStore(unittest.TestCase):
             sample_entries: List[ContextEntry] = context.sample_entries
 
             mock_chroma_instance = MagicMock()
-            mock_chroma.from_documents.return_value = mock_chroma_instance
+            mock_chroma.return_value = mock_chroma_instance
 
             vector_store.remove_persisted_store()  # Ensure a clean state
 
@@ -26,7 +33,7 @@ class TestVectorStore(unittest.TestCase):
             vector_store.add_from_preprocessed_data(sample_entries)
 
         with then():
-            assert_that(mock_chroma.from_documents.called, is_(True))
+            assert_that(mock_chroma_instance._collection.upsert.called, is_(True))
             assert_that(vector_store._vector_store, not_none())
 
     @patch("api.vector.store.Chroma")
@@ -36,7 +43,7 @@ class TestVectorStore(unittest.TestCase):
             sample_entries: List[ContextEntry] = context.sample_entries
 
             mock_chroma_instance = MagicMock()
-            mock_chroma.from_documents.return_value = mock_chroma_instance
+            mock_chroma.return_value = mock_chroma_instance
 
             # Mock search results
             mock_search_results = [
@@ -62,3 +69,168 @@ class TestVectorStore(unittest.TestCase):
             assert_that(results[0], instance_of(ContextEntry))
             assert_that(results[0].section_name, equal_to("Integration Guides"))
             assert_that(mock_chroma_instance.similarity_search.called, is_(True))
+
+    @patch("api.vector.store.Chroma")
+    def test_when_async_similarity_search_is_performed_then_query_is_embedded_asynchronously(self, mock_chroma):
+        with given([prepare_mock_vector_store(), prepare_sample_context_entries()]) as context:
+            vector_store: VectorStore = context.vector_store
+            sample_entries: List[ContextEntry] = context.sample_entries
+
+            mock_chroma_instance = MagicMock()
+            mock_chroma.return_value = mock_chroma_instance
+            mock_chroma_instance._collection.query.return_value = {
+                "ids": [["api-documentation"]],
+                "documents": [["<API Documentation>\nComprehensive API documentation for Oxylabs services."]],
+                "metadatas": [
+                    [
+                        {
+                            "section_name": "API Documentation",
+                            "source_url": "https://developers.oxylabs.io/api/documentation",
+                        }
+                    ]
+                ],
+                "distances": [[0.1]],
+            }
+
+            vector_store.remove_persisted_store()  # Ensure a clean state
+            vector_store.add_from_preprocessed_data(sample_entries)
+
+        with when():
+            results = asyncio.run(vector_store.asimilarity_search("api documentation", k=2))
+
+        with then():
+            assert_that(results, has_length(1))
+            assert_that(results[0].source_url, equal_to("https://developers.oxylabs.io/api/documentation"))
+            assert_that(vector_store._embeddings.aembed_query.called, is_(True))
+            assert_that(mock_chroma_instance.similarity_search.called, is_(False))
+            mock_chroma_instance._collection.query.assert_called_once_with(
+                query_embeddings=[[0.1] * 1536], n_results=2, include=["documents", "metadatas", "distances"]
+            )
+
+    @patch("api.vector.store.Chroma")
+    def test_when_several_embeddings_are_searched_in_chroma_then_one_query_answers_all_of_them(self, mock_chroma):
+        with given([prepare_mock_vector_store(), prepare_sample_context_entries()]) as context:
+            vector_store: VectorStore = context.vector_store
+            sample_entries: List[ContextEntry] = context.sample_entries
+
+            mock_chroma_instance = MagicMock()
+            mock_chroma.return_value = mock_chroma_instance
+            mock_chroma_instance._collection.query.return_value = {
+                "ids": [["pricing"], ["api", "integration"]],
+                "documents": [["Pricing plans"], ["API documentation", "Integration guides"]],
+                "metadatas": [
+                    [{"section_name": "Pricing", "source_url": "https://developers.oxylabs.io/pricing"}],
+                    [
+                        {"section_name": "API", "source_url": "https://developers.oxylabs.io/api"},
+                        {"section_name": "Integration", "source_url": "https://developers.oxylabs.io/integration"},
+                    ],
+                ],
+                "distances": [[0.2], [0.1, 0.3]],
+            }
+
+            vector_store.remove_persisted_store()  # Ensure a clean state
+            vector_store.add_from_preprocessed_data(sample_entries)
+
+        with when():
+            results = asyncio.run(
+                vector_store.asimilarity_search_by_vectors_with_distances([[0.1] * 1536, [0.2] * 1536], k=2)
+            )
+
+        with then():
+            assert_that(mock_chroma_instance._collection.query.call_count, equal_to(1))
+            assert_that(
+                [[(entry.section_name, distance) for entry, distance in entries] for entries in results],
+                equal_to([[("Pricing", 0.2)], [("API", 0.1), ("Integration", 0.3)]]),
+            )
+
+    def test_when_flat_index_engine_is_selected_then_documents_are_searched_in_process(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_flat_vector_store(Path(tmp_dir)), prepare_sample_context_entries()]) as context:
+                vector_store: VectorStore = context.vector_store
+                vector_store.add_from_preprocessed_data(context.sample_entries)
+
+            with when():
+                results = asyncio.run(vector_store.asimilarity_search("pricing", k=1))
+                batched = asyncio.run(
+                    vector_store.asimilarity_search_by_vectors([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]], k=1)
+                )
+
+            with then():
+                assert_that(vector_store.is_vector_store_initialized(), is_(True))
+                assert_that(results[0].source_url, equal_to("https://oxylabs.io/pricing"))
+                assert_that(
+                    [entries[0].section_name for entries in batched],
+                    equal_to(["API Documentation", "Integration Guides"]),
+                )
+
+    def test_when_searching_with_distances_then_closest_entries_come_first_with_their_distance(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_flat_vector_store(Path(tmp_dir)), prepare_sample_context_entries()]) as context:
+                vector_store: VectorStore = context.vector_store
+                vector_store.add_from_preprocessed_data(context.sample_entries)
+
+            with when():
+                results = asyncio.run(vector_store.asimilarity_search_by_vector_with_distances([0.0, 1.0, 0.0], k=2))
+
+            with then():
+                assert_that(results[0][0].source_url, equal_to("https://oxylabs.io/pricing"))
+                assert_that(results[0][1], close_to(0.0, 1e-6))
+                assert_that(results[1][1], close_to(2.0, 1e-6))
+
+    def test_when_data_is_synced_again_then_only_changed_documents_are_embedded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given([prepare_flat_vector_store(Path(tmp_dir)), prepare_sample_context_entries()]) as context:
+                vector_store: VectorStore = context.vector_store
+                embed_documents = vector_store._embeddings.embed_documents
+                initial = vector_store.sync_from_preprocessed_data(context.sample_entries)
+                unchanged = vector_store.sync_from_preprocessed_data(context.sample_entries)
+                embed_documents.reset_mock()
+
+                changed_entries = [
+                    context.sample_entries[0],
+                    context.sample_entries[1].model_copy(update={"content": "<API Documentation>\nUpdated API docs."}),
+                ]
+
+            with when():
+                result = vector_store.sync_from_preprocessed_data(iter(changed_entries), batch_size=1)
+
+            with then():
+                assert_that(initial.added_chunks, equal_to(3))
+                assert_that(unchanged.added_chunks, equal_to(0))
+                assert_that(unchanged.removed_chunks, equal_to(0))
+                assert_that(result.added_chunks, equal_to(1))
+                assert_that(result.removed_chunks, equal_to(2))
+                assert_that(result.unchanged_chunks, equal_to(1))
+                embed_documents.assert_called_once_with(["<API Documentation>\nUpdated API docs."])
+                assert_that(vector_store._vector_store.count(), equal_to(2))
+
+    def test_when_ingestion_is_interrupted_then_next_sync_embeds_only_remaining_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with given(
+                [
+                    prepare_flat_vector_store(Path(tmp_dir), ingestion_batch_size=1, ingestion_max_workers=1),
+                    prepare_sample_context_entries(),
+                ]
+            ) as context:
+                vector_store: VectorStore = context.vector_store
+                embed_documents = vector_store._embeddings.embed_documents
+
+                def embed_first_batch_only(texts):
+                    if embed_documents.call_count > 1:
+                        raise ConnectionError("connection lost")
+                    return [[1.0, 0.0, 0.0]]
+
+                embed_documents.side_effect = embed_first_batch_only
+                self.assertRaises(ConnectionError, vector_store.sync_from_preprocessed_data, context.sample_entries)
+
+                embed_documents.reset_mock()
+                embed_documents.side_effect = lambda texts: [[0.0, 1.0, 0.0] for _ in texts]
+
+            with when():
+                result = vector_store.sync_from_preprocessed_data(context.sample_entries)
+
+            with then():
+                assert_that(result.unchanged_chunks, equal_to(1))
+                assert_that(result.added_chunks, equal_to(2))
+                assert_that(embed_documents.call_count, equal_to(2))
+                assert_that(vector_store._vector_store.count(), equal_to(3))
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from api.shared.logger import get_logger
+from paths import ROOT_DIR
+from tools.benchmarks.embedding_batching import percentile
+from tools.benchmarks.fake_openai_server import FakeOpenAiServer
+
+LOGGER = get_logger(__name__)
+
+QUESTIONS = [
+    "How do I integrate proxies?",
+    "What is the IP address for integrations?",
+    "How do I set up a proxy in Chrome?",
+    "Where can I check the location of my IP?",
+    "What are the pricing options for residential proxies?",
+]
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    requests: int
+    elapsed_seconds: float
+    latencies_ms: List[float] = field(repr=False)
+    statuses: Dict[str, int]
+    llm_requests: int
+    llm_errors: int
+
+    @property
+    def succeeded(self) -> int:
+        return self.statuses.get("200", 0)
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed_seconds
+
+    @property
+    def error_rate(self) -> float:
+        return 1 - self.succeeded / self.requests
+
+    def summary(self) -> Dict[str, object]:
+        latencies = self.latencies_ms or [0.0]
+        return {
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "rps": round(self.requests_per_second, 2),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p90_ms": round(percentile(latencies, 0.90), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "max_ms": round(max(latencies), 1),
+            "error_rate": round(self.error_rate, 4),
+            "statuses": self.statuses,
+            "llm_requests": self.llm_requests,
+            "llm_errors": self.llm_errors,
+        }
+
+
+def question_for(index: int, cache: bool) -> str:
+    question = QUESTIONS[index % len(QUESTIONS)]
+    # Unique questions miss the embedding and answer caches, so every request takes the full path
+    return question if cache else f"{question} (request {index})"
+
+
+async def run_level(
+    client: httpx.AsyncClient, server: FakeOpenAiServer, concurrency: int, total_requests: int, cache: bool
+) -> LevelResult:
+    """Closed-loop load: concurrency workers each send their next request as soon as the previous one is answered."""
+    latencies_ms: List[float] = []
+    statuses: Counter = Counter()
+    indexes = iter(range(total_requests))
+
+    async def worker() -> None:
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat/", json={"question": question_for(index, cache)})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if status == "200":
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+
+    server.reset_stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return LevelResult(
+        concurrency=concurrency,
+        requests=total_requests,
+        elapsed_seconds=time.perf_counter() - start,
+        latencies_ms=latencies_ms,
+        statuses=dict(statuses),
+        llm_requests=server.chat_requests,
+        llm_errors=server.chat_errors,
+    )
+
+
+def app_environment(server: FakeOpenAiServer, data_path: str, cache: bool) -> Dict[str, str]:
+    return {
+        **os.environ,
+        # The test build keeps the fake embeddings away from the persisted production index
+        "BUILD": "test",
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": server.base_url,
+        "SCRAPED_DATA_PATH": data_path,
+        "ANSWER_CACHE_ENABLED": str(cache).lower(),
+        # Hash embeddings are unrelated to the text, every question would otherwise be refused before the LLM
+        "RETRIEVAL_MAX_DISTANCE": "4.0",
+    }
+
+
+def start_app(app: str, port: int, env: Dict[str, str], log_path: Optional[Path]) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        app,
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+    ]
+    if log_path is None:
+        return subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    with open(log_path, "w") as log:
+        return subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode} during start-up")
+        try:
+            if (await client.get("/health/")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"The app did not become healthy within {timeout}s")
+
+
+async def benchmark(args: argparse.Namespace) -> List[LevelResult]:
+    server = FakeOpenAiServer(
+        latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        chat_latency_sigma=args.chat_latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    results = []
+    with server:
+        process = start_app(args.app, args.port, app_environment(server, args.data, args.cache), args.app_log)
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout, limits=limits
+            ) as client:
+                await wait_until_ready(client, process, args.startup_timeout)
+                await run_level(client, server, 1, args.warmup, args.cache)
+
+                LOGGER.info(
+                    f"chat_latency={args.chat_latency * 1000:.0f}ms sigma={args.chat_latency_sigma} "
+                    f"error_rate={args.error_rate} rate_limit_rate={args.rate_limit_rate} cache={args.cache}"
+                )
+                for concurrency in args.concurrency:
+                    result = await run_level(client, server, concurrency, args.requests, args.cache)
+                    results.append(result)
+                    summary = result.summary()
+                    LOGGER.info(
+                        f"concurrency={concurrency:<4} rps={summary['rps']:8.1f} p50={summary['p50_ms']:8.1f}ms "
+                        f"p90={summary['p90_ms']:8.1f}ms p99={summary['p99_ms']:8.1f}ms "
+                        f"errors={summary['error_rate']:6.1%} statuses={summary['statuses']} "
+                        f"llm_requests={summary['llm_requests']} llm_errors={summary['llm_errors']}"
+                    )
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Load test /chat/ end to end, the app running against a local fake OpenAI server."
+    )
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrency levels")
+    parser.add_argument("-r", "--requests", type=int, default=200, help="Requests sent per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests sent before measuring")
+    parser.add_argument("--chat_latency", type=float, default=0.5, help="Median fake LLM latency in seconds")
+    parser.add_argument("--chat_latency_sigma", type=float, default=0.3, help="Log-normal sigma of fake LLM latency")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of fake LLM calls failing with 500")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of fake LLM calls failing with 429")
+    parser.add_argument("--embedding_latency", type=float, default=0.05, help="Fake embedding latency in seconds")
+    parser.add_argument("--cache", action="store_true", help="Repeat questions and enable the answer cache")
+    parser.add_argument("--data", default="tests/data/test_data.json", help="Scraped data the app indexes")
+    parser.add_argument("--app", default="main:app", help="ASGI app to load test")
+    parser.add_argument("--port", type=int, default=8098, help="Port the app listens on")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request in seconds")
+    parser.add_argument("--startup_timeout", type=float, default=120.0, help="Time the app has to become healthy")
+    parser.add_argument("--app_log", type=Path, default=None, help="File the app output is written to")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="JSON file the results are written to")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    results = asyncio.run(benchmark(args))
+    if args.output:
+        settings = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+        report = {"settings": settings, "levels": [result.summary() for result in results]}
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        LOGGER.info(f"Results written to {args.output}")
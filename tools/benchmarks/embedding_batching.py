@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from api.shared.logger import get_logger
+from api.vector.batching import MicroBatchingEmbeddings
+from tools.benchmarks.fake_openai_server import FakeOpenAiServer
+
+LOGGER = get_logger(__name__)
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load(embeddings: Embeddings, total_queries: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await embeddings.aembed_query(f"unique benchmark question number {i}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(total_queries)))
+    return latencies
+
+
+def report(name: str, latencies: List[float], elapsed: float, server: FakeOpenAiServer) -> None:
+    LOGGER.info(
+        f"{name:<14} queries/s={len(latencies) / elapsed:8.1f} api_requests={server.embedding_requests:5d} "
+        f"p50={statistics.median(latencies) * 1000:7.1f}ms p99={percentile(latencies, 0.99) * 1000:7.1f}ms"
+    )
+
+
+async def benchmark(total_queries: int, concurrency: int, latency: float, server_concurrency: int, window: float):
+    with FakeOpenAiServer(latency=latency, max_concurrency=server_concurrency) as server:
+        client = OpenAIEmbeddings(
+            model="text-embedding-3-small",
+            openai_api_key="fake",
+            openai_api_base=server.base_url,
+            check_embedding_ctx_length=False,
+            max_retries=0,
+        )
+        variants = [
+            ("unbatched", client),
+            ("micro-batched", MicroBatchingEmbeddings(client, window_seconds=window, max_batch_size=64)),
+        ]
+
+        LOGGER.info(
+            f"queries={total_queries} concurrency={concurrency} server_latency={latency * 1000:.0f}ms "
+            f"server_concurrency={server_concurrency} window={window * 1000:.1f}ms"
+        )
+        for name, embeddings in variants:
+            server.reset_stats()
+            start = time.perf_counter()
+            latencies = await run_load(embeddings, total_queries, concurrency)
+            report(name, latencies, time.perf_counter() - start, server)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched query embedding against a fake server.")
+    parser.add_argument("-q", "--queries", type=int, default=1000, help="Total number of queries")
+    parser.add_argument("-c", "--concurrency", type=int, default=100, help="Number of concurrent queries")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Fake server latency in seconds")
+    parser.add_argument("-s", "--server_concurrency", type=int, default=8, help="Requests the server runs at once")
+    parser.add_argument("-w", "--window", type=float, default=0.005, help="Batching window in seconds")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    asyncio.run(benchmark(args.queries, args.concurrency, args.latency, args.server_concurrency, args.window))
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from api.shared.logger import get_logger
+from tools.benchmarks.fakes import hash_embedding
+
+LOGGER = get_logger(__name__)
+
+
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, List[str], List[int], List[List[int]]]
+    encoding_format: Optional[str] = None
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str
+    messages: List[Dict[str, Any]]
+    response_format: Optional[Dict[str, Any]] = None
+    stream: bool = False
+    stream_options: Optional[Dict[str, Any]] = None
+
+
+SOURCE_URL_PATTERN = re.compile(r"^### .* <(\S+)>$", re.MULTILINE)
+
+
+def fake_answer(user_message: str, answer_words: int) -> str:
+    question = user_message.rpartition("### User Question\n")[2].strip()
+    return " ".join([f"Answer to {question!r}:"] + [f"word{i}" for i in range(answer_words)])
+
+
+def fake_structured_content(schema: Dict[str, Any], user_message: str, answer_words: int) -> Dict[str, Any]:
+    """Fills a JSON schema from the prompt: string fields get an answer, array fields the URLs of the context."""
+    sources = list(dict.fromkeys(SOURCE_URL_PATTERN.findall(user_message)))
+    return {
+        name: sources if field.get("type") == "array" else fake_answer(user_message, answer_words)
+        for name, field in schema.get("properties", {}).items()
+    }
+
+
+class FakeOpenAiServer:
+    """Local stand-in for the OpenAI API with simulated latency.
+
+    Embeddings are deterministic and hash-based. Chat completions fill the requested JSON schema from the prompt, with
+    a log-normal latency around chat_latency and a share of requests failing with 500 or 429 to model an unhealthy
+    upstream.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        max_concurrency: Optional[int] = None,
+        dimensions: int = 1536,
+        chat_latency: float = 0.5,
+        chat_latency_sigma: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        answer_words: int = 50,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.max_concurrency = max_concurrency
+        self.dimensions = dimensions
+        self.chat_latency = chat_latency
+        self.chat_latency_sigma = chat_latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.answer_words = answer_words
+        self.embedding_requests = 0
+        self.embedded_inputs = 0
+        self.chat_requests = 0
+        self.chat_errors = 0
+
+        self._random = random.Random(seed)
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = self._create_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: EmbeddingRequest):
+            texts = [request.input] if isinstance(request.input, str) else request.input
+            texts = [text if isinstance(text, str) else str(text) for text in texts]
+            await self._simulate_latency()
+
+            self.embedding_requests += 1
+            self.embedded_inputs += len(texts)
+
+            data = []
+            for index, text in enumerate(texts):
+                vector = hash_embedding(text, self.dimensions)
+                if request.encoding_format == "base64":
+                    vector = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+                data.append({"object": "embedding", "index": index, "embedding": vector})
+
+            tokens = sum(len(text.split()) for text in texts)
+            return {
+                "object": "list",
+                "data": data,
+                "model": request.model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: ChatCompletionRequest):
+            self.chat_requests += 1
+            failure = self._random.random()
+            await self._simulate_latency(self._chat_latency())
+
+            if failure < self.rate_limit_rate:
+                self.chat_errors += 1
+                return self._error_response(429, "rate_limit_exceeded", "Rate limit reached", {"retry-after": "1"})
+            if failure < self.rate_limit_rate + self.error_rate:
+                self.chat_errors += 1
+                return self._error_response(500, "server_error", "The server had an error processing your request")
+
+            content = self._completion_content(request)
+            prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.messages)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content.split()),
+                "total_tokens": prompt_tokens + len(content.split()),
+            }
+            if request.stream:
+                include_usage = bool((request.stream_options or {}).get("include_usage"))
+                return StreamingResponse(
+                    self._completion_chunks(request.model, content, usage if include_usage else None),
+                    media_type="text/event-stream",
+                )
+
+            return {
+                "id": f"chatcmpl-fake-{self.chat_requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content, "refusal": None},
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }
+                ],
+                "usage": usage,
+            }
+
+        @app.get("/stats")
+        async def stats():
+            return {
+                "embedding_requests": self.embedding_requests,
+                "embedded_inputs": self.embedded_inputs,
+                "chat_requests": self.chat_requests,
+                "chat_errors": self.chat_errors,
+            }
+
+        return app
+
+    def _chat_latency(self) -> float:
+        if self.chat_latency_sigma <= 0:
+            return self.chat_latency
+        # Log-normal with chat_latency as its median, the long right tail of real LLM latencies
+        return self.chat_latency * self._random.lognormvariate(0.0, self.chat_latency_sigma)
+
+    def _completion_content(self, request: ChatCompletionRequest) -> str:
+        user_message = next(
+            (str(message.get("content", "")) for message in reversed(request.messages) if message["role"] == "user"),
+            "",
+        )
+        schema = ((request.response_format or {}).get("json_schema") or {}).get("schema")
+        if schema is None:
+            return fake_answer(user_message, self.answer_words)
+        return json.dumps(fake_structured_content(schema, user_message, self.answer_words))
+
+    def _completion_chunks(self, model: str, content: str, usage: Optional[Dict[str, int]]) -> Iterator[str]:
+        chunk_id = f"chatcmpl-fake-{self.chat_requests}"
+        created = int(time.time())
+
+        def chunk(choices: List[Dict[str, Any]], **extra: Any) -> str:
+            body = {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            return f"data: {json.dumps({**body, 'choices': choices, **extra})}\n\n"
+
+        # Word sized deltas, close to what a token stream looks like to the client
+        for index, piece in enumerate(re.findall(r"\S*\s*", content)):
+            if piece:
+                delta = {"role": "assistant", "content": piece} if index == 0 else {"content": piece}
+                yield chunk([{"index": 0, "delta": delta, "finish_reason": None}])
+        yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage is not None:
+            yield chunk([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    @staticmethod
+    def _error_response(
+        status_code: int, code: str, message: str, headers: Optional[Dict[str, str]] = None
+    ) -> JSONResponse:
+        body = {"error": {"message": message, "type": code, "param": None, "code": code}}
+        return JSONResponse(body, status_code=status_code, headers=headers)
+
+    async def _simulate_latency(self, latency: Optional[float] = None) -> None:
+        latency = self.latency if latency is None else latency
+        # Models an upstream that only serves max_concurrency requests at once, the rest queue up
+        if self.max_concurrency is None:
+            await asyncio.sleep(latency)
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            await asyncio.sleep(latency)
+
+    def reset_stats(self) -> None:
+        self.embedding_requests = 0
+        self.embedded_inputs = 0
+        self.chat_requests = 0
+        self.chat_errors = 0
+
+    def start(self) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        LOGGER.info(f"Fake OpenAI server listening on {self.base_url}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOpenAiServer":
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API server.")
+    parser.add_argument("-p", "--port", type=int, default=8099, help="Port to listen on")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Simulated latency per request in seconds")
+    parser.add_argument("-c", "--max_concurrency", type=int, default=None, help="Requests served concurrently")
+    parser.add_argument("--chat_latency", type=float, default=0.5, help="Median chat completion latency in seconds")
+    parser.add_argument("--chat_latency_sigma", type=float, default=0.0, help="Log-normal sigma of chat latency")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of chat completions failing with 500")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of chat completions failing with 429")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    server = FakeOpenAiServer(
+        port=args.port,
+        latency=args.latency,
+        max_concurrency=args.max_concurrency,
+        chat_latency=args.chat_latency,
+        chat_latency_sigma=args.chat_latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    uvicorn.run(server.app, host=server.host, port=server.port)
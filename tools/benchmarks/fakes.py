@@ -0,0 +1,38 @@
+import asyncio
+import hashlib
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def hash_embedding(text: str, dimensions: int = 1536) -> List[float]:
+    """Deterministic, unit-normalized pseudo embedding derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+class LatencyEmbeddings(Embeddings):
+    """Embeddings stand-in that simulates the network round trip of a hosted embedding API."""
+
+    def __init__(self, latency: float = 0.05, dimensions: int = 1536):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.model = "fake-hash-embedding"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [hash_embedding(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [hash_embedding(text, self.dimensions) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
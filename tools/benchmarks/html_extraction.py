@@ -0,0 +1,71 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from bs4 import BeautifulSoup
+
+from api.shared.logger import get_logger
+from api.shared.parallel import create_process_pool
+from tools.scraping.scraper import TextExtractor, extract_page_text
+
+LOGGER = get_logger(__name__)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "html"
+
+
+def html_parser_extract(html: str) -> str:
+    return TextExtractor().extract_text_blocks(BeautifulSoup(html, "html.parser")).strip()
+
+
+def time_per_page(extract: Callable[[str], str], html: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(html)
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_pages(fixtures: List[Path], repeat: int) -> None:
+    extractor = TextExtractor()
+    for fixture in fixtures:
+        html = fixture.read_text(encoding="utf-8")
+        if extractor.extract_text(html) != html_parser_extract(html):
+            raise AssertionError(f"lxml and html.parser extraction differ on {fixture.name}")
+
+        html_parser_seconds = time_per_page(html_parser_extract, html, repeat)
+        lxml_seconds = time_per_page(extractor.extract_text, html, repeat)
+        LOGGER.info(
+            f"{fixture.name:<22} size={len(html) / 1e3:6.1f}KB html.parser={html_parser_seconds * 1e3:7.2f}ms "
+            f"lxml={lxml_seconds * 1e3:7.2f}ms speedup={html_parser_seconds / lxml_seconds:5.1f}x"
+        )
+
+
+def benchmark_pool(fixtures: List[Path], pages: int, worker_counts: List[int]) -> None:
+    htmls = [fixture.read_text(encoding="utf-8") for fixture in fixtures]
+    corpus = [htmls[i % len(htmls)] for i in range(pages)]
+
+    for workers in worker_counts:
+        # Warm up the workers first, start-up is paid once per crawl and not per page
+        executor = create_process_pool(workers, preload=["tools.scraping.scraper"])
+        list(executor.map(extract_page_text, htmls))
+
+        start = time.perf_counter()
+        list(executor.map(extract_page_text, corpus, chunksize=8))
+        elapsed = time.perf_counter() - start
+        executor.shutdown()
+        LOGGER.info(f"workers={workers:<3} pages={pages} pages/s={pages / elapsed:8.1f}")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark per-page HTML text extraction on saved fixtures.")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="Extractions per fixture and engine")
+    parser.add_argument("-p", "--pages", type=int, default=500, help="Pages extracted by the process pool")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2], help="Parse worker counts to compare")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    fixtures = sorted(FIXTURES_DIR.glob("*.html"))
+    benchmark_pages(fixtures, args.repeat)
+    benchmark_pool(fixtures, args.pages, args.workers)
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from api.shared.logger import get_logger
+from api.vector.store import ContextEntry, VectorStore
+from tools.benchmarks.fakes import LatencyEmbeddings, hash_embedding
+
+LOGGER = get_logger(__name__)
+
+
+def synthetic_entries(num_chunks: int) -> List[ContextEntry]:
+    # Short contents so every entry becomes exactly one chunk
+    return [
+        ContextEntry(
+            section_name=f"Section {i}",
+            source_url=f"https://developers.oxylabs.io/page-{i}",
+            content=f"<Section {i}>\nSynthetic documentation chunk number {i} about proxies and scraping.",
+        )
+        for i in range(num_chunks)
+    ]
+
+
+async def measure(store: VectorStore, queries: List[List[float]], k: int, batch_size: int) -> None:
+    latencies = []
+    for embedding in queries:
+        start = time.perf_counter()
+        await store.asimilarity_search_by_vector(embedding, k=k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        await store.asimilarity_search_by_vectors(queries[i : i + batch_size], k=k)
+    batched_qps = len(queries) / (time.perf_counter() - start)
+
+    latencies.sort()
+    LOGGER.info(
+        f"{store.index_engine:<7} p50={statistics.median(latencies) * 1000:7.2f}ms "
+        f"p99={latencies[int(0.99 * (len(latencies) - 1))] * 1000:7.2f}ms "
+        f"single_qps={len(latencies) / sum(latencies):9.1f} batched_qps={batched_qps:9.1f}"
+    )
+
+
+async def benchmark(num_chunks: int, num_queries: int, k: int, batch_size: int, engines: List[str]) -> None:
+    entries = synthetic_entries(num_chunks)
+    queries = [hash_embedding(f"benchmark query {i}") for i in range(num_queries)]
+    LOGGER.info(f"chunks={num_chunks} queries={num_queries} k={k} batch_size={batch_size}")
+
+    for engine in engines:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = VectorStore(
+                openai_api_key="benchmark",
+                persist_directory=Path(tmp_dir),
+                embeddings=LatencyEmbeddings(latency=0),
+                index_engine=engine,
+            )
+            start = time.perf_counter()
+            store.add_from_preprocessed_data(entries)
+            LOGGER.info(f"{engine:<7} build={time.perf_counter() - start:7.2f}s")
+
+            # Reload from disk, which is how the index is used after a restart
+            store = VectorStore(
+                openai_api_key="benchmark",
+                persist_directory=Path(tmp_dir),
+                embeddings=LatencyEmbeddings(latency=0),
+                index_engine=engine,
+            )
+            await measure(store, queries, k, batch_size)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark Chroma against the NumPy flat index.")
+    parser.add_argument("-n", "--num_chunks", type=int, default=5000, help="Number of indexed chunks")
+    parser.add_argument("-q", "--num_queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("-k", "--top_k", type=int, default=3, help="Results per query")
+    parser.add_argument("-b", "--batch_size", type=int, default=64, help="Queries per batched search")
+    parser.add_argument("-e", "--engines", nargs="+", default=["chroma", "flat"], help="Engines to benchmark")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    asyncio.run(benchmark(args.num_chunks, args.num_queries, args.top_k, args.batch_size, args.engines))
@@ -0,0 +1,229 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.shared.logger import get_logger
+from api.vector.store import ContextEntry, VectorStore
+from api.vector.text_preprocessor import RawDataPreprocessor
+from tools.benchmarks.fakes import LatencyEmbeddings
+from tools.benchmarks.preprocessing_scaling import build_corpus
+
+LOGGER = get_logger(__name__)
+
+STAGES = ["process_json_file", "split_documents", "index_build", "format_entry"]
+DEFAULT_BASELINE_PATH = Path(__file__).parent / "baselines" / "ingestion.json"
+MIN_PEAK_MEMORY_MB = 10.0
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+MAXRSS_BYTES = 1 if sys.platform == "darwin" else 1024
+
+
+@dataclass
+class StageResult:
+    stage: str
+    scale: int
+    entries: int
+    megabytes: float
+    seconds: float
+    peak_memory_mb: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}/{self.scale}x"
+
+    @property
+    def entries_per_second(self) -> float:
+        return self.entries / self.seconds
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.megabytes / self.seconds
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "entries_per_second": round(self.entries_per_second, 1),
+            "megabytes_per_second": round(self.megabytes_per_second, 3),
+            "peak_memory_mb": round(self.peak_memory_mb, 1),
+        }
+
+
+def write_corpus(path: Path, scale: int) -> None:
+    """Writes scale copies of the test data as a JSON array, each copy with its own urls."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump([entry.model_dump() for entry in build_corpus(scale)], file)
+
+
+def content_megabytes(entries: List[ContextEntry]) -> float:
+    return sum(len(entry.content.encode("utf-8")) for entry in entries) / 1e6
+
+
+def _run_measured(run: Callable[[], object], repeat: int, connection: Connection) -> None:
+    # A forked child starts with its peak RSS at the parent's current RSS, not at the parent's peak
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send((seconds, (peak_rss - start_rss) * MAXRSS_BYTES / 1e6))
+    connection.close()
+
+
+def measure(run: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """Best time of repeat runs and the peak memory they added, measured in a forked child.
+
+    The child inherits the stage's input, so the peak covers the stage alone and not the set-up or earlier stages.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("fork").Process(target=_run_measured, args=(run, repeat, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError("The benchmark process died, possibly out of memory") from None
+    finally:
+        process.join()
+
+
+def new_store(persist_directory: Path, index_engine: str) -> VectorStore:
+    return VectorStore(
+        openai_api_key="benchmark",
+        persist_directory=persist_directory,
+        embeddings=LatencyEmbeddings(latency=0.0),
+        index_engine=index_engine,
+    )
+
+
+def benchmark_scale(scale: int, stages: List[str], repeat: int, index_engine: str) -> List[StageResult]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = Path(tmp_dir) / f"corpus_{scale}x.json"
+        write_corpus(corpus_path, scale)
+        raw_entries = len(RawDataPreprocessor.read_json_file(str(corpus_path)))
+        entries = RawDataPreprocessor().process_json_file(str(corpus_path))
+        megabytes = content_megabytes(entries)
+
+        def record(stage: str, count: int, size: float, run: Callable[[], object]) -> None:
+            if stage not in stages:
+                return
+            seconds, peak_memory_mb = measure(run, repeat)
+            results.append(StageResult(stage, scale, count, size, seconds, peak_memory_mb))
+
+        record(
+            "process_json_file",
+            raw_entries,
+            corpus_path.stat().st_size / 1e6,
+            lambda: RawDataPreprocessor().process_json_file(str(corpus_path)),
+        )
+
+        store = new_store(Path(tmp_dir) / "split", index_engine)
+        documents = store._create_documents_from_pairs(entries)
+        record("split_documents", len(documents), megabytes, lambda: store._split_documents(documents))
+
+        builds = iter(range(repeat))
+
+        def build_index() -> None:
+            # Every build starts from an empty index of its own
+            new_store(Path(tmp_dir) / f"index_{next(builds)}", index_engine).add_from_preprocessed_data(entries)
+
+        record("index_build", len(entries), megabytes, build_index)
+
+        record("format_entry", len(entries), megabytes, lambda: [entry.format_entry() for entry in entries])
+    return results
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Dict[str, float]]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["results"]
+
+
+def save_baseline(path: Path, results: List[StageResult], index_engine: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "index_engine": index_engine,
+        },
+        "results": {result.key: result.summary() for result in results},
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=2)
+        file.write("\n")
+    LOGGER.info(f"Baseline written to {path}")
+
+
+def compare(result: StageResult, baseline: Optional[Dict[str, Dict[str, float]]], tolerance: float) -> Tuple[str, bool]:
+    """Change against the baseline, and whether throughput dropped or peak memory grew by more than tolerance."""
+    previous = (baseline or {}).get(result.key)
+    if previous is None:
+        return "no baseline", False
+
+    summary = result.summary()
+    throughput_change = summary["entries_per_second"] / previous["entries_per_second"] - 1
+    # Peaks of a few MB are mostly allocator noise, growth is measured from at least MIN_PEAK_MEMORY_MB
+    memory_change = (
+        max(summary["peak_memory_mb"], MIN_PEAK_MEMORY_MB) / max(previous["peak_memory_mb"], MIN_PEAK_MEMORY_MB) - 1
+    )
+    regressed = throughput_change < -tolerance or memory_change > tolerance
+    return f"throughput {throughput_change:+7.1%} memory {memory_change:+7.1%}", regressed
+
+
+def report(results: List[StageResult], baseline: Optional[Dict[str, Dict[str, float]]], tolerance: float) -> bool:
+    regressions = []
+    for result in results:
+        change, regressed = compare(result, baseline, tolerance)
+        LOGGER.info(
+            f"{result.key:<24} entries={result.entries:<7} entries/s={result.entries_per_second:10.1f} "
+            f"MB/s={result.megabytes_per_second:8.2f} peak_memory={result.peak_memory_mb:8.1f}MB  {change}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(result.key)
+
+    if regressions:
+        LOGGER.warning(f"{len(regressions)} stages regressed by more than {tolerance:.0%}: {', '.join(regressions)}")
+    return bool(regressions)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingestion stages on the test data scaled up, compared against a stored baseline."
+    )
+    parser.add_argument("-s", "--scales", type=int, nargs="+", default=[10, 100, 1000], help="Copies of the test data")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Timed runs per stage, the best one counts")
+    parser.add_argument("--index_engine", choices=["flat", "chroma"], default="flat", help="Index the build uses")
+    parser.add_argument("-b", "--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save_baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=0.2, help="Throughput drop or memory growth flagged as a regression"
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    results = []
+    for scale in args.scales:
+        results.extend(benchmark_scale(scale, args.stages, args.repeat, args.index_engine))
+
+    regressed = report(results, load_baseline(args.baseline), args.tolerance)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.index_engine)
+    elif regressed:
+        sys.exit(1)
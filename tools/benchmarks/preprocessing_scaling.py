@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from api.shared.logger import get_logger
+from api.vector.store import VectorStore
+from api.vector.text_preprocessor import RawDataPreprocessor, TextEntry
+from paths import TEST_DATA_DIR
+from tools.benchmarks.fakes import LatencyEmbeddings
+
+LOGGER = get_logger(__name__)
+
+
+def build_corpus(multiplier: int) -> List[TextEntry]:
+    with open(TEST_DATA_DIR / "test_data.json", "r", encoding="utf-8") as file:
+        items = json.load(file)
+
+    # Copies get their own urls and a suffix, so no two documents are identical
+    return [
+        TextEntry(url=f"{item['url']}/copy-{copy}", content=f"{item['content']}\nCopy {copy}.")
+        for copy in range(multiplier)
+        for item in items
+    ]
+
+
+def benchmark(multiplier: int, worker_counts: List[int]) -> None:
+    corpus = build_corpus(multiplier)
+    megabytes = sum(len(entry.content) for entry in corpus) / 1e6
+    LOGGER.info(f"entries={len(corpus)} size={megabytes:.1f}MB cpus={os.cpu_count()}")
+
+    baseline = None
+    for workers in worker_counts:
+        preprocessor = RawDataPreprocessor(max_workers=workers)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = VectorStore(
+                openai_api_key="benchmark",
+                persist_directory=Path(tmp_dir),
+                embeddings=LatencyEmbeddings(latency=0.0),
+                index_engine="flat",
+                split_max_workers=workers,
+            )
+
+            # Worker start-up is paid once per ingestion, so it is part of the measurement
+            start = time.perf_counter()
+            entries = list(preprocessor.iter_text_entries(corpus))
+            cleaned = time.perf_counter()
+            documents = store._create_documents_from_pairs(entries)
+            chunks = store._split_documents(documents)
+            split = time.perf_counter()
+            preprocessor.close()
+            store._close_split_pool()
+
+        elapsed = split - start
+        baseline = baseline or elapsed
+        LOGGER.info(
+            f"workers={workers:<3} clean={cleaned - start:6.2f}s split={split - cleaned:6.2f}s "
+            f"total={elapsed:6.2f}s entries/s={len(corpus) / elapsed:9.1f} chunks={len(chunks)} "
+            f"speedup={baseline / elapsed:4.2f}x"
+        )
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing and splitting across worker processes.")
+    parser.add_argument("-m", "--multiplier", type=int, default=200, help="Copies of the test data in the corpus")
+    parser.add_argument(
+        "-w", "--workers", type=int, nargs="+", default=None, help="Worker counts to compare, default 1 to all cores"
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *(2**i for i in range(1, cpus.bit_length()) if 2**i <= cpus), cpus})
+    benchmark(args.multiplier, args.workers or default_workers)
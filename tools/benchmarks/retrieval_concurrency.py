@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from api.shared.logger import get_logger
+from api.vector.store import VectorStore
+from api.vector.text_preprocessor import RawDataPreprocessor
+from paths import TEST_DATA_DIR
+from tools.benchmarks.fakes import LatencyEmbeddings
+
+LOGGER = get_logger(__name__)
+
+QUESTIONS = [
+    "How do I integrate proxies?",
+    "What is the IP address for integrations?",
+    "How do I set up a proxy in Chrome?",
+    "Where can I check the location of my IP?",
+]
+
+
+async def run_load(handler: Callable[[str], Awaitable[object]], total_requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await handler(QUESTIONS[i % len(QUESTIONS)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    return total_requests / (time.perf_counter() - start)
+
+
+def build_store(persist_directory: Path, latency: float, search_max_workers: int) -> VectorStore:
+    store = VectorStore(
+        openai_api_key="benchmark",
+        persist_directory=persist_directory,
+        embeddings=LatencyEmbeddings(latency=latency),
+        search_max_workers=search_max_workers,
+    )
+    entries = RawDataPreprocessor().process_json_file(TEST_DATA_DIR / "test_data.json")
+    store.add_from_preprocessed_data(entries)
+    return store
+
+
+async def benchmark(total_requests: int, concurrency: int, latency: float, search_max_workers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = build_store(Path(tmp_dir) / "chroma", latency, search_max_workers)
+
+        async def blocking_handler(question: str):
+            # What ChatService.chat used to do: a synchronous search inside a coroutine
+            return store.similarity_search(question, k=3)
+
+        async def async_handler(question: str):
+            return await store.asimilarity_search(question, k=3)
+
+        before = await run_load(blocking_handler, total_requests, concurrency)
+        after = await run_load(async_handler, total_requests, concurrency)
+
+    LOGGER.info(
+        f"requests={total_requests} concurrency={concurrency} embedding_latency={latency * 1000:.0f}ms "
+        f"search_workers={search_max_workers}"
+    )
+    LOGGER.info(f"similarity_search  (blocking): {before:8.1f} req/s")
+    LOGGER.info(f"asimilarity_search (async):    {after:8.1f} req/s  ({after / before:.1f}x)")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs async retrieval under concurrent load.")
+    parser.add_argument("-r", "--requests", type=int, default=200, help="Total number of requests")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="Number of concurrent requests")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Simulated embedding latency in seconds")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Vector search thread pool size")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    asyncio.run(benchmark(args.requests, args.concurrency, args.latency, args.workers))
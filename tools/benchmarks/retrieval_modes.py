@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from api.shared.logger import get_logger
+from api.vector.store import VectorStore
+from api.vector.text_preprocessor import RawDataPreprocessor
+from paths import TEST_DATA_DIR
+from tools.benchmarks.fakes import LatencyEmbeddings
+
+LOGGER = get_logger(__name__)
+
+EXACT_LOOKUPS = ["ip.oxylabs.io/location", "pr.oxylabs.io", "ping pr.oxylabs.io", "MaxMind IP2Location"]
+QUESTIONS = [
+    "How do I integrate proxies with third party tools?",
+    "Why does my connection fail after the IP changes?",
+    "Which geolocation databases are used?",
+    "Can I connect using a direct IP address?",
+]
+
+MODES = {
+    "dense": {"retrieval_mode": "dense"},
+    "hybrid": {"retrieval_mode": "hybrid"},
+    "dense+fast_path": {"retrieval_mode": "dense", "lexical_fast_path": True},
+    "hybrid+fast_path": {"retrieval_mode": "hybrid", "lexical_fast_path": True},
+}
+
+
+async def benchmark(latency: float, repeats: int, engine: str) -> None:
+    entries = RawDataPreprocessor().process_json_file(TEST_DATA_DIR / "test_data.json")
+    LOGGER.info(f"embedding_latency={latency * 1000:.0f}ms engine={engine} repeats={repeats}")
+
+    for mode, options in MODES.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = VectorStore(
+                openai_api_key="benchmark",
+                persist_directory=Path(tmp_dir),
+                embeddings=LatencyEmbeddings(latency=latency),
+                index_engine=engine,
+                **options,
+            )
+            store.add_from_preprocessed_data(entries)
+
+            for name, queries in (("exact lookups", EXACT_LOOKUPS), ("questions", QUESTIONS)):
+                latencies = []
+                fast_path_hits = 0
+                for _ in range(repeats):
+                    for query in queries:
+                        fast_path_hits += store.lexical_fast_path(query, k=3) is not None
+                        start = time.perf_counter()
+                        await store.asimilarity_search(query, k=3)
+                        latencies.append(time.perf_counter() - start)
+
+                LOGGER.info(
+                    f"{mode:<17} {name:<14} mean={statistics.mean(latencies) * 1000:7.2f}ms "
+                    f"p50={statistics.median(latencies) * 1000:7.2f}ms "
+                    f"fast_path_hits={fast_path_hits}/{len(latencies)}"
+                )
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark dense, hybrid and lexical fast path retrieval.")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Simulated embedding latency in seconds")
+    parser.add_argument("-r", "--repeats", type=int, default=10, help="Times each query is repeated")
+    parser.add_argument("-e", "--engine", type=str, default="flat", choices=["chroma", "flat"], help="Index engine")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    asyncio.run(benchmark(args.latency, args.repeats, args.engine))
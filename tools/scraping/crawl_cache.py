@@ -0,0 +1,83 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from pydantic import BaseModel
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class CrawlCacheEntry(BaseModel):
+    lastmod: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    crawled_at: float = 0.0
+
+
+class CrawlCache:
+    """Validators and content hash of every page in the corpus, persisted between crawls for conditional re-crawls."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: Dict[str, CrawlCacheEntry] = {}
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as file:
+                self._entries = {url: CrawlCacheEntry(**entry) for url, entry in json.load(file).items()}
+            LOGGER.info(f"Loaded crawl cache with {len(self._entries)} pages from {self.path}")
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def urls(self) -> Iterable[str]:
+        return self._entries.keys()
+
+    def is_fresh(self, url: str, lastmod: Optional[str]) -> bool:
+        """A page whose sitemap lastmod did not move since the last crawl is not fetched at all."""
+        entry = self._entries.get(url)
+        return entry is not None and lastmod is not None and entry.lastmod == lastmod
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self._entries.get(url)
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def mark_not_modified(self, url: str, lastmod: Optional[str]) -> None:
+        entry = self._entries[url]
+        entry.lastmod = lastmod or entry.lastmod
+        entry.crawled_at = time.time()
+
+    def update(
+        self, url: str, content: str, lastmod: Optional[str], etag: Optional[str], last_modified: Optional[str]
+    ) -> bool:
+        """Records a fetched page, returning whether its content differs from the previous crawl."""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        previous = self._entries.get(url)
+        self._entries[url] = CrawlCacheEntry(
+            lastmod=lastmod,
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=content_hash,
+            crawled_at=time.time(),
+        )
+        return previous is None or previous.content_hash != content_hash
+
+    def remove(self, urls: Iterable[str]) -> None:
+        for url in urls:
+            self._entries.pop(url, None)
+
+    def save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({url: entry.model_dump() for url, entry in self._entries.items()}, file)
+        tmp_path.replace(self.path)
+        LOGGER.info(f"Saved crawl cache with {len(self._entries)} pages to {self.path}")
@@ -1,18 +1,38 @@
 import argparse
+import asyncio
 import json
+import os
+import random
 from collections import Counter
+from concurrent.futures import Executor
+from pathlib import Path
 from urllib.parse import urlparse
-from typing import Optional, List
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Set, Tuple
 
+import httpx
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
 import time
 from api.shared.logger import get_logger
+from api.shared.parallel import create_process_pool
+from api.vector.crawl_manifest import CrawlManifest, fingerprint_file
 from paths import DATA_DIR
+from tools.scraping.crawl_cache import CrawlCache
+from tools.scraping.rate_limiter import TokenBucket
+from tools.scraping.sitemap import SitemapReader
 import re
 
 LOGGER = get_logger(__name__)
 
+# Responses worth retrying, anything else is reported as a failed page straight away
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Strings inside these tags are left out of get_text by BeautifulSoup, so the lxml path skips them too
+NON_TEXT_TAGS = {"script", "style", "template"}
+PARAGRAPH_OPEN_PATTERN = re.compile(r"<p[\s/>]", re.IGNORECASE)
+PARAGRAPH_CLOSE_PATTERN = re.compile(r"</p\s*>", re.IGNORECASE)
+
 
 class TextExtractor:
     def __init__(self) -> None:
@@ -58,22 +78,198 @@ class TextExtractor:
         result = "\n".join(text_chunks)
         return result
 
+    def extract_text(self, html: str) -> str:
+        """Extracts the same text as extract_text_blocks, parsing the page with lxml instead of html.parser.
+
+        lxml closes a paragraph at the first block element inside it and when its end tag is missing, where
+        html.parser nests the elements instead. Such pages go through the BeautifulSoup path so the output never
+        depends on the parser.
+        """
+        parser = etree.HTMLParser()
+        try:
+            root = etree.fromstring(html, parser)
+        except (ValueError, etree.LxmlError):
+            root = None
+
+        if root is None or self._parsers_disagree(html, parser):
+            return self.extract_text_blocks(BeautifulSoup(html, "html.parser")).strip()
+
+        paragraphs = [p for p in root.iter("p") if self.class_pattern.search(p.get("class") or "")]
+
+        if not paragraphs:
+            LOGGER.info("No paragraphs found with class pattern. Trying fallback methods...")
+            paragraphs = list(root.iter("p"))
+
+        text_chunks = []
+        for p in paragraphs:
+            text = " ".join(self._element_strings(p))
+            if len(text) > 10:
+                text_chunks.append(text)
+        return "\n".join(text_chunks)
+
+    @staticmethod
+    def _parsers_disagree(html: str, parser: etree.HTMLParser) -> bool:
+        if any(error.type == etree.ErrorTypes.ERR_TAG_NAME_MISMATCH for error in parser.error_log):
+            return True
+        return len(PARAGRAPH_OPEN_PATTERN.findall(html)) != len(PARAGRAPH_CLOSE_PATTERN.findall(html))
+
+    def _element_strings(self, element, replace_links: bool = True) -> Iterator[str]:
+        """Yields the stripped strings get_text would return for an element once its links are replaced."""
+        # Text of the node before the current child, which is what a_tag.previous_sibling sees
+        previous_text = element.text
+        if element.text and element.text.strip():
+            yield element.text.strip()
+
+        for child in element:
+            if not isinstance(child.tag, str):
+                # Comments are siblings but not text
+                previous_text = child.text
+            elif replace_links and child.tag == "a" and child.get("href") is not None:
+                previous_text = self._replace_link(child, previous_text)
+                if previous_text.strip():
+                    yield previous_text.strip()
+            else:
+                if child.tag not in NON_TEXT_TAGS:
+                    yield from self._element_strings(child, replace_links)
+                # The markup of an element never ends with one of the keywords
+                previous_text = None
+
+            if child.tail:
+                previous_text = child.tail
+                if child.tail.strip():
+                    yield child.tail.strip()
+
+    def _replace_link(self, a_tag, previous_text: Optional[str]) -> str:
+        link_text = "".join(self._element_strings(a_tag, replace_links=False))
+        prev_text = ""
+        if previous_text and previous_text.strip():
+            prev_text = previous_text.split()[-1].lower()
+
+        if prev_text in self.preserve_url_after_keyword or link_text.lower() in self.preserve_url_after_keyword:
+            return f"{link_text} ({a_tag.get('href')})"
+        return link_text
+
+
+def is_jsonl(path) -> bool:
+    return Path(path).suffix == ".jsonl"
+
+
+def repair_jsonl(path: Path) -> None:
+    """Drops a partially written last line left behind by a crash, so appends start on a clean line."""
+    with open(path, "rb+") as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        if size == 0:
+            return
+        end = size
+        while end > 0:
+            block_start = max(0, end - 65536)
+            file.seek(block_start)
+            block = file.read(end - block_start)
+            if end == size and block.endswith(b"\n"):
+                return
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                end = block_start + newline + 1
+                break
+            end = block_start
+
+        LOGGER.warning(f"Truncating partially written line at the end of {path}")
+        file.truncate(end)
+
+
+def load_scraped_urls(path: Path) -> Set[str]:
+    urls = set()
+    if not Path(path).exists():
+        return urls
+
+    repair_jsonl(path)
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                urls.add(json.loads(line)["url"])
+    return urls
+
+
+def iter_scraped_items(path: Path) -> Iterable[dict]:
+    if not Path(path).exists():
+        return
+    with open(path, "r", encoding="utf-8") as file:
+        if is_jsonl(path):
+            yield from (json.loads(line) for line in file if line.strip())
+        else:
+            yield from json.load(file)
+
+
+def write_scraped_items(items: Iterable[dict], path: Path) -> int:
+    """Writes items as JSONL or as a JSON array depending on the file name, returning how many were written."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        if is_jsonl(path):
+            for item in items:
+                file.write(json.dumps(item, ensure_ascii=False) + "\n")
+                count += 1
+            return count
+
+        file.write("[")
+        for item in items:
+            file.write(",\n  " if count else "\n  ")
+            file.write(json.dumps(item, ensure_ascii=False))
+            count += 1
+        file.write("\n]\n" if count else "]\n")
+    return count
+
+
+def convert_jsonl_to_json(jsonl_path: Path, json_path: Path) -> None:
+    """Rewrites JSONL scraper output as the JSON array format, streaming it line by line."""
+    count = write_scraped_items(iter_scraped_items(jsonl_path), json_path)
+    LOGGER.info(f"Converted {count} items from {jsonl_path} to {json_path}")
+
+
+def merge_scraped_output(output_path: Path, delta_path: Path, replaced_urls: Set[str]) -> None:
+    """Replaces the changed and removed pages of the corpus with the freshly crawled ones."""
+
+    def merged_items():
+        yield from (item for item in iter_scraped_items(output_path) if item["url"] not in replaced_urls)
+        yield from iter_scraped_items(delta_path)
+
+    # Keeps the output suffix so the merged file is written in the same format
+    tmp_path = output_path.with_name(f"{output_path.stem}.merge{output_path.suffix}")
+    count = write_scraped_items(merged_items(), tmp_path)
+    tmp_path.replace(output_path)
+    delta_path.unlink(missing_ok=True)
+    LOGGER.info(f"Merged re-crawled pages into {output_path}, {count} pages in total")
+
+
+def extract_page_text(html: str) -> str:
+    """Parses a page and extracts its text, run on worker processes by the async scraper."""
+    return TextExtractor().extract_text(html)
+
 
 class Scraper:
-    def __init__(self, delay: float = 1.0, batch_size: int = 100) -> None:
+    def __init__(
+        self,
+        delay: float = 1.0,
+        batch_size: int = 100,
+        crawl_cache: Optional[CrawlCache] = None,
+        sitemap_workers: int = 4,
+    ) -> None:
         self.delay = delay
         self.batch_size = batch_size
         self.headers = {"User-Agent": "QnA-Bot/0.1"}
         self.text_extractor = TextExtractor()
+        self.crawl_cache = crawl_cache
+        self.sitemap_reader = SitemapReader(headers=self.headers, max_workers=sitemap_workers)
+        self._sitemap_lastmods: Dict[str, Optional[str]] = {}
 
-    def fetch_sitemap_urls(self, sitemap_url: str) -> List[str]:
+    def fetch_sitemap_entries(
+        self, sitemap_url: str, include: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Tuple[str, Optional[str]]]:
         LOGGER.info(f"Fetching sitemap: {sitemap_url}")
-        resp = requests.get(sitemap_url, timeout=10)
-        resp.raise_for_status()
+        return self.sitemap_reader.iter_entries(sitemap_url, include)
 
-        soup = BeautifulSoup(resp.text, "xml")
-        all_urls = [loc.text.strip() for loc in soup.find_all("loc")]
-        return all_urls
+    def fetch_sitemap_urls(self, sitemap_url: str) -> List[str]:
+        return [url for url, _ in self.fetch_sitemap_entries(sitemap_url)]
 
     def get_url_category(self, url: str) -> Optional[str]:
         path = urlparse(url).path
@@ -86,7 +282,49 @@ class Scraper:
         soup = BeautifulSoup(resp.text, "html.parser")
         return soup
 
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        return self.crawl_cache.conditional_headers(url) if self.crawl_cache is not None else {}
+
+    def _record_not_modified(self, url: str) -> None:
+        self.crawl_cache.mark_not_modified(url, self._sitemap_lastmods.get(url))
+
+    def _record_page(self, url: str, text: str, response_headers) -> Optional[dict]:
+        """Returns the page to save, which on a conditional re-crawl is only a page whose content changed."""
+        if not text:
+            return None
+        if self.crawl_cache is not None and not self.crawl_cache.update(
+            url,
+            text,
+            lastmod=self._sitemap_lastmods.get(url),
+            etag=response_headers.get("etag"),
+            last_modified=response_headers.get("last-modified"),
+        ):
+            return None
+        return {"url": url, "content": text}
+
+    def _scrape_url(self, url: str) -> Optional[dict]:
+        resp = requests.get(url, headers={**self.headers, **self._conditional_headers(url)}, timeout=10)
+        if resp.status_code == 304 and self.crawl_cache is not None and url in self.crawl_cache:
+            self._record_not_modified(url)
+            return None
+
+        resp.raise_for_status()
+        text = self.text_extractor.extract_text(resp.text)
+        return self._record_page(url, text, resp.headers)
+
+    def _pending_urls(self, urls: List[str], output_path) -> List[str]:
+        """JSONL output is resumable, pages already written by an earlier run are not fetched again."""
+        if not is_jsonl(output_path):
+            return urls
+
+        scraped_urls = load_scraped_urls(output_path)
+        pending_urls = [url for url in urls if url not in scraped_urls]
+        if scraped_urls:
+            LOGGER.info(f"Resuming: {len(urls) - len(pending_urls)} pages already scraped to {output_path}")
+        return pending_urls
+
     def scrape_pages(self, urls: List[str], output_path) -> None:
+        urls = self._pending_urls(urls, output_path)
         results = []
         first_save = True
         total_batches = (len(urls) + self.batch_size - 1) // self.batch_size
@@ -95,18 +333,16 @@ class Scraper:
         LOGGER.info(f"Starting scraping of {len(urls)} pages in batches of {self.batch_size}")
         for i, url in enumerate(urls):
             try:
-                soup = self.scrape_page(url)
-                text = self.text_extractor.extract_text_blocks(soup).strip()
-                if text:
-                    results.append({"url": url, "content": text})
+                item = self._scrape_url(url)
+                if item:
+                    results.append(item)
             except Exception as e:
                 LOGGER.info(f"Failed to fetch {url}: {e}")
-                continue
 
             time.sleep(self.delay)
 
             # Save batch when reaching batch_size or at the end
-            if len(results) >= self.batch_size or i == len(urls) - 1:
+            if len(results) >= self.batch_size or (i == len(urls) - 1 and results):
                 LOGGER.info(f"Processing batch {current_batch} of {total_batches}")
                 self._save_batch(results, output_path, first_save)
                 first_save = False
@@ -120,6 +356,10 @@ class Scraper:
         if not batch_data:
             return
 
+        if is_jsonl(output_path):
+            self._append_jsonl_batch(batch_data, output_path)
+            return
+
         if is_first_batch:
             # First batch: overwrite file
             with open(output_path, "w", encoding="utf-8") as f:
@@ -140,30 +380,252 @@ class Scraper:
                 json.dump(existing_data, f, ensure_ascii=False, indent=2)
             LOGGER.info(f"Appended batch of {len(batch_data)} items to {output_path}")
 
-    def run(self, site_map_url: str, num_sections: int, output_file_name: str) -> None:
+    @staticmethod
+    def _append_jsonl_batch(batch_data: List[dict], output_path) -> None:
+        """Appends a batch as JSON lines and fsyncs it, earlier batches are never rewritten."""
+        lines = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in batch_data)
+        with open(output_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        LOGGER.info(f"Appended batch of {len(batch_data)} items to {output_path}")
+
+    def run(
+        self, site_map_url: str, num_sections: int, output_file_name: str, sections: Optional[List[str]] = None
+    ) -> None:
         output_path = DATA_DIR / output_file_name
 
-        urls = self.fetch_sitemap_urls(site_map_url)
+        # Pages outside the wanted sections are dropped while the sitemap streams in, only the rest is kept
+        def include(url: str) -> bool:
+            category = self.get_url_category(url)
+            return category in sections if sections else category is not None
 
-        url_category_pairs = [(u, self.get_url_category(u)) for u in urls]
-        url_category_pairs = [(u, cat) for u, cat in url_category_pairs if cat]
+        self._sitemap_lastmods = {}
+        for url, lastmod in self.fetch_sitemap_entries(site_map_url, include):
+            self._sitemap_lastmods.setdefault(url, lastmod)
 
-        categories = [cat for _, cat in url_category_pairs]
-        counter = Counter(categories)
-        top_n = [i[0] for i in counter.most_common(num_sections)]
+        counter = Counter(self.get_url_category(u) for u in self._sitemap_lastmods)
+        top_n = sections or [i[0] for i in counter.most_common(num_sections)]
 
-        filtered_urls = [u for u, cat in url_category_pairs if cat in top_n]
+        filtered_urls = [u for u in self._sitemap_lastmods if self.get_url_category(u) in top_n]
 
-        LOGGER.info(f"Number of urls: {len(filtered_urls)}, top {num_sections} url sections: {top_n}")
+        LOGGER.info(f"Number of urls: {len(filtered_urls)}, url sections: {top_n}")
 
-        self.scrape_pages(filtered_urls, output_path)
+        if self.crawl_cache is not None:
+            self.recrawl(filtered_urls, output_path)
+        else:
+            self.scrape_pages(filtered_urls, output_path)
 
         LOGGER.info(f"All data saved to {output_path}")
 
+    def recrawl(self, urls: List[str], output_path: Path) -> CrawlManifest:
+        """Fetches only pages that may have changed, merges them into the output and writes a manifest of changes."""
+        stale_urls = [url for url in urls if not self.crawl_cache.is_fresh(url, self._sitemap_lastmods.get(url))]
+        LOGGER.info(f"{len(urls) - len(stale_urls)} pages unchanged according to sitemap lastmod")
+
+        # Changed pages are collected in a resumable side file first, the corpus is only rewritten once at the end
+        delta_path = output_path.with_name(f"{output_path.stem}.delta.jsonl")
+        self.scrape_pages(stale_urls, delta_path)
+
+        changed_urls = load_scraped_urls(delta_path)
+        removed_urls = set(self.crawl_cache.urls()) - set(urls)
+        base_fingerprint = fingerprint_file(output_path)
+        merge_scraped_output(output_path, delta_path, changed_urls | removed_urls)
+
+        self.crawl_cache.remove(removed_urls)
+        self.crawl_cache.save()
+
+        manifest = CrawlManifest(
+            changed=sorted(changed_urls),
+            removed=sorted(removed_urls),
+            unchanged=len(urls) - len(changed_urls),
+            base_fingerprint=base_fingerprint,
+            data_fingerprint=fingerprint_file(output_path),
+        )
+        manifest.save(CrawlManifest.path_for(output_path))
+        LOGGER.info(
+            f"Re-crawl done: {len(manifest.changed)} changed, {len(manifest.removed)} removed, "
+            f"{manifest.unchanged} unchanged"
+        )
+        return manifest
+
+
+class AsyncScraper(Scraper):
+    """Crawls pages concurrently over a pooled HTTP client, with per-host politeness.
+
+    At most max_concurrency requests are in flight overall and per_host_concurrency per host, each host is rate
+    limited by a token bucket, and HTML is parsed on worker processes so parsing never blocks fetching.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        crawl_cache: Optional[CrawlCache] = None,
+        max_concurrency: int = 32,
+        per_host_concurrency: int = 8,
+        requests_per_second: float = 10.0,
+        max_retries: int = 3,
+        parse_workers: int = 2,
+        sitemap_workers: int = 4,
+    ) -> None:
+        super().__init__(delay=0.0, batch_size=batch_size, crawl_cache=crawl_cache, sitemap_workers=sitemap_workers)
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.parse_workers = parse_workers
+
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_rate_limiters: Dict[str, TokenBucket] = {}
+
+    def _host_limits(self, url: str):
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_rate_limiters[host] = TokenBucket(self.requests_per_second)
+        return self._host_semaphores[host], self._host_rate_limiters[host]
+
+    @staticmethod
+    def _backoff_seconds(attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return min(30.0, 2**attempt) * (0.5 + random.random() / 2)
+
+    async def fetch_page(
+        self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """Returns the successful response, or the 304 one when conditional headers were sent."""
+        host_semaphore, host_rate_limiter = self._host_limits(url)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            async with host_semaphore:
+                await host_rate_limiter.acquire()
+                try:
+                    response = await client.get(url, headers=headers)
+                    if response.status_code == 304 and headers:
+                        return response
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                        return response
+                    error: Exception = httpx.HTTPStatusError(
+                        f"Status {response.status_code}", request=response.request, response=response
+                    )
+                except httpx.TransportError as e:
+                    error = e
+
+            if attempt == self.max_retries:
+                raise error
+            # Backing off outside the host semaphore, so the slot serves other pages meanwhile
+            delay = self._backoff_seconds(attempt, response)
+            LOGGER.info(f"Retrying {url} in {delay:.1f}s after: {error}")
+            await asyncio.sleep(delay)
+
+    async def _scrape_worker(
+        self, client: httpx.AsyncClient, queue: "asyncio.Queue[str]", parse_executor: Executor, results: List[dict]
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
 
-def main(site_map_url: str, num_sections: int, output_file_name: str, batch_size: int) -> None:
-    scraper = Scraper(delay=0.1, batch_size=batch_size)
-    scraper.run(site_map_url, num_sections, output_file_name)
+            try:
+                response = await self.fetch_page(client, url, self._conditional_headers(url))
+                if response.status_code == 304:
+                    self._record_not_modified(url)
+                    continue
+
+                text = await loop.run_in_executor(parse_executor, extract_page_text, response.text)
+                item = self._record_page(url, text, response.headers)
+                if item:
+                    results.append(item)
+            except Exception as e:
+                LOGGER.info(f"Failed to fetch {url}: {e}")
+
+    async def scrape_pages_async(self, urls: List[str], output_path) -> None:
+        urls = self._pending_urls(urls, output_path)
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+
+        results: List[dict] = []
+        saved = 0
+        first_save = True
+        started_at = time.perf_counter()
+        LOGGER.info(f"Starting async scraping of {len(urls)} pages with {self.max_concurrency} concurrent requests")
+
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        parse_executor = create_process_pool(self.parse_workers, preload=[__name__])
+        try:
+            async with httpx.AsyncClient(
+                headers=self.headers, timeout=10, limits=limits, follow_redirects=True
+            ) as client:
+                workers = [
+                    asyncio.create_task(self._scrape_worker(client, queue, parse_executor, results))
+                    for _ in range(self.max_concurrency)
+                ]
+                pending = set(workers)
+                while pending:
+                    _, pending = await asyncio.wait(pending, timeout=1.0)
+
+                    # Saved from this coroutine only, workers just collect results
+                    if len(results) >= self.batch_size or (not pending and results):
+                        batch, results[:] = list(results), []
+                        self._save_batch(batch, output_path, first_save)
+                        first_save = False
+                        saved += len(batch)
+
+                        elapsed = time.perf_counter() - started_at
+                        done = len(urls) - queue.qsize()
+                        LOGGER.info(f"Scraped {done}/{len(urls)} pages ({done / elapsed:.1f} pages/s), {saved} saved")
+
+                for worker in workers:
+                    worker.result()
+        finally:
+            parse_executor.shutdown()
+
+        LOGGER.info("Scraping completed.")
+
+    def scrape_pages(self, urls: List[str], output_path) -> None:
+        asyncio.run(self.scrape_pages_async(urls, output_path))
+
+
+def main(
+    site_map_url: str,
+    num_sections: int,
+    output_file_name: str,
+    batch_size: int,
+    mode: str = "sync",
+    concurrency: int = 32,
+    per_host_concurrency: int = 8,
+    requests_per_second: float = 10.0,
+    parse_workers: int = 2,
+    convert_to_json: bool = False,
+    crawl_cache_file_name: Optional[str] = None,
+    sections: Optional[List[str]] = None,
+    sitemap_workers: int = 4,
+) -> None:
+    crawl_cache = CrawlCache(DATA_DIR / crawl_cache_file_name) if crawl_cache_file_name else None
+    if mode == "async":
+        scraper = AsyncScraper(
+            batch_size=batch_size,
+            crawl_cache=crawl_cache,
+            max_concurrency=concurrency,
+            per_host_concurrency=per_host_concurrency,
+            requests_per_second=requests_per_second,
+            parse_workers=parse_workers,
+            sitemap_workers=sitemap_workers,
+        )
+    else:
+        scraper = Scraper(delay=0.1, batch_size=batch_size, crawl_cache=crawl_cache, sitemap_workers=sitemap_workers)
+    scraper.run(site_map_url, num_sections, output_file_name, sections)
+
+    output_path = DATA_DIR / output_file_name
+    if convert_to_json and is_jsonl(output_path):
+        convert_jsonl_to_json(output_path, output_path.with_suffix(".json"))
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -182,12 +644,19 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=2,
         help="Number of sections to scrape",
     )
+    parser.add_argument(
+        "--sections",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Sections to scrape, first url path segments, instead of the most numerous ones",
+    )
     parser.add_argument(
         "-o",
         "--output_file_name",
         type=str,
         default="raw_data.json",
-        help="Output JSON file name, data will be stored in data folder",
+        help="Output file name, data will be stored in data folder. A .jsonl file is appended to and resumable",
     )
     parser.add_argument(
         "-b",
@@ -196,6 +665,58 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=100,
         help="Size of batch to save data incrementally (not to lose data on crash)",
     )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        type=str,
+        default="sync",
+        choices=["sync", "async"],
+        help="Fetch pages one at a time, or concurrently with asyncio",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=32,
+        help="Maximum concurrent requests in async mode",
+    )
+    parser.add_argument(
+        "--per_host_concurrency",
+        type=int,
+        default=8,
+        help="Maximum concurrent requests per host in async mode",
+    )
+    parser.add_argument(
+        "-r",
+        "--requests_per_second",
+        type=float,
+        default=10.0,
+        help="Requests per second allowed per host in async mode, 0 for no limit",
+    )
+    parser.add_argument(
+        "-w",
+        "--parse_workers",
+        type=int,
+        default=2,
+        help="Processes parsing HTML in async mode",
+    )
+    parser.add_argument(
+        "--convert_to_json",
+        action="store_true",
+        help="Also write JSONL output as a JSON array file next to it",
+    )
+    parser.add_argument(
+        "--crawl_cache",
+        type=str,
+        default=None,
+        help="Crawl cache file name in the data folder, enables conditional re-crawls of only changed pages",
+    )
+    parser.add_argument(
+        "--sitemap_workers",
+        type=int,
+        default=4,
+        help="Child sitemaps of a sitemap index fetched concurrently",
+    )
 
     return parser
 
@@ -204,4 +725,18 @@ if __name__ == "__main__":
     parser = build_arg_parser()
     args = parser.parse_args()
 
-    main(args.site_map_url, args.num_sections, args.output_file_name, args.batch_size)
+    main(
+        args.site_map_url,
+        args.num_sections,
+        args.output_file_name,
+        args.batch_size,
+        args.mode,
+        args.concurrency,
+        args.per_host_concurrency,
+        args.requests_per_second,
+        args.parse_workers,
+        args.convert_to_json,
+        args.crawl_cache,
+        args.sections,
+        args.sitemap_workers,
+    )
@@ -0,0 +1,165 @@
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+from lxml import etree
+
+from api.shared.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def gunzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decompresses a stream of chunks on the fly if it is gzipped, passing it through otherwise."""
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(GZIP_MAGIC):
+            break
+
+    if not head.startswith(GZIP_MAGIC):
+        yield head
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    yield decompressor.decompress(head)
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
+def iter_sitemap_elements(chunks: Iterable[bytes]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Yields (kind, loc, lastmod) for every <url> and <sitemap> element, kind being "url" or "sitemap".
+
+    The XML is parsed chunk by chunk as it arrives and elements are cleared once read, so memory stays flat however
+    large the sitemap is.
+    """
+    # Only <url> and <sitemap> elements of any namespace produce events, their children are read from them
+    parser = etree.XMLPullParser(events=("end",), tag=("{*}url", "{*}sitemap"), resolve_entities=False, no_network=True)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _read_elements(parser)
+    parser.close()
+    yield from _read_elements(parser)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _read_elements(parser: etree.XMLPullParser) -> Iterator[Tuple[str, str, Optional[str]]]:
+    for _, element in parser.read_events():
+        kind = _local_name(element.tag)
+        loc = lastmod = None
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+            name = _local_name(child.tag)
+            if name == "loc":
+                loc = (child.text or "").strip()
+            elif name == "lastmod":
+                lastmod = (child.text or "").strip() or None
+        if loc:
+            yield kind, loc, lastmod
+
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+class SitemapReader:
+    """Streams (url, lastmod) pairs out of a sitemap, following sitemap indexes.
+
+    Sitemaps are parsed straight off the response, gzipped or not, and the child sitemaps of an index are fetched
+    concurrently. At most max_queued_entries pairs are buffered ahead of the consumer.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        max_workers: int = 4,
+        timeout: float = 10.0,
+        max_queued_entries: int = 10000,
+    ):
+        self.headers = headers or {}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_queued_entries = max_queued_entries
+
+    def iter_entries(
+        self, sitemap_url: str, include: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yields the pages of a sitemap as they are parsed, only those include returns True for if given.
+
+        A failing root sitemap raises, a failing child sitemap is logged and skipped.
+        """
+        entries = queue.Queue(maxsize=self.max_queued_entries)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sitemap")
+
+        seen_sitemaps = {sitemap_url}
+        executor.submit(self._read_sitemap, sitemap_url, include, entries, stop)
+        outstanding = 1
+        try:
+            while outstanding:
+                kind, *values = entries.get()
+                if kind == "url":
+                    yield values[0], values[1]
+                elif kind == "sitemap":
+                    # Indexes can list a sitemap twice or point back at each other
+                    if values[0] not in seen_sitemaps:
+                        seen_sitemaps.add(values[0])
+                        executor.submit(self._read_sitemap, values[0], include, entries, stop)
+                        outstanding += 1
+                else:
+                    outstanding -= 1
+                    url, error = values
+                    if error is not None and url == sitemap_url:
+                        raise error
+                    if error is not None:
+                        LOGGER.warning(f"Skipping sitemap {url}: {error}")
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_sitemap(
+        self, sitemap_url: str, include: Optional[Callable[[str], bool]], entries: queue.Queue, stop: threading.Event
+    ) -> None:
+        error = None
+        try:
+            LOGGER.info(f"Reading sitemap: {sitemap_url}")
+            with requests.get(sitemap_url, headers=self.headers, timeout=self.timeout, stream=True) as resp:
+                resp.raise_for_status()
+                # Content-Encoding is undone by requests, a .xml.gz file served as is is unzipped here
+                chunks = gunzip_chunks(resp.iter_content(READ_CHUNK_SIZE))
+                for kind, loc, lastmod in iter_sitemap_elements(chunks):
+                    if kind == "sitemap":
+                        item = ("sitemap", loc)
+                    elif include is None or include(loc):
+                        item = ("url", loc, lastmod)
+                    else:
+                        continue
+                    if not self._put(entries, stop, item):
+                        return
+        except Exception as e:
+            error = e
+        self._put(entries, stop, ("done", sitemap_url, error))
+
+    @staticmethod
+    def _put(entries: queue.Queue, stop: threading.Event, item: tuple) -> bool:
+        """Waits for room in the queue, giving up once the consumer is gone."""
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False